@@ -0,0 +1,59 @@
+"""Benchmark running a query for many agents with run_batch() against one run() each.
+
+Usage: python benchmarks/bench_batch.py [agents] [sampled_runs]
+
+"""
+
+import random
+import sys
+import time
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+
+QUERY = DBQuery(
+    [
+        "?agent.relationships.?other.reputation!?r",
+        "gt ?r 50",
+        "?other.traits.kind",
+    ]
+)
+
+
+def build_world(agents: int) -> RePraxisDatabase:
+    rng = random.Random(0)
+    db = RePraxisDatabase()
+
+    for i in range(agents):
+        for other in rng.sample(range(agents), 10):
+            db.insert(
+                f"agent_{i}.relationships.agent_{other}.reputation!"
+                f"{rng.randrange(-100, 100)}"
+            )
+        db.insert(f"agent_{i}.traits.{rng.choice(['kind', 'rude', 'shy'])}")
+
+    return db
+
+
+def main() -> None:
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    sampled = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    db = build_world(agents)
+    binding_sets = [{"?agent": f"agent_{i}"} for i in range(agents)]
+
+    start = time.perf_counter()
+    for binding_set in binding_sets[:sampled]:
+        QUERY.run(db, [binding_set])
+    per_run = (time.perf_counter() - start) / sampled
+    print(f"separate runs:  {per_run * agents:.2f} s (estimated from {sampled})")
+
+    prepared = QUERY.prepare()
+    start = time.perf_counter()
+    results = prepared.run_batch(db, binding_sets)
+    print(f"run_batch:      {time.perf_counter() - start:.2f} s")
+    print(f"agents with matches: {sum(result.success for result in results)}")
+
+
+if __name__ == "__main__":
+    main()
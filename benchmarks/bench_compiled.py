@@ -0,0 +1,71 @@
+"""Benchmark compiled queries against the interpreter.
+
+Usage: python benchmarks/bench_compiled.py [agents] [repeats]
+
+"""
+
+import random
+import sys
+import time
+
+from repraxis import DBQuery, RePraxisDatabase
+
+QUERIES = [
+    DBQuery(["?a.relationships.?b.reputation!?r", "gt ?r 50"]),
+    DBQuery(["agent_7.relationships.?b.reputation!?r", "?b.relationships.?c"]),
+    DBQuery(["?a.relationships.agent_3.reputation!?r", "not ?a.traits.shy"]),
+]
+
+
+def build_world(agents: int) -> RePraxisDatabase:
+    rng = random.Random(0)
+    db = RePraxisDatabase()
+
+    for i in range(agents):
+        if rng.random() < 0.5:
+            db.insert(f"agent_{i}.traits.shy")
+
+        for other in rng.sample(range(agents), 20):
+            db.insert(
+                f"agent_{i}.relationships.agent_{other}.reputation!"
+                f"{rng.randrange(-100, 100)}"
+            )
+
+    return db
+
+
+def best_time(function, repeats: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    db = build_world(agents)
+
+    for query in QUERIES:
+        prepared = query.prepare()
+        compiled = query.compile()
+
+        assert compiled.run(db).bindings == prepared.run(db).bindings
+
+        interpreted = best_time(lambda: prepared.run(db), repeats)
+        generated = best_time(lambda: compiled.run(db), repeats)
+
+        print(" and ".join(query.expressions))
+        print(
+            f"  interpreter: {interpreted * 1000:8.2f}ms   compiled: "
+            f"{generated * 1000:8.2f}ms   ({interpreted / generated:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
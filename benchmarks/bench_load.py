@@ -0,0 +1,59 @@
+"""Benchmark loading a sentence file with load_sentences() against insert() per line.
+
+Usage: python benchmarks/bench_load.py [agents]
+
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from repraxis import RePraxisDatabase
+
+
+def write_world(path: str, agents: int) -> None:
+    rng = random.Random(0)
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("# Generated world\n")
+        for i in range(agents):
+            for other in range(20):
+                file.write(
+                    f"agent_{i}.relationships.agent_{other}.reputation!"
+                    f"{rng.randrange(-100, 100)}\n"
+                )
+                file.write(f"agent_{i}.relationships.agent_{other}.tags.met\n")
+            file.write(f"agent_{i}.traits.{rng.choice(['kind', 'rude', 'shy'])}\n")
+            file.write("\n")
+
+
+def main() -> None:
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "world.txt")
+        write_world(path, agents)
+        size = os.path.getsize(path)
+
+        db = RePraxisDatabase()
+        start = time.perf_counter()
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    db.insert(line)
+        elapsed = time.perf_counter() - start
+        print(f"insert() per line: {elapsed:.3f}s ({size / 1e6 / elapsed:.2f} MB/s)")
+
+        db = RePraxisDatabase()
+        report = db.load_sentences(path)
+        print(
+            f"load_sentences():  {report.seconds:.3f}s "
+            f"({report.megabytes_per_second:.2f} MB/s, {report.loaded} sentences)"
+        )
+
+
+if __name__ == "__main__":
+    main()
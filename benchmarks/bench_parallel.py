@@ -0,0 +1,60 @@
+"""Benchmark running a query with parallel unification from 1 to N worker processes.
+
+Usage: python benchmarks/bench_parallel.py [max_workers] [agents]
+
+"""
+
+import os
+import random
+import sys
+import time
+
+from repraxis import DBQuery, RePraxisDatabase
+from repraxis.parallel import ParallelUnifier
+
+QUERY = DBQuery(["?a.relationships.?b.reputation!?r", "gt ?r 50"])
+
+
+def build_world(agents: int) -> RePraxisDatabase:
+    rng = random.Random(0)
+    db = RePraxisDatabase()
+
+    for i in range(agents):
+        for other in rng.sample(range(agents), 20):
+            db.insert(
+                f"agent_{i}.relationships.agent_{other}.reputation!"
+                f"{rng.randrange(-100, 100)}"
+            )
+
+    return db
+
+
+def main() -> None:
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 2)
+    agents = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    db = build_world(agents)
+
+    start = time.perf_counter()
+    expected = QUERY.run(db)
+    baseline = time.perf_counter() - start
+    print(f"serial query:    {baseline:.3f}s ({len(expected.bindings)} bindings)")
+
+    for workers in range(1, max_workers + 1):
+        with ParallelUnifier(db, workers=workers) as unifier:
+            # The first call starts the worker processes.
+            QUERY.run(db, unifier=unifier)
+
+            start = time.perf_counter()
+            result = QUERY.run(db, unifier=unifier)
+            elapsed = time.perf_counter() - start
+
+        assert result.bindings == expected.bindings
+        print(
+            f"{workers} worker(s):     {elapsed:.3f}s "
+            f"({baseline / elapsed:.2f}x serial)"
+        )
+
+
+if __name__ == "__main__":
+    main()
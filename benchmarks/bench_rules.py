@@ -0,0 +1,103 @@
+"""Benchmark maintaining derived rules incrementally against naive recomputation.
+
+Usage: python benchmarks/bench_rules.py [agents] [updates]
+
+"""
+
+import random
+import sys
+import time
+
+from repraxis import RePraxisDatabase
+from repraxis.rules import Rule, RuleEngine
+
+RULES = [
+    Rule("?a.allies.?b", ["?a.friends.?c", "?b.friends.?c", "neq ?a ?b"]),
+    Rule("?a.reach.?b", ["?a.link.?b"]),
+    Rule("?a.reach.?c", ["?a.reach.?b", "?b.link.?c"]),
+]
+
+
+def base_facts(agents: int, rng: random.Random) -> list[str]:
+    facts = []
+
+    for i in range(agents):
+        facts.append(f"agent_{i}.friends.group_{rng.randrange(agents // 4)}")
+        facts.append(f"agent_{i}.link.agent_{rng.randrange(agents)}")
+
+    return facts
+
+
+def recompute(base: RePraxisDatabase) -> RePraxisDatabase:
+    """Copy the base facts and apply every rule until nothing new is derived."""
+
+    db = RePraxisDatabase()
+
+    for fact in base.iter_sentences():
+        db.insert(fact)
+
+    changed = True
+
+    while changed:
+        changed = False
+
+        for rule in RULES:
+            for head in list(rule.derive(db)):
+                if not db.assert_statement(head):
+                    db.insert(head)
+                    changed = True
+
+    return db
+
+
+def main() -> None:
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    rng = random.Random(0)
+    base = RePraxisDatabase()
+
+    for fact in base_facts(agents, rng):
+        base.insert(fact)
+
+    db = RePraxisDatabase()
+
+    for fact in base.iter_sentences():
+        db.insert(fact)
+
+    start = time.perf_counter()
+    engine = RuleEngine(db, RULES)
+    print(f"initial materialization: {time.perf_counter() - start:.2f} s")
+    print(f"derived facts: {len(engine.derived)}")
+
+    changes = []
+    for _ in range(updates):
+        fact = f"agent_{rng.randrange(agents)}.link.agent_{rng.randrange(agents)}"
+        changes.append((rng.random() < 0.3, fact))
+
+    incremental = 0.0
+    naive = 0.0
+
+    for delete, fact in changes:
+        start = time.perf_counter()
+        if delete:
+            engine.delete(fact)
+        else:
+            engine.insert(fact)
+        incremental += time.perf_counter() - start
+
+        if delete:
+            base.delete(fact)
+        else:
+            base.insert(fact)
+
+        start = time.perf_counter()
+        recompute(base)
+        naive += time.perf_counter() - start
+
+    print(f"incremental: {incremental / updates * 1e3:.2f} ms per update")
+    print(f"recompute:   {naive / updates * 1e3:.2f} ms per update")
+
+
+if __name__ == "__main__":
+    main()
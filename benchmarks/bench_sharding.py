@@ -0,0 +1,64 @@
+"""Benchmark sharded query throughput from 1 to N worker processes.
+
+Usage: python benchmarks/bench_sharding.py [max_workers] [agents]
+
+"""
+
+import os
+import random
+import sys
+import time
+
+from repraxis import DBQuery, RePraxisDatabase
+from repraxis.sharding import ShardedDatabase
+
+QUERY = DBQuery().where("?a.relationships.?b.reputation!?r").where("gt ?r 50")
+
+
+def build_sentences(agents: int) -> list[str]:
+    rng = random.Random(0)
+    sentences: list[str] = []
+
+    for i in range(agents):
+        for _ in range(10):
+            other = rng.randrange(agents)
+            sentences.append(
+                f"agent_{i}.relationships.agent_{other}.reputation!{rng.randrange(100)}"
+            )
+        sentences.append(f"agent_{i}.traits.{rng.choice(['kind', 'rude', 'shy'])}")
+
+    return sentences
+
+
+def main() -> None:
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 2)
+    agents = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    sentences = build_sentences(agents)
+
+    db = RePraxisDatabase()
+    for sentence in sentences:
+        db.insert(sentence)
+
+    start = time.perf_counter()
+    expected = QUERY.run(db)
+    baseline = time.perf_counter() - start
+    print(f"single database: {baseline:.3f}s ({len(expected.bindings)} bindings)")
+
+    for workers in range(1, max_workers + 1):
+        with ShardedDatabase(workers) as sharded:
+            for sentence in sentences:
+                sharded.insert(sentence)
+
+            start = time.perf_counter()
+            result = sharded.run(QUERY)
+            elapsed = time.perf_counter() - start
+
+        assert len(result.bindings) == len(expected.bindings)
+        print(
+            f"{workers} worker(s): {elapsed:.3f}s "
+            f"(speedup vs single database {baseline / elapsed:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
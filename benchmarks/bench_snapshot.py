@@ -0,0 +1,95 @@
+"""Benchmark publishing a shared-memory snapshot and querying it from worker processes.
+
+Usage: python benchmarks/bench_snapshot.py [agents] [workers]
+
+"""
+
+import multiprocessing
+import random
+import sys
+import time
+from multiprocessing.connection import Connection
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+from repraxis.shared_snapshot import SnapshotPublisher, SnapshotReader
+
+QUERY = DBQuery(
+    [
+        "agent_7.relationships.?other.reputation!?r",
+        "gt ?r 50",
+        "?other.relationships.agent_7.tags.met",
+    ]
+)
+
+
+def build_world(agents: int) -> RePraxisDatabase:
+    rng = random.Random(0)
+    db = RePraxisDatabase()
+
+    for i in range(agents):
+        for other in rng.sample(range(agents), 20):
+            db.insert(
+                f"agent_{i}.relationships.agent_{other}.reputation!"
+                f"{rng.randrange(-100, 100)}"
+            )
+            db.insert(f"agent_{i}.relationships.agent_{other}.tags.met")
+
+    return db
+
+
+def worker(name: str, connection: Connection) -> None:
+    start = time.perf_counter()
+    reader = SnapshotReader(name)
+    attached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        QUERY.run(reader.database)
+    queried = (time.perf_counter() - start) / 100
+
+    connection.send((attached, queried))
+    reader.close()
+
+
+def main() -> None:
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    db = build_world(agents)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        QUERY.run(db)
+    print(f"live query:       {(time.perf_counter() - start) / 100 * 1e3:.3f} ms")
+
+    with SnapshotPublisher() as publisher:
+        start = time.perf_counter()
+        publisher.publish(db)
+        print(f"publish:          {time.perf_counter() - start:.3f} s")
+
+        connections = []
+        processes = []
+
+        for _ in range(workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=worker, args=(publisher.name, worker_connection)
+            )
+            process.start()
+            connections.append(connection)
+            processes.append(process)
+
+        for i, connection in enumerate(connections):
+            attached, queried = connection.recv()
+            print(
+                f"worker {i}: attach {attached * 1e3:.3f} ms, "
+                f"query {queried * 1e3:.3f} ms"
+            )
+
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
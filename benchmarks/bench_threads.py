@@ -0,0 +1,96 @@
+"""Benchmark query throughput on a ThreadSafeDatabase from 1 to N reader threads.
+
+A writer thread keeps updating the database while the readers query it. Readers only
+scale across cores on free-threaded (no-GIL) CPython builds.
+
+Usage: python benchmarks/bench_threads.py [max_threads] [agents] [seconds]
+
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+from repraxis import DBQuery
+from repraxis.thread_safe import ThreadSafeDatabase
+
+QUERIES = [
+    DBQuery(["agent_7.relationships.?other.reputation!?r", "gt ?r 50"]),
+    DBQuery(["?a.relationships.agent_3.reputation!?r"]),
+]
+
+
+def build_world(agents: int) -> ThreadSafeDatabase:
+    rng = random.Random(0)
+    db = ThreadSafeDatabase()
+
+    for i in range(agents):
+        for other in rng.sample(range(agents), 20):
+            db.insert(
+                f"agent_{i}.relationships.agent_{other}.reputation!"
+                f"{rng.randrange(-100, 100)}"
+            )
+
+    return db
+
+
+def measure(db: ThreadSafeDatabase, agents: int, threads: int, seconds: float) -> int:
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def reader(index: int) -> None:
+        while not stop.is_set():
+            for query in QUERIES:
+                query.run(db)
+            counts[index] += len(QUERIES)
+
+    def writer() -> None:
+        rng = random.Random(1)
+
+        while not stop.is_set():
+            db.set(
+                f"agent_{rng.randrange(agents)}.relationships."
+                f"agent_{rng.randrange(agents)}.reputation",
+                rng.randrange(-100, 100),
+            )
+            time.sleep(0.001)
+
+    workers = [threading.Thread(target=reader, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=writer))
+
+    for worker in workers:
+        worker.start()
+
+    time.sleep(seconds)
+    stop.set()
+
+    for worker in workers:
+        worker.join()
+
+    return sum(counts)
+
+
+def main() -> None:
+    max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 2)
+    agents = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    print(f"GIL enabled: {is_gil_enabled()}")
+
+    db = build_world(agents)
+    baseline = 0
+
+    for threads in range(1, max_threads + 1):
+        queries = measure(db, agents, threads, seconds)
+        baseline = baseline or queries
+        print(
+            f"{threads} reader(s): {queries / seconds:,.0f} queries/s "
+            f"({queries / baseline:.2f}x one reader)"
+        )
+
+
+if __name__ == "__main__":
+    main()
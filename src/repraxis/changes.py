@@ -0,0 +1,254 @@
+"""Change Notifications.
+
+Listeners subscribe to a prefix of the database, such as "astrid.relationships", and
+are called with the changes made to facts along that prefix. A change matches a
+subscription when either sentence is a prefix of the other, so deleting "astrid" is
+reported to listeners of "astrid.relationships". Changes are delivered as lists: after
+each write, at the end of a batch (see RePraxisDatabase.batch()), or, for per-tick
+subscriptions, when the database clock advances.
+
+"""
+
+from __future__ import annotations
+
+from enum import Enum, auto
+from typing import Callable, Optional, Sequence
+
+from repraxis.helpers import sentence_keys
+from repraxis.nodes.base_types import NodeType
+
+
+class ChangeType(Enum):
+    """The kind of write that changed the database."""
+
+    INSERT = auto()
+    DELETE = auto()
+    CLEAR = auto()
+
+
+class Change:
+    """A fact that was inserted into or deleted from the database.
+
+    Deleting a fact also deletes everything below it. Clearing the database is a
+    single change with an empty sentence.
+    """
+
+    __slots__ = ("change_type", "sentence", "_symbols")
+
+    change_type: ChangeType
+    sentence: str
+    _symbols: Optional[tuple[str, ...]]
+
+    def __init__(
+        self,
+        change_type: ChangeType,
+        sentence: str,
+        symbols: Optional[tuple[str, ...]] = None,
+    ) -> None:
+        self.change_type = change_type
+        self.sentence = sentence
+        self._symbols = symbols
+
+    @property
+    def symbols(self) -> tuple[str, ...]:
+        """The symbols along the changed sentence."""
+
+        if self._symbols is None:
+            self._symbols = _prefix_symbols(self.sentence)
+
+        return self._symbols
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Change):
+            return NotImplemented
+
+        return self.change_type == other.change_type and self.sentence == other.sentence
+
+    def __hash__(self) -> int:
+        return hash((self.change_type, self.sentence))
+
+    def __repr__(self) -> str:
+        return f"Change({self.change_type.name}, {self.sentence!r})"
+
+
+ChangeListener = Callable[[list[Change]], object]
+
+
+class Subscription:
+    """A listener registered for changes below a prefix."""
+
+    __slots__ = ("prefix", "listener", "per_tick", "_symbols", "_feed", "_pending")
+
+    prefix: str
+    listener: ChangeListener
+    per_tick: bool
+    _symbols: tuple[str, ...]
+    _feed: Optional[ChangeFeed]
+    _pending: list[Change]
+
+    def __init__(
+        self, feed: ChangeFeed, prefix: str, listener: ChangeListener, per_tick: bool
+    ) -> None:
+        self.prefix = prefix
+        self.listener = listener
+        self.per_tick = per_tick
+        self._symbols = _prefix_symbols(prefix)
+        self._feed = feed
+        self._pending = []
+
+    @property
+    def active(self) -> bool:
+        """True until the subscription is cancelled."""
+        return self._feed is not None
+
+    def cancel(self) -> None:
+        """Stop delivering changes to the listener. Pending changes are dropped."""
+
+        if self._feed is not None:
+            self._feed.unsubscribe(self)
+            self._feed = None
+
+        self._pending.clear()
+
+    def _matches(self, change: Change) -> bool:
+        symbols = change.symbols
+        size = min(len(self._symbols), len(symbols))
+        return self._symbols[:size] == symbols[:size]
+
+    def _deliver(self) -> None:
+        if self._pending:
+            changes = self._pending
+            self._pending = []
+            self.listener(changes)
+
+
+class ChangeFeed:
+    """Routes database changes to subscriptions by prefix.
+
+    Subscriptions are indexed by the first symbol of their prefix, so a change is
+    only compared with subscriptions that share its first symbol, plus those that
+    watch the whole database.
+    """
+
+    __slots__ = ("_by_head", "_count", "_batch_depth", "_tick_due", "_waiting")
+
+    _by_head: dict[Optional[str], list[Subscription]]
+    _count: int
+    _batch_depth: int
+    _tick_due: bool
+    _waiting: dict[Subscription, None]
+
+    def __init__(self) -> None:
+        self._by_head = {}
+        self._count = 0
+        self._batch_depth = 0
+        self._tick_due = False
+        self._waiting = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def watches(self, head: str) -> bool:
+        """Check if a change to facts starting with a symbol could be delivered."""
+
+        return head in self._by_head or None in self._by_head
+
+    def subscribe(
+        self, prefix: str, listener: ChangeListener, per_tick: bool = False
+    ) -> Subscription:
+        """Call a listener with the changes made along a prefix."""
+
+        subscription = Subscription(self, prefix, listener, per_tick)
+        head = subscription._symbols[0] if subscription._symbols else None
+        self._by_head.setdefault(head, []).append(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription from the feed."""
+
+        head = subscription._symbols[0] if subscription._symbols else None
+        subscriptions = self._by_head.get(head, [])
+
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+            self._count -= 1
+
+            if not subscriptions:
+                del self._by_head[head]
+
+        self._waiting.pop(subscription, None)
+
+    def publish(self, changes: Sequence[Change]) -> None:
+        """Queue changes for matching subscriptions and deliver them if possible."""
+
+        for change in changes:
+            if change.change_type == ChangeType.CLEAR:
+                candidates = [s for group in self._by_head.values() for s in group]
+            else:
+                candidates = [
+                    *self._by_head.get(None, ()),
+                    *self._by_head.get(change.symbols[0], ()),
+                ]
+
+            for subscription in candidates:
+                if subscription._matches(change):
+                    subscription._pending.append(change)
+                    self._waiting[subscription] = None
+
+        if self._batch_depth == 0:
+            self._deliver(per_tick=False)
+
+    def begin_batch(self) -> None:
+        """Hold changes until the matching call to end_batch()."""
+
+        self._batch_depth += 1
+
+    def end_batch(self) -> None:
+        """Deliver held changes once the outermost batch ends."""
+
+        self._batch_depth -= 1
+
+        if self._batch_depth == 0:
+            self._deliver(per_tick=self._tick_due)
+
+    def tick(self) -> None:
+        """Deliver the changes held for per-tick subscriptions.
+
+        During a batch, they are delivered when the batch ends.
+        """
+
+        if self._batch_depth == 0:
+            self._deliver(per_tick=True)
+        else:
+            self._tick_due = True
+
+    def _deliver(self, per_tick: bool) -> None:
+        if per_tick:
+            self._tick_due = False
+
+        ready = [s for s in self._waiting if per_tick or not s.per_tick]
+
+        for subscription in ready:
+            del self._waiting[subscription]
+
+        for subscription in ready:
+            subscription._deliver()
+
+
+def _prefix_symbols(sentence: str) -> tuple[str, ...]:
+    """Get the symbols along a sentence, or an empty tuple for an empty sentence."""
+
+    if sentence == "":
+        return ()
+
+    keys = sentence_keys(sentence)
+
+    for symbol, _, node_type in keys:
+        if node_type == NodeType.VARIABLE:
+            raise TypeError(
+                f"Found variable {symbol} in prefix '{sentence}'. Change "
+                "notifications only support exact prefixes."
+            )
+
+    return tuple(symbol for symbol, _, _ in keys)
@@ -2,113 +2,978 @@
 
 """
 
-from repraxis.helpers import parse_sentence
-from repraxis.nodes.base_types import INode, NodeCardinality, NodeType
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+from typing import (
+    Callable,
+    ContextManager,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from repraxis.changes import (
+    Change,
+    ChangeFeed,
+    ChangeListener,
+    ChangeType,
+    Subscription,
+)
+from repraxis.helpers import (
+    SentenceKey,
+    create_sentence,
+    node_from_object,
+    node_keys,
+    parse_sentence,
+    sentence_keys,
+    split_sentence,
+)
+from repraxis.loading import (
+    DEFAULT_CHUNK_SIZE,
+    LineError,
+    LoadReport,
+    LoadSource,
+    TokenMemo,
+    iter_lines,
+)
+from repraxis.nodes.base_types import INode, Node, NodeCardinality, NodeType
 from repraxis.nodes.nodes import SymbolNode
+from repraxis.paths import Path, path_nodes
+from repraxis.query_cache import QueryCache
+from repraxis.stats import TreeStats, collect_stats
+from repraxis.timer_wheel import TimerWheel
 
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# The timer wheel is rebuilt once it holds this many more entries than scheduled nodes,
+# so stale schedules of replaced or deleted nodes are not kept until their deadlines.
+_MIN_STALE_TIMERS = 64
 
-class RePraxisDatabase:
-    """A database that manages a tree of data nodes to be queried."""
 
-    __slots__ = ("_root",)
+class RePraxisDatabase:
+    """A database that manages a tree of data nodes to be queried.
+
+    By default, the database builds its tree out of node objects. Passing the root of
+    an alternate storage backend (for example, ``ArrayTrie().root``) stores the data
+    there instead.
+
+    With ordered_children, every node keeps its children sorted by value instead of
+    insertion order. Query results are then ordered the same way however the facts
+    were inserted, and range comparisons in queries skip children with bisect
+    lookups. Ordered children are only supported by node objects.
+    """
+
+    __slots__ = (
+        "_root",
+        "_query_cache",
+        "_version",
+        "_stats",
+        "_tick",
+        "_timers",
+        "_expiry",
+        "_changes",
+    )
 
     _root: INode
+    _query_cache: Optional[QueryCache]
+    _version: int
+    _stats: Optional[tuple[int, TreeStats]]
+    _tick: int
+    _timers: Optional[TimerWheel[INode]]
+    _expiry: dict[INode, int]
+    _changes: Optional[ChangeFeed]
+
+    def __init__(
+        self, root: Optional[INode] = None, ordered_children: bool = False
+    ) -> None:
+        self._root = (
+            root if root is not None else SymbolNode("root", NodeCardinality.MANY)
+        )
+
+        if ordered_children:
+            if not isinstance(self._root, Node):
+                raise ValueError(
+                    "Ordered children are only supported by databases of node objects."
+                )
 
-    def __init__(self) -> None:
-        self._root = SymbolNode("root", NodeCardinality.MANY)
+            self._root.order_children()
+        self._query_cache = None
+        self._version = 0
+        self._stats = None
+        self._tick = 0
+        self._timers = None
+        self._expiry = {}
+        self._changes = None
 
     @property
     def root(self) -> INode:
         """The root node of the database."""
         return self._root
 
-    def insert(self, sentence: str) -> None:
-        """Insert a statement into the database."""
+    @property
+    def tick(self) -> int:
+        """The current tick of the database clock (see advance())."""
+        return self._tick
+
+    @property
+    def query_cache(self) -> Optional[QueryCache]:
+        """The cache of query results, or None if caching is disabled."""
+        return self._query_cache
+
+    def enable_query_cache(self, max_size: int = 256) -> QueryCache:
+        """Cache the results of queries run against this database.
+
+        Cached results are dropped when insert(), delete() or clear() touch a path
+        the query could match. Changes made directly to nodes are not tracked.
+        """
+
+        if self._query_cache is None or self._query_cache.max_size != max_size:
+            self._query_cache = QueryCache(max_size)
+
+        return self._query_cache
+
+    def disable_query_cache(self) -> None:
+        """Stop caching query results and drop any cached results."""
+        self._query_cache = None
+
+    def reading(self, heads: Iterable[Optional[str]] = ()) -> ContextManager[None]:
+        """Get a context that keeps facts starting with the given symbols unchanged.
+
+        Queries hold it while they run. A head of None stands for a sentence that
+        starts with a variable. Plain databases are not shared between threads, so
+        this does nothing. ThreadSafeDatabase (see repraxis.thread_safe) locks the
+        subtrees being read.
+        """
+
+        return nullcontext()
+
+    def subscribe(
+        self, prefix: str, listener: ChangeListener, per_tick: bool = False
+    ) -> Subscription:
+        """Call a listener with the changes made to facts along a prefix.
+
+        An empty prefix watches the whole database. The listener receives a list of
+        Change objects after each write, or once at the end of a batch(). Per-tick
+        listeners receive their changes when advance() is called instead. Values
+        replaced below cardinality ONE nodes are reported as deletions. Call
+        cancel() on the returned subscription to stop listening.
+        """
+
+        if self._changes is None:
+            self._changes = ChangeFeed()
+
+        return self._changes.subscribe(prefix, listener, per_tick)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Hold change notifications until the end of the with block.
+
+        Each listener then receives every matching change from the block in a single
+        call. Batches may be nested, and changes are delivered when the outermost
+        batch ends.
+        """
+
+        if self._changes is None:
+            self._changes = ChangeFeed()
+
+        changes = self._changes
+        changes.begin_batch()
+
+        try:
+            yield
+        finally:
+            changes.end_batch()
+
+    def insert(self, sentence: str, ttl: Optional[int] = None) -> None:
+        """Insert a statement into the database.
+
+        Giving a ttl makes the statement expire once the database clock advances
+        that many ticks (see advance()). Inserting a statement again replaces its
+        ttl, and inserting it without a ttl makes it permanent.
+        """
+
+        self._insert_nodes(parse_sentence(sentence), sentence, ttl)
+
+    def insert_path(self, path: Path, ttl: Optional[int] = None) -> None:
+        """Insert a path of values into the database."""
+
+        self._insert_nodes(path_nodes(path), None, ttl)
+
+    def _insert_nodes(
+        self,
+        nodes: list[INode],
+        sentence: Optional[str] = None,
+        ttl: Optional[int] = None,
+    ) -> None:
+        if ttl is not None and (
+            isinstance(ttl, bool) or not isinstance(ttl, int) or ttl <= 0
+        ):
+            raise ValueError(f"Expected a positive integer ttl, but found {ttl!r}.")
+
+        self._version += 1
+
+        if self._query_cache is not None:
+            self._query_cache.invalidate(node_keys(nodes))
+
+        trail = [self._root]
+
+        if self._changes and self._changes.watches(nodes[0].symbol):
+            removed: list[str] = []
+
+            if self._insert_below(trail, nodes, sentence, removed):
+                self._changes.publish(
+                    [
+                        *(Change(ChangeType.DELETE, s) for s in removed),
+                        Change(
+                            ChangeType.INSERT,
+                            trail[-1].get_path(),
+                            tuple(node.symbol for node in trail[1:]),
+                        ),
+                    ]
+                )
+        else:
+            self._insert_below(trail, nodes, sentence)
+
+        self._set_expiry(trail[-1], ttl)
+
+    def _set_expiry(self, leaf: INode, ttl: Optional[int]) -> None:
+        """Schedule a node to expire after ttl ticks, or never if ttl is None."""
+
+        if ttl is None:
+            if self._expiry:
+                self._expiry.pop(leaf, None)
+                self._compact_timers()
+            return
+
+        deadline = self._tick + ttl
+
+        if self._expiry.get(leaf) == deadline:
+            return
+
+        if self._timers is None:
+            self._timers = TimerWheel(self._tick)
+
+        # Earlier schedules for the node are left in the wheel and ignored when they
+        # expire, since they no longer match the node's deadline.
+        self._expiry[leaf] = deadline
+        self._timers.schedule(deadline, leaf)
+        self._compact_timers()
+
+    def _forget_expiry(self, nodes: Iterable[INode]) -> None:
+        """Stop tracking the expiry of nodes and their sub_trees before removing them."""
+
+        stack = list(nodes)
+
+        while stack:
+            node = stack.pop()
+            self._expiry.pop(node, None)
+            stack.extend(node.children)
+
+        self._compact_timers()
+
+    def _compact_timers(self) -> None:
+        """Rebuild the timer wheel once most of its entries are stale."""
 
-        nodes = parse_sentence(sentence)
+        if (
+            self._timers is None
+            or len(self._timers) <= 2 * len(self._expiry) + _MIN_STALE_TIMERS
+        ):
+            return
 
-        sub_tree: INode = self._root
+        self._timers = TimerWheel(self._tick)
+
+        for leaf, deadline in self._expiry.items():
+            self._timers.schedule(deadline, leaf)
+
+    def advance(self, ticks: int = 1) -> list[str]:
+        """Advance the database clock and remove the statements that expired.
+
+        Like delete(), removing an expired statement also removes any data in its
+        sub_tree. Statements that were already deleted or overwritten are skipped.
+        Returns the expired statements.
+        """
+
+        if ticks < 0:
+            raise ValueError("Cannot advance the database clock backwards.")
+
+        self._tick += ticks
+
+        if self._timers is None:
+            if self._changes:
+                self._changes.tick()
+            return []
+
+        expired: list[str] = []
+
+        for deadline, leaf in self._timers.advance(ticks):
+            if self._expiry.get(leaf) != deadline:
+                continue
+
+            del self._expiry[leaf]
+
+            # Walk up to the root to make sure the node is still in the tree.
+            path: list[INode] = []
+            node: Optional[INode] = leaf
+
+            while node is not None and node != self._root:
+                path.append(node)
+                node = node.parent
+
+            if node is None:
+                continue
+
+            path.reverse()
+            expired.append(leaf.get_path())
+
+            self._version += 1
+
+            if self._query_cache is not None:
+                self._query_cache.invalidate(node_keys(path))
+
+            if self._expiry:
+                self._forget_expiry(leaf.children)
+
+            leaf.parent.remove_child(leaf.symbol)  # type: ignore[union-attr]
+
+        if self._changes:
+            if expired:
+                self._changes.publish(
+                    [Change(ChangeType.DELETE, sentence) for sentence in expired]
+                )
+
+            self._changes.tick()
+
+        return expired
+
+    def _insert_below(
+        self,
+        trail: list[INode],
+        nodes: list[INode],
+        sentence: Optional[str] = None,
+        removed: Optional[list[str]] = None,
+    ) -> bool:
+        """Insert nodes below the last node of the trail.
+
+        The trail holds the tree nodes along the path inserted so far, starting with
+        the root, and is extended with the tree node for each inserted node. When
+        removed is given, the sentences of values replaced below cardinality ONE
+        nodes are added to it. Returns True if any nodes were added to the tree.
+        """
+
+        sub_tree: INode = trail[-1]
+        created = False
 
         for node in nodes:
             if node.node_type == NodeType.VARIABLE:
+                if sentence is None:
+                    sentence = create_sentence(nodes)
+
                 raise TypeError(
                     f"Found variable {node.symbol} in sentence '({sentence})'. "
                     "Sentence cannot contain variables when inserting a value."
                 )
 
-            if not sub_tree.has_child(node.symbol):
+            existing_node = sub_tree.find_child(node.symbol)
+
+            if existing_node is None:
                 if sub_tree.cardinality == NodeCardinality.ONE:
+                    if removed is not None:
+                        removed.extend(child.get_path() for child in sub_tree.children)
+
+                    if self._expiry:
+                        self._forget_expiry(sub_tree.children)
+
                     sub_tree.clear_children()
 
                 sub_tree.add_child(node)
-                sub_tree = node
+                sub_tree = sub_tree.get_child(node.symbol)
+                created = True
 
             else:
 
-                existing_node = sub_tree.get_child(node.symbol)
-
                 if existing_node.cardinality != node.cardinality:
                     raise TypeError(
-                        f"Cardinality mismatch on {node.symbol} in '{sentence}'."
+                        f"Cardinality mismatch on {node.symbol} in "
+                        f"'{sentence if sentence else create_sentence(nodes)}'."
                     )
 
                 sub_tree = existing_node
 
+            trail.append(sub_tree)
+
+        return created
+
+    def load_sentences(
+        self, source: LoadSource, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> LoadReport:
+        """Insert every sentence from a file path or stream.
+
+        The source is read in chunks of chunk_size bytes. Blank lines and lines
+        starting with '#' are skipped. Lines that fail to load are recorded in the
+        returned report instead of stopping the load. Consecutive sentences sharing a
+        prefix resume insertion from the end of that prefix instead of walking it
+        again from the root, so sorted files load fastest.
+        """
+
+        report = LoadReport()
+        start_time = time.perf_counter()
+        self._version += 1
+
+        # Drop cached queries once instead of invalidating them for every line.
+        query_cache = self._query_cache
+        self._query_cache = None
+
+        previous_tokens: list[tuple[str, NodeCardinality]] = []
+        trail: list[INode] = [self._root]
+        memo = TokenMemo()
+
+        # Changes are published together once the load ends.
+        changes: Optional[list[Change]] = [] if self._changes else None
+        removed: list[str] = []
+
+        try:
+            for line in iter_lines(source, report, chunk_size):
+                report.lines += 1
+
+                try:
+                    text = (line if isinstance(line, str) else line.decode()).strip()
+
+                    if not text or text[0] == "#":
+                        report.skipped += 1
+                        continue
+
+                    tokens = split_sentence(text)
+
+                    # Tokens shared with the previous sentence are already in the
+                    # tree, at the matching positions of the trail.
+                    shared = 0
+                    for previous_token, token in zip(previous_tokens, tokens):
+                        if previous_token != token:
+                            break
+                        shared += 1
+
+                    del trail[shared + 1 :]
+                    previous_tokens = tokens
+                    created = self._insert_below(
+                        trail,
+                        [memo.node(t, c) for t, c in tokens[shared:]],
+                        text,
+                        removed if changes is not None else None,
+                    )
+                    report.loaded += 1
+
+                    if changes is not None and created:
+                        changes.extend(Change(ChangeType.DELETE, s) for s in removed)
+                        changes.append(Change(ChangeType.INSERT, trail[-1].get_path()))
+                        removed.clear()
+
+                except (ValueError, TypeError, IndexError) as ex:
+                    previous_tokens = []
+                    del trail[1:]
+
+                    # Values replaced before the line failed are still gone.
+                    if changes is not None and removed:
+                        changes.extend(Change(ChangeType.DELETE, s) for s in removed)
+                        removed.clear()
+                    report.errors.append(
+                        LineError(
+                            report.lines,
+                            line if isinstance(line, str) else repr(line),
+                            str(ex) if str(ex) else type(ex).__name__,
+                        )
+                    )
+        finally:
+            self._query_cache = query_cache
+            if query_cache is not None:
+                query_cache.clear()
+
+            report.seconds = time.perf_counter() - start_time
+
+            if changes and self._changes:
+                self._changes.publish(changes)
+
+        return report
+
     def assert_statement(self, sentence: str) -> bool:
         """Check if a given sentence exists within the database."""
 
-        nodes = parse_sentence(sentence)
+        return self._assert_keys(sentence_keys(sentence), sentence)
+
+    def assert_path(self, path: Path) -> bool:
+        """Check if a given path of values exists within the database."""
+
+        return self._assert_keys(node_keys(path_nodes(path)))
+
+    def _assert_keys(
+        self, keys: Sequence[SentenceKey], sentence: Optional[str] = None
+    ) -> bool:
+        last_index = len(keys) - 1
 
         current_node = self._root
 
-        for i, node in enumerate(nodes):
+        for i, (symbol, cardinality, node_type) in enumerate(keys):
 
-            if node.node_type == NodeType.VARIABLE:
+            if node_type == NodeType.VARIABLE:
                 raise TypeError(
-                    f"Found variable {node.symbol} in sentence '({sentence})'. "
+                    f"Found variable {symbol} in sentence "
+                    f"'({sentence if sentence else _keys_to_sentence(keys)})'. "
                     "Sentence cannot contain variables when asserting a value."
                 )
 
-            if not current_node.has_child(node.symbol):
+            child = current_node.find_child(symbol)
+
+            if child is None:
                 return False
 
-            if i == len(nodes) - 1:
+            if i == last_index:
                 return True
 
-            current_node = current_node.get_child(node.symbol)
-
-            if current_node.cardinality != node.cardinality:
+            if child.cardinality != cardinality:
                 return False
 
+            current_node = child
+
         return True
 
+    def get(self, path: str, default: object = None) -> object:
+        """Get the value held below a path ending in a cardinality ONE node.
+
+        For example, after inserting "astrid.reputation!30", getting
+        "astrid.reputation" returns 30. Returns the default if the path does not
+        exist. Raises a TypeError if the path exists but does not end in a
+        cardinality ONE node.
+        """
+
+        slot = self._find_slot(path)
+
+        if slot is None:
+            return default
+
+        for child in slot.children:
+            return child.get_value()
+
+        return default
+
+    def set(self, path: str, value: object) -> None:
+        """Set the value held below a path ending in a cardinality ONE node.
+
+        This has the same result as inserting "<path>!<value>". When the current value
+        is a leaf of the same type, it is updated in place instead of being replaced.
+        Like inserting without a ttl, setting a value makes it permanent.
+        """
+
+        self._version += 1
+
+        if self._query_cache is not None:
+            self._query_cache.invalidate(sentence_keys(path))
+
+        slot = self._find_slot(path)
+
+        if slot is None:
+            self.insert(f"{path}!{node_from_object(value).symbol}")
+            slot = self._find_slot(path)
+
+        changes = self._watching(path)
+        old_values = self._slot_sentences(slot) if changes else None  # type: ignore
+
+        self._set_slot_value(slot, value)  # type: ignore[arg-type]
+
+        if changes:
+            self._publish_slot_change(old_values, slot)  # type: ignore[arg-type]
+
+        if self._expiry:
+            for leaf in slot.children:  # type: ignore[union-attr]
+                self._expiry.pop(leaf, None)
+
+            self._compact_timers()
+
+    def increment(self, path: str, delta: Union[int, float] = 1) -> Union[int, float]:
+        """Add to the number held below a path ending in a cardinality ONE node.
+
+        Paths that do not exist yet start from zero. The value keeps any ttl it was
+        inserted with. Returns the new value.
+        """
+
+        slot = self._find_slot(path)
+
+        if slot is None:
+            self.set(path, delta)
+            return delta
+
+        current: object = 0
+
+        for child in slot.children:
+            current = child.get_value()
+            break
+
+        if not isinstance(current, (int, float)):
+            raise TypeError(f"Cannot increment non-numeric value at '{path}'.")
+
+        self._version += 1
+
+        if self._query_cache is not None:
+            self._query_cache.invalidate(sentence_keys(path))
+
+        value = current + delta
+        changes = self._watching(path)
+        old_values = self._slot_sentences(slot) if changes else None
+
+        self._set_slot_value(slot, value)
+
+        if changes:
+            self._publish_slot_change(old_values, slot)  # type: ignore[arg-type]
+
+        return value
+
+    def _find_slot(self, path: str) -> Optional[INode]:
+        """Get the cardinality ONE node at the end of a path, or None if missing."""
+
+        keys = sentence_keys(path)
+        last_index = len(keys) - 1
+
+        current_node = self._root
+
+        for i, (symbol, cardinality, node_type) in enumerate(keys):
+
+            if node_type == NodeType.VARIABLE:
+                raise TypeError(
+                    f"Found variable {symbol} in path '({path})'. "
+                    "Paths cannot contain variables when accessing a value."
+                )
+
+            child = current_node.find_child(symbol)
+
+            if child is None:
+                return None
+
+            if i < last_index and child.cardinality != cardinality:
+                return None
+
+            current_node = child
+
+        if current_node.cardinality != NodeCardinality.ONE:
+            raise TypeError(f"Path '{path}' does not end in a cardinality ONE node.")
+
+        return current_node
+
+    def _watching(self, path: str) -> bool:
+        """Check if changes to a path could be delivered to a subscription."""
+
+        return self._changes is not None and self._changes.watches(
+            sentence_keys(path)[0][0]
+        )
+
+    @staticmethod
+    def _slot_sentences(slot: INode) -> list[str]:
+        """Get the sentences of the values held below a cardinality ONE node."""
+
+        return [child.get_path() for child in slot.children]
+
+    def _publish_slot_change(self, old_values: list[str], slot: INode) -> None:
+        """Report the value replaced by set() or increment(), if it changed."""
+
+        new_values = self._slot_sentences(slot)
+
+        if new_values != old_values and self._changes:
+            self._changes.publish(
+                [
+                    *(Change(ChangeType.DELETE, s) for s in old_values),
+                    *(Change(ChangeType.INSERT, s) for s in new_values),
+                ]
+            )
+
+    def _set_slot_value(self, slot: INode, value: object) -> None:
+        """Replace the single child of a cardinality ONE node with a value."""
+
+        node = node_from_object(value, NodeCardinality.MANY)
+
+        for leaf in slot.children:
+            # Leaves of the same type are updated in place. Anything else is
+            # replaced, along with its children, like insert() would.
+            if (
+                leaf.node_type == node.node_type
+                and leaf.cardinality == NodeCardinality.MANY
+                and next(iter(leaf.children), None) is None
+            ):
+                leaf.set_value(value)
+                return
+            break
+
+        if self._expiry:
+            self._forget_expiry(slot.children)
+
+        slot.clear_children()
+        slot.add_child(node)
+
     def delete(self, sentence: str) -> bool:
         """Delete a sentence from the database and any data in its sub_tree."""
 
         if sentence == "":
             return False
 
-        nodes = parse_sentence(sentence)
+        return self._delete_nodes(parse_sentence(sentence))
+
+    def delete_path(self, path: Path) -> bool:
+        """Delete a path of values from the database and any data in its sub_tree."""
+
+        return self._delete_nodes(path_nodes(path))
+
+    def _delete_nodes(self, nodes: list[INode]) -> bool:
+        self._version += 1
+
+        if self._query_cache is not None:
+            self._query_cache.invalidate(node_keys(nodes))
 
         current_node = self._root
 
-        for i, node in enumerate(nodes):
+        for node in nodes[:-1]:
+            child = current_node.find_child(node.symbol)
 
-            if not current_node.has_child(node.symbol):
+            if child is None:
                 return False
 
-            current_node = current_node.get_child(node.symbol)
+            current_node = child
 
-            if i == len(nodes) - 2:
-                break
+        if self._expiry:
+            target = current_node.find_child(nodes[-1].symbol)
 
-        last_node = nodes[-1]
+            if target is not None:
+                self._forget_expiry([target])
+
+        if self._changes and self._changes.watches(nodes[0].symbol):
+            removed = current_node.find_child(nodes[-1].symbol)
+
+            if removed is None:
+                return False
 
-        return current_node.remove_child(last_node.symbol)
+            sentence = removed.get_path()
+            current_node.remove_child(removed.symbol)
+            self._changes.publish([Change(ChangeType.DELETE, sentence)])
+            return True
+
+        return current_node.remove_child(nodes[-1].symbol)
+
+    def iter_sentences(self, prefix: Union[str, Path, None] = None) -> Iterator[str]:
+        """Lazily yield the sentence of every fact (leaf) in the database.
+
+        Giving a prefix (a sentence or a path) limits the results to the facts below
+        it. Facts are produced with an explicit stack, so memory use grows with the
+        depth of the tree rather than the number of facts. Modifying the database
+        while iterating is not supported.
+        """
+
+        return self._iter_facts(
+            prefix,
+            "",
+            lambda text, node: text + node.symbol + _separator(node),
+            lambda text, node: text + node.symbol,
+        )
+
+    def iter_paths(
+        self, prefix: Union[str, Path, None] = None
+    ) -> Iterator[tuple[object, ...]]:
+        """Lazily yield the path of every fact (leaf) in the database.
+
+        Paths hold node values and ONE separator markers, the same form accepted by
+        insert_path(). Giving a prefix (a sentence or a path) limits the results to
+        the facts below it. Modifying the database while iterating is not supported.
+        """
+
+        return self._iter_facts(
+            prefix,
+            (),
+            lambda path, node: (
+                (*path, node.get_value(), NodeCardinality.ONE)
+                if node.cardinality == NodeCardinality.ONE
+                else (*path, node.get_value())
+            ),
+            lambda path, node: (*path, node.get_value()),
+        )
+
+    def _iter_facts(
+        self,
+        prefix: Union[str, Path, None],
+        initial: _T,
+        extend: Callable[[_T, INode], _T],
+        finish: Callable[[_T, INode], _R],
+    ) -> Iterator[_R]:
+        """Walk the leaves below a prefix.
+
+        extend() adds a node to the accumulated prefix of its children, and finish()
+        produces the result for a leaf from its parent's accumulated prefix.
+        """
+
+        start = self._root
+        accumulated = initial
+
+        if prefix:
+            keys = (
+                sentence_keys(prefix)
+                if isinstance(prefix, str)
+                else node_keys(path_nodes(prefix))
+            )
+            last_index = len(keys) - 1
+
+            for i, (symbol, cardinality, _) in enumerate(keys):
+                child = start.find_child(symbol)
+
+                if child is None or (
+                    i < last_index and child.cardinality != cardinality
+                ):
+                    return
+
+                if i < last_index:
+                    accumulated = extend(accumulated, child)
+
+                start = child
+
+            if next(iter(start.children), None) is None:
+                yield finish(accumulated, start)
+                return
+
+            accumulated = extend(accumulated, start)
+
+        stack: list[tuple[Iterator[INode], _T]] = [(iter(start.children), accumulated)]
+
+        while stack:
+            children, accumulated = stack[-1]
+            child = next(children, None)
+
+            if child is None:
+                stack.pop()
+                continue
+
+            grandchildren = iter(child.children)
+            first = next(grandchildren, None)
+
+            if first is None:
+                yield finish(accumulated, child)
+            else:
+                stack.append(
+                    (chain((first,), grandchildren), extend(accumulated, child))
+                )
 
     def clear(self) -> None:
         """Clear the contents of the database."""
+        self._version += 1
+
+        if self._query_cache is not None:
+            self._query_cache.clear()
+
+        self._timers = None
+        self._expiry.clear()
         self._root.clear_children()
 
+        if self._changes:
+            self._changes.publish([Change(ChangeType.CLEAR, "")])
+
+    def stats(self) -> TreeStats:
+        """Get statistics about the size and shape of the database tree.
+
+        Statistics are gathered with one walk of the tree and reused until the next
+        write through the database. Changes made directly to nodes are not tracked.
+        """
+
+        if self._stats is None or self._stats[0] != self._version:
+            self._stats = (self._version, collect_stats(self._root))
+
+        return self._stats[1]
+
+    def content_hash(self) -> bytes:
+        """Get a hash of every fact in the database.
+
+        Databases holding the same facts have equal hashes, whatever their storage
+        backend or insertion order. Each node caches the hash of its sub_tree until
+        a write below it, so hashing again after a write only revisits the written
+        path.
+        """
+
+        return self._root.content_hash()
+
+    def diff(self, other: RePraxisDatabase) -> Iterator[Change]:
+        """Yield the changes that turn this database into another one.
+
+        Facts only in the other database are yielded as insertions and facts only in
+        this database as deletions. Sub_trees with equal content hashes are skipped
+        without being visited, so similar databases are compared quickly.
+        """
+
+        stack: list[tuple[INode, INode, str]] = [(self._root, other._root, "")]
+
+        while stack:
+            old, new, prefix = stack.pop()
+
+            if old.content_hash() == new.content_hash():
+                continue
+
+            old_children = {child.symbol: child for child in old.children}
+            new_children = {child.symbol: child for child in new.children}
+
+            if old is not self._root and (
+                old.node_type != new.node_type
+                or old.cardinality != new.cardinality
+                or old.get_value() != new.get_value()
+                or not old_children
+                or not new_children
+            ):
+                # The nodes hold different data, or one of them is a fact. Report
+                # the facts below each side.
+                yield from _facts_below(old, prefix, ChangeType.DELETE)
+                yield from _facts_below(new, prefix, ChangeType.INSERT)
+                continue
+
+            child_prefix = prefix if old is self._root else _child_prefix(old, prefix)
+
+            for symbol, old_child in old_children.items():
+                new_child = new_children.get(symbol)
+
+                if new_child is None:
+                    yield from _facts_below(old_child, child_prefix, ChangeType.DELETE)
+                else:
+                    stack.append((old_child, new_child, child_prefix))
+
+            for symbol, new_child in new_children.items():
+                if symbol not in old_children:
+                    yield from _facts_below(new_child, child_prefix, ChangeType.INSERT)
+
     def __contains__(self, key: str) -> bool:
         return self.assert_statement(key)
+
+
+def _separator(node: INode) -> str:
+    return "!" if node.cardinality == NodeCardinality.ONE else "."
+
+
+def _child_prefix(node: INode, prefix: str) -> str:
+    return prefix + node.symbol + _separator(node)
+
+
+def _facts_below(node: INode, prefix: str, change_type: ChangeType) -> Iterator[Change]:
+    """Yield a change for every fact at or below a node."""
+
+    stack: list[tuple[INode, str]] = [(node, prefix)]
+
+    while stack:
+        current, current_prefix = stack.pop()
+        children = list(current.children)
+
+        if not children:
+            yield Change(change_type, current_prefix + current.symbol)
+            continue
+
+        child_prefix = _child_prefix(current, current_prefix)
+        stack.extend((child, child_prefix) for child in reversed(children))
+
+
+def _keys_to_sentence(keys: Sequence[SentenceKey]) -> str:
+    return "".join(
+        symbol + ("!" if cardinality == NodeCardinality.ONE else ".")
+        for symbol, cardinality, _ in keys[:-1]
+    ) + (keys[-1][0] if keys else "")
@@ -2,11 +2,17 @@
 
 """
 
-from typing import Optional
+import re
+from functools import lru_cache
+from typing import Iterable, Optional
 
 from repraxis.nodes.base_types import INode, NodeCardinality, NodeType
 from repraxis.nodes.nodes import FloatNode, IntNode, SymbolNode, VariableNode
 
+_SEPARATORS = re.compile(r"([.!])")
+_DIGIT = re.compile(r"\d")
+_NON_FINITE = frozenset(("inf", "infinity", "nan"))
+
 
 def sentence_has_variables(sentence: str) -> bool:
     """Return True if the sentence contains any variables."""
@@ -52,7 +58,34 @@ def create_sentence(nodes: list[INode]) -> str:
 def parse_sentence(sentence: str) -> list[INode]:
     """Breakup a database sentence into a series of nodes."""
 
-    nodes: list[INode] = []
+    return [
+        node_from_token(token, cardinality)
+        for token, cardinality in split_sentence(sentence)
+    ]
+
+
+def split_sentence(sentence: str) -> list[tuple[str, NodeCardinality]]:
+    """Breakup a database sentence into (token, cardinality) pairs.
+
+    Literal brackets are removed from the tokens.
+    """
+
+    if "[" not in sentence and "]" not in sentence:
+        # Without literals, the separators can be split on directly.
+        parts = _SEPARATORS.split(sentence)
+        return [
+            (
+                parts[i],
+                (
+                    NodeCardinality.ONE
+                    if i + 1 < len(parts) and parts[i + 1] == "!"
+                    else NodeCardinality.MANY
+                ),
+            )
+            for i in range(0, len(parts), 2)
+        ]
+
+    tokens: list[tuple[str, NodeCardinality]] = []
 
     current_token: str = ""
     processing_literal = False
@@ -67,7 +100,7 @@ def parse_sentence(sentence: str) -> list[INode]:
         elif (char == "!" or char == ".") and not processing_literal:
             cardinality = NodeCardinality.ONE if char == "!" else NodeCardinality.MANY
 
-            nodes.append(node_from_token(current_token, cardinality))
+            tokens.append((current_token, cardinality))
 
             current_token = ""
         else:
@@ -76,9 +109,29 @@ def parse_sentence(sentence: str) -> list[INode]:
     if processing_literal:
         raise ValueError(f"Could not find closing ']' for value in: {sentence!r}")
 
-    nodes.append(node_from_token(current_token, NodeCardinality.MANY))
+    tokens.append((current_token, NodeCardinality.MANY))
+
+    return tokens
+
 
-    return nodes
+SentenceKey = tuple[str, NodeCardinality, NodeType]
+
+
+@lru_cache(maxsize=4096)
+def sentence_keys(sentence: str) -> tuple[SentenceKey, ...]:
+    """Get the (symbol, cardinality, node type) of each token in a sentence.
+
+    Results are cached, so repeatedly looking up the same sentence does not parse it
+    or allocate nodes again.
+    """
+
+    return node_keys(parse_sentence(sentence))
+
+
+def node_keys(nodes: Iterable[INode]) -> tuple[SentenceKey, ...]:
+    """Get the (symbol, cardinality, node type) of each node."""
+
+    return tuple((node.symbol, node.cardinality, node.node_type) for node in nodes)
 
 
 def node_from_token(token: str, cardinality: NodeCardinality) -> INode:
@@ -101,6 +154,13 @@ def node_from_token(token: str, cardinality: NodeCardinality) -> INode:
     if token[0] == "?":
         return VariableNode(token, cardinality)
 
+    # Tokens without digits can only be numbers if they spell out inf or nan.
+    if (
+        _DIGIT.search(token) is None
+        and token.strip().lstrip("+-").lower() not in _NON_FINITE
+    ):
+        return SymbolNode(token, cardinality)
+
     if isinstance(value := try_parse_int(token), int):
         return IntNode(value, cardinality)
 
@@ -110,16 +170,18 @@ def node_from_token(token: str, cardinality: NodeCardinality) -> INode:
     return SymbolNode(token, cardinality)
 
 
-def node_from_object(obj: object) -> INode:
+def node_from_object(
+    obj: object, cardinality: NodeCardinality = NodeCardinality.NONE
+) -> INode:
     """Create a new node from a given string token."""
 
     if isinstance(obj, int):
-        return IntNode(obj, NodeCardinality.NONE)
+        return IntNode(obj, cardinality)
 
     if isinstance(obj, float):
-        return FloatNode(obj, NodeCardinality.NONE)
+        return FloatNode(obj, cardinality)
 
     if isinstance(obj, str):
-        return SymbolNode(obj, NodeCardinality.NONE)
+        return SymbolNode(obj, cardinality)
 
     raise TypeError(f"Cannot convert object of type {type(obj)} into a node.")
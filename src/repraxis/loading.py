@@ -0,0 +1,168 @@
+"""Bulk Loading.
+
+Helpers for loading large files of sentences into a database. Files are read in large
+chunks and split into lines without reading the whole file into memory. The database
+performs the insertion (see RePraxisDatabase.load_sentences()), while this module
+handles reading and reporting.
+
+"""
+
+from __future__ import annotations
+
+import os
+from typing import BinaryIO, Callable, Iterator, TextIO, Union
+
+from repraxis.helpers import node_from_token
+from repraxis.nodes.base_types import INode, NodeCardinality, NodeType
+
+LoadSource = Union[str, os.PathLike, BinaryIO, TextIO]
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+class LineError:
+    """A line that could not be loaded."""
+
+    __slots__ = ("line_number", "line", "message")
+
+    line_number: int
+    line: str
+    message: str
+
+    def __init__(self, line_number: int, line: str, message: str) -> None:
+        self.line_number = line_number
+        self.line = line
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f"LineError({self.line_number}, {self.line!r}, {self.message!r})"
+
+
+class LoadReport:
+    """A summary of loading sentences into a database."""
+
+    __slots__ = ("lines", "loaded", "skipped", "errors", "bytes_read", "seconds")
+
+    lines: int
+    loaded: int
+    skipped: int
+    errors: list[LineError]
+    bytes_read: int
+    seconds: float
+
+    def __init__(self) -> None:
+        self.lines = 0
+        self.loaded = 0
+        self.skipped = 0
+        self.errors = []
+        self.bytes_read = 0
+        self.seconds = 0.0
+
+    @property
+    def success(self) -> bool:
+        """Were all lines loaded without errors."""
+        return len(self.errors) == 0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        """Loading throughput in megabytes (10**6 bytes) per second."""
+
+        if self.seconds <= 0:
+            return 0.0
+
+        return self.bytes_read / 1e6 / self.seconds
+
+    def __repr__(self) -> str:
+        return (
+            f"LoadReport(loaded={self.loaded}, skipped={self.skipped}, "
+            f"errors={len(self.errors)}, bytes_read={self.bytes_read}, "
+            f"seconds={self.seconds:.3f})"
+        )
+
+
+class TokenMemo:
+    """Creates nodes from tokens, remembering how each token was parsed.
+
+    Large files repeat the same tokens many times. Remembering the node class and
+    value of each token skips the number parsing that node_from_token() performs.
+    """
+
+    __slots__ = ("_max_size", "_entries")
+
+    _max_size: int
+    _entries: dict[str, tuple[Callable[[object, NodeCardinality], INode], object]]
+
+    def __init__(self, max_size: int = 100_000) -> None:
+        self._max_size = max_size
+        self._entries = {}
+
+    def node(self, token: str, cardinality: NodeCardinality) -> INode:
+        """Create a node for a token."""
+
+        entry = self._entries.get(token)
+
+        if entry is not None:
+            return entry[0](entry[1], cardinality)
+
+        node = node_from_token(token, cardinality)
+
+        if node.node_type != NodeType.VARIABLE:
+            if len(self._entries) >= self._max_size:
+                self._entries.clear()
+
+            self._entries[token] = (type(node), node.get_value())  # type: ignore
+
+        return node
+
+
+def iter_lines(
+    source: LoadSource, report: LoadReport, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Union[str, bytes]]:
+    """Yield the lines of a file path or stream, reading it in chunks.
+
+    Lines from binary sources are yielded undecoded so that decoding errors can be
+    reported per line. The number of bytes read is added to the report as reading
+    progresses.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as stream:
+            yield from _iter_binary_lines(stream, report, chunk_size)
+        return
+
+    if isinstance(source.read(0), bytes):
+        yield from _iter_binary_lines(source, report, chunk_size)  # type: ignore
+    else:
+        yield from _iter_text_lines(source, report, chunk_size)  # type: ignore
+
+
+def _iter_binary_lines(
+    stream: BinaryIO, report: LoadReport, chunk_size: int
+) -> Iterator[bytes]:
+    remainder = b""
+
+    while chunk := stream.read(chunk_size):
+        report.bytes_read += len(chunk)
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+
+        yield from lines
+
+    if remainder:
+        yield remainder
+
+
+def _iter_text_lines(
+    stream: TextIO, report: LoadReport, chunk_size: int
+) -> Iterator[str]:
+    remainder = ""
+
+    while chunk := stream.read(chunk_size):
+        report.bytes_read += len(chunk.encode("utf-8"))
+        lines = (remainder + chunk).split("\n")
+        remainder = lines.pop()
+
+        yield from lines
+
+    if remainder:
+        yield remainder
@@ -0,0 +1,253 @@
+"""Striped Locks.
+
+Locks used by ThreadSafeDatabase (see repraxis.thread_safe). The top-level subtrees of
+a database (the children of the root node) are spread across a fixed number of
+stripes, each guarded by a readers-writer lock. Readers lock the stripes of the
+subtrees they read, so any number of them can run at once, and writers only block the
+readers of the subtrees they change. Writers are also serialized by a single reentrant
+mutex, since they share the database's bookkeeping (its clock, version, caches and
+change feed).
+
+Stripes are always acquired in index order, so threads cannot deadlock on them. A
+thread that already holds stripes may only nest reads and writes that those stripes
+cover, and threads holding the writer mutex may read anything, since no other thread
+can be writing.
+
+"""
+
+from __future__ import annotations
+
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+
+class RWLock:
+    """A readers-writer lock that prefers writers, so they are not starved."""
+
+    __slots__ = ("_condition", "_readers", "_writing", "_writers_waiting")
+
+    _condition: threading.Condition
+    _readers: int
+    _writing: bool
+    _writers_waiting: int
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> None:
+        """Wait until no writer holds or is waiting for the lock, then share it."""
+
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+
+            self._readers += 1
+
+    def release_read(self) -> None:
+        """Release a shared hold on the lock."""
+
+        with self._condition:
+            self._readers -= 1
+
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        """Wait until the lock is free, then hold it exclusively."""
+
+        with self._condition:
+            self._writers_waiting += 1
+
+            while self._writing or self._readers:
+                self._condition.wait()
+
+            self._writers_waiting -= 1
+            self._writing = True
+
+    def release_write(self) -> None:
+        """Release an exclusive hold on the lock."""
+
+        with self._condition:
+            self._writing = False
+            self._condition.notify_all()
+
+
+class _ThreadState(threading.local):
+    """What the current thread holds of a StripedLock."""
+
+    writer_depth = 0
+    held: Optional[dict[int, bool]] = None
+
+
+class StripedLock:
+    """Readers-writer locks for the top-level subtrees of a database.
+
+    Heads are the first symbols of the sentences being read or written. A head of None
+    stands for a sentence starting with a variable, which could touch any subtree, so
+    it locks every stripe.
+    """
+
+    __slots__ = ("_stripes", "_writer", "_local")
+
+    _stripes: tuple[RWLock, ...]
+    _writer: threading.RLock
+    _local: _ThreadState
+
+    def __init__(self, stripe_count: int = 16) -> None:
+        if stripe_count < 1:
+            raise ValueError("A striped lock needs at least one stripe.")
+
+        self._stripes = tuple(RWLock() for _ in range(stripe_count))
+        self._writer = threading.RLock()
+        self._local = _ThreadState()
+
+    @property
+    def stripe_count(self) -> int:
+        """The number of stripes."""
+        return len(self._stripes)
+
+    def stripe_for(self, head: str) -> int:
+        """Get the index of the stripe guarding facts starting with a symbol."""
+
+        return zlib.crc32(head.encode("utf-8")) % len(self._stripes)
+
+    def acquire_exclusive(self) -> None:
+        """Acquire the writer mutex, without locking out readers. It is reentrant."""
+
+        local = self._local
+
+        if local.held and not all(local.held.values()):
+            # Waiting for the mutex could deadlock with a writer waiting for the
+            # stripes this thread reads.
+            raise RuntimeError(
+                "Cannot write to the database while reading it on the same thread."
+            )
+
+        self._writer.acquire()
+        local.writer_depth += 1
+
+    def release_exclusive(self) -> None:
+        """Release the writer mutex."""
+
+        self._local.writer_depth -= 1
+        self._writer.release()
+
+    def acquire(
+        self, heads: Iterable[Optional[str]], write: bool
+    ) -> Optional[list[RWLock]]:
+        """Acquire the stripes of the given heads and return them for release().
+
+        Writers must hold the writer mutex. Returns None when the current thread
+        already holds the stripes it needs, or is a writer and only needs to read.
+        """
+
+        local = self._local
+
+        if not write and local.writer_depth:
+            # No other thread can be writing.
+            return None
+
+        stripes = self._indices(heads)
+        held = local.held
+
+        if held:
+            # Nested reads and writes reuse the stripes the thread already holds.
+            if any(
+                index not in held or (write and not held[index]) for index in stripes
+            ):
+                raise RuntimeError(
+                    "Nested database access needs stripes that the current thread "
+                    "does not hold."
+                )
+
+            return None
+
+        acquired: list[RWLock] = []
+        local.held = {index: write for index in stripes}
+
+        try:
+            for index in stripes:
+                stripe = self._stripes[index]
+
+                if write:
+                    stripe.acquire_write()
+                else:
+                    stripe.acquire_read()
+
+                acquired.append(stripe)
+        except BaseException:
+            self._release(acquired, write)
+            raise
+
+        return acquired
+
+    def release(self, stripes: Optional[list[RWLock]], write: bool) -> None:
+        """Release the stripes returned by acquire()."""
+
+        if stripes is not None:
+            self._release(stripes, write)
+
+    def _release(self, stripes: list[RWLock], write: bool) -> None:
+        for stripe in reversed(stripes):
+            if write:
+                stripe.release_write()
+            else:
+                stripe.release_read()
+
+        self._local.held = None
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the writer mutex, without locking out readers."""
+
+        self.acquire_exclusive()
+
+        try:
+            yield
+        finally:
+            self.release_exclusive()
+
+    @contextmanager
+    def reading(self, heads: Iterable[Optional[str]]) -> Iterator[None]:
+        """Share the stripes of the given heads for the duration of the block."""
+
+        stripes = self.acquire(heads, write=False)
+
+        try:
+            yield
+        finally:
+            self.release(stripes, write=False)
+
+    @contextmanager
+    def writing(self, heads: Iterable[Optional[str]]) -> Iterator[None]:
+        """Hold the writer mutex and the stripes of the given heads exclusively."""
+
+        self.acquire_exclusive()
+
+        try:
+            stripes = self.acquire(heads, write=True)
+
+            try:
+                yield
+            finally:
+                self.release(stripes, write=True)
+        finally:
+            self.release_exclusive()
+
+    def _indices(self, heads: Iterable[Optional[str]]) -> list[int]:
+        """Get the sorted indices of the stripes guarding the given heads."""
+
+        indices: set[int] = set()
+
+        for head in heads:
+            if head is None:
+                return list(range(len(self._stripes)))
+
+            indices.add(self.stripe_for(head))
+
+        return sorted(indices)
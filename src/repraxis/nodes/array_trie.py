@@ -0,0 +1,736 @@
+"""Array-Backed Trie Storage.
+
+The default database tree allocates a Python object, a dict and a parent pointer for
+every token of every sentence. The ArrayTrie stores the same tree in parallel arrays
+(one entry per node) and a single hash table mapping (parent, symbol) pairs to child
+slots. Freed slots are recycled through a free list. Nodes are exposed to the rest of
+the library through lightweight ArrayNode views that satisfy the INode protocol, so the
+database and the query engine work with either storage backend.
+
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from repraxis.nodes.base_types import INode, NodeCardinality, NodeType, node_digest
+from repraxis.nodes.nodes import FloatNode, IntNode, SymbolNode, VariableNode
+from repraxis.nodes.sorted_children import KeyRange
+
+_NODE_TYPES: tuple[NodeType, ...] = tuple(NodeType)
+_NODE_TYPE_CODES: dict[NodeType, int] = {t: i for i, t in enumerate(_NODE_TYPES)}
+_CARDINALITIES: tuple[NodeCardinality, ...] = tuple(NodeCardinality)
+_CARDINALITY_CODES: dict[NodeCardinality, int] = {
+    c: i for i, c in enumerate(_CARDINALITIES)
+}
+
+_INT_CODE = _NODE_TYPE_CODES[NodeType.INT]
+_FLOAT_CODE = _NODE_TYPE_CODES[NodeType.FLOAT]
+_SYMBOL_CODE = _NODE_TYPE_CODES[NodeType.SYMBOL]
+_NONE_CODE = _CARDINALITY_CODES[NodeCardinality.NONE]
+_ONE_CODE = _CARDINALITY_CODES[NodeCardinality.ONE]
+
+_FLOAT_BITS = struct.Struct("<d")
+_INT_BITS = struct.Struct("<q")
+
+_NULL = -1
+
+# Integers outside this range do not fit the int64 number column.
+_MIN_INT64 = -(1 << 63)
+_MAX_INT64 = (1 << 63) - 1
+
+
+def _float_to_bits(value: float) -> int:
+    return _INT_BITS.unpack(_FLOAT_BITS.pack(value))[0]
+
+
+def _bits_to_float(bits: int) -> float:
+    return _FLOAT_BITS.unpack(_INT_BITS.pack(bits))[0]
+
+
+class ArrayTrie:
+    """A database tree stored in parallel arrays.
+
+    Each node occupies one slot across the column arrays below. Children form a
+    doubly-linked sibling list (preserving insertion order like the dict-backed
+    nodes) and are located by symbol through one shared hash table keyed by
+    ``(parent_index << 32) | symbol_id``. Symbols are interned and reference counted
+    so that churning values (counters, reputations) do not grow the symbol table.
+
+    Use the trie as a database backend by passing its root to the database::
+
+        db = RePraxisDatabase(ArrayTrie().root)
+    """
+
+    __slots__ = (
+        "_types",
+        "_cardinalities",
+        "_symbol_ids",
+        "_numbers",
+        "_big_ints",
+        "_parents",
+        "_first_children",
+        "_last_children",
+        "_next_siblings",
+        "_prev_siblings",
+        "_generations",
+        "_free_slots",
+        "_child_slots",
+        "_symbols",
+        "_symbol_lookup",
+        "_symbol_refs",
+        "_free_symbols",
+        "_hashes",
+        "_size",
+    )
+
+    _types: array[int]
+    _cardinalities: array[int]
+    _symbol_ids: array[int]
+    _numbers: array[int]
+    _big_ints: dict[int, int]
+    _parents: array[int]
+    _first_children: array[int]
+    _last_children: array[int]
+    _next_siblings: array[int]
+    _prev_siblings: array[int]
+    _generations: array[int]
+    _free_slots: array[int]
+    _child_slots: dict[int, int]
+    _symbols: list[str]
+    _symbol_lookup: dict[str, int]
+    _symbol_refs: array[int]
+    _free_symbols: array[int]
+    _hashes: list[Optional[bytes]]
+    _size: int
+
+    def __init__(self) -> None:
+        self._types = array("b")
+        self._cardinalities = array("b")
+        self._symbol_ids = array("i")
+        self._numbers = array("q")
+        self._big_ints = {}
+        self._parents = array("i")
+        self._first_children = array("i")
+        self._last_children = array("i")
+        self._next_siblings = array("i")
+        self._prev_siblings = array("i")
+        self._generations = array("I")
+        self._free_slots = array("i")
+        self._child_slots = {}
+        self._symbols = []
+        self._symbol_lookup = {}
+        self._symbol_refs = array("i")
+        self._free_symbols = array("i")
+        self._hashes = []
+        self._size = 0
+
+        self._allocate(
+            _SYMBOL_CODE, _CARDINALITY_CODES[NodeCardinality.MANY], "root", 0
+        )
+
+    @property
+    def root(self) -> ArrayNode:
+        """The root node of the tree."""
+
+        return ArrayNode(self, 0, self._generations[0])
+
+    @property
+    def capacity(self) -> int:
+        """The number of node slots allocated, including free ones."""
+
+        return len(self._types)
+
+    @property
+    def estimated_bytes(self) -> int:
+        """An estimate of the memory used by the trie, including free slots."""
+
+        columns = (
+            self._types,
+            self._cardinalities,
+            self._symbol_ids,
+            self._numbers,
+            self._parents,
+            self._first_children,
+            self._last_children,
+            self._next_siblings,
+            self._prev_siblings,
+            self._generations,
+            self._free_slots,
+            self._symbol_refs,
+            self._free_symbols,
+        )
+
+        return (
+            sum(sys.getsizeof(column) for column in columns)
+            # Keys and child indices in the child table are int objects.
+            + sys.getsizeof(self._big_ints)
+            + sum(sys.getsizeof(number) for number in self._big_ints.values())
+            + sys.getsizeof(self._child_slots)
+            + len(self._child_slots) * 2 * sys.getsizeof(1 << 40)
+            + sys.getsizeof(self._symbols)
+            + sys.getsizeof(self._hashes)
+            + sum(sys.getsizeof(h) for h in self._hashes if h is not None)
+            + sys.getsizeof(self._symbol_lookup)
+            + sum(sys.getsizeof(symbol) for symbol in self._symbols)
+        )
+
+    def __len__(self) -> int:
+        return self._size
+
+    def node_at(self, index: int) -> ArrayNode:
+        """Get a view of the node stored in the given slot."""
+
+        return ArrayNode(self, index, self._generations[index])
+
+    def _intern(self, symbol: str) -> int:
+        symbol_id = self._symbol_lookup.get(symbol)
+
+        if symbol_id is None:
+            if self._free_symbols:
+                symbol_id = self._free_symbols.pop()
+                self._symbols[symbol_id] = symbol
+                self._symbol_refs[symbol_id] = 0
+            else:
+                symbol_id = len(self._symbols)
+                self._symbols.append(symbol)
+                self._symbol_refs.append(0)
+            self._symbol_lookup[symbol] = symbol_id
+
+        self._symbol_refs[symbol_id] += 1
+        return symbol_id
+
+    def _release_symbol(self, symbol_id: int) -> None:
+        self._symbol_refs[symbol_id] -= 1
+
+        if self._symbol_refs[symbol_id] == 0:
+            del self._symbol_lookup[self._symbols[symbol_id]]
+            self._symbols[symbol_id] = ""
+            self._free_symbols.append(symbol_id)
+
+    def _allocate(
+        self, type_code: int, cardinality_code: int, symbol: str, number: int
+    ) -> int:
+        big_int: Optional[int] = None
+
+        if not _MIN_INT64 <= number <= _MAX_INT64:
+            # Integers too large for the number column are kept aside by slot.
+            big_int, number = number, 0
+
+        symbol_id = self._intern(symbol)
+
+        if self._free_slots:
+            index = self._free_slots.pop()
+            self._types[index] = type_code
+            self._cardinalities[index] = cardinality_code
+            self._symbol_ids[index] = symbol_id
+            self._numbers[index] = number
+            self._parents[index] = _NULL
+            self._first_children[index] = _NULL
+            self._last_children[index] = _NULL
+            self._next_siblings[index] = _NULL
+            self._prev_siblings[index] = _NULL
+            self._hashes[index] = None
+        else:
+            index = len(self._types)
+            self._types.append(type_code)
+            self._cardinalities.append(cardinality_code)
+            self._symbol_ids.append(symbol_id)
+            self._numbers.append(number)
+            self._parents.append(_NULL)
+            self._first_children.append(_NULL)
+            self._last_children.append(_NULL)
+            self._next_siblings.append(_NULL)
+            self._prev_siblings.append(_NULL)
+            self._generations.append(0)
+            self._hashes.append(None)
+
+        if big_int is not None:
+            self._big_ints[index] = big_int
+
+        self._size += 1
+        return index
+
+    def _allocate_from(self, node: INode) -> int:
+        node_type = node.node_type
+        value = node.get_value()
+
+        if node_type == NodeType.INT:
+            number = value
+        elif node_type == NodeType.FLOAT:
+            number = _float_to_bits(value)  # type: ignore[arg-type]
+        else:
+            number = 0
+
+        return self._allocate(
+            _NODE_TYPE_CODES[node_type],
+            _CARDINALITY_CODES[node.cardinality],
+            node.symbol,
+            number,  # type: ignore[arg-type]
+        )
+
+    def _find_child(self, parent: int, symbol: str) -> int:
+        symbol_id = self._symbol_lookup.get(symbol)
+
+        if symbol_id is None:
+            return _NULL
+
+        return self._child_slots.get((parent << 32) | symbol_id, _NULL)
+
+    def _link(self, parent: int, child: int) -> None:
+        self._child_slots[(parent << 32) | self._symbol_ids[child]] = child
+        self._parents[child] = parent
+
+        last = self._last_children[parent]
+        self._prev_siblings[child] = last
+        self._next_siblings[child] = _NULL
+
+        if last == _NULL:
+            self._first_children[parent] = child
+        else:
+            self._next_siblings[last] = child
+
+        self._last_children[parent] = child
+        self._invalidate_hash(parent)
+
+    def _unlink(self, child: int) -> None:
+        parent = self._parents[child]
+        prev_sibling = self._prev_siblings[child]
+        next_sibling = self._next_siblings[child]
+
+        if prev_sibling == _NULL:
+            self._first_children[parent] = next_sibling
+        else:
+            self._next_siblings[prev_sibling] = next_sibling
+
+        if next_sibling == _NULL:
+            self._last_children[parent] = prev_sibling
+        else:
+            self._prev_siblings[next_sibling] = prev_sibling
+
+        del self._child_slots[(parent << 32) | self._symbol_ids[child]]
+        self._parents[child] = _NULL
+        self._invalidate_hash(parent)
+
+    def _free_descendants(self, index: int) -> None:
+        """Release every slot below the given node (iteratively)."""
+
+        self._invalidate_hash(index)
+        stack = [index]
+
+        while stack:
+            current = stack.pop()
+            child = self._first_children[current]
+
+            while child != _NULL:
+                stack.append(child)
+                next_sibling = self._next_siblings[child]
+                del self._child_slots[(current << 32) | self._symbol_ids[child]]
+                self._free(child)
+                child = next_sibling
+
+            self._first_children[current] = _NULL
+            self._last_children[current] = _NULL
+
+    def _free(self, index: int) -> None:
+        self._release_symbol(self._symbol_ids[index])
+        self._parents[index] = _NULL
+        self._hashes[index] = None
+        self._big_ints.pop(index, None)
+        self._generations[index] = (self._generations[index] + 1) & 0xFFFFFFFF
+        self._free_slots.append(index)
+        self._size -= 1
+
+    def _invalidate_hash(self, index: int) -> None:
+        """Drop the cached hashes of a node and its ancestors."""
+
+        hashes = self._hashes
+
+        while index != _NULL and hashes[index] is not None:
+            hashes[index] = None
+            index = self._parents[index]
+
+    def _content_hash(self, index: int) -> bytes:
+        """Get the content hash of a node, computing any that are missing."""
+
+        hashes = self._hashes
+        stack: list[tuple[int, bool]] = [(index, False)]
+
+        while stack:
+            current, expanded = stack.pop()
+
+            if hashes[current] is not None:
+                continue
+
+            if expanded:
+                child_digests: list[bytes] = []
+                child = self._first_children[current]
+
+                while child != _NULL:
+                    child_digests.append(hashes[child])  # type: ignore[arg-type]
+                    child = self._next_siblings[child]
+
+                node = ArrayNode(self, current, self._generations[current])
+                hashes[current] = node_digest(
+                    _NODE_TYPES[self._types[current]],
+                    _CARDINALITIES[self._cardinalities[current]],
+                    node.get_value(),
+                    child_digests,
+                )
+            else:
+                stack.append((current, True))
+                child = self._first_children[current]
+
+                while child != _NULL:
+                    stack.append((child, False))
+                    child = self._next_siblings[child]
+
+        return hashes[index]  # type: ignore[return-value]
+
+    def _copy_into(self, parent: int, node: INode) -> int:
+        """Copy a node and its subtree under the given parent slot."""
+
+        top = self._allocate_from(node)
+        self._link(parent, top)
+
+        stack: list[tuple[int, INode]] = [(top, node)]
+
+        while stack:
+            index, source = stack.pop()
+            for child in source.children:
+                child_index = self._allocate_from(child)
+                self._link(index, child_index)
+                stack.append((child_index, child))
+
+        return top
+
+
+class ArrayNode:
+    """A view of a single node stored in an ArrayTrie.
+
+    Views are cheap to create and hold no data of their own. A view becomes stale once
+    the slot it refers to is freed; stale views report no parent or children.
+    """
+
+    __slots__ = ("_trie", "_index", "_generation")
+
+    _trie: ArrayTrie
+    _index: int
+    _generation: int
+
+    def __init__(self, trie: ArrayTrie, index: int, generation: int) -> None:
+        self._trie = trie
+        self._index = index
+        self._generation = generation
+
+    @property
+    def trie(self) -> ArrayTrie:
+        """The trie holding this node."""
+
+        return self._trie
+
+    @property
+    def index(self) -> int:
+        """The slot this node occupies in its trie."""
+
+        return self._index
+
+    @property
+    def is_alive(self) -> bool:
+        """Is the slot still occupied by the node this view was created for."""
+
+        return self._trie._generations[self._index] == self._generation
+
+    @property
+    def node_type(self) -> NodeType:
+        """The type of data held in the node."""
+
+        return _NODE_TYPES[self._trie._types[self._index]]
+
+    @property
+    def symbol(self) -> str:
+        """Get the symbol associated with the node in the database."""
+
+        trie = self._trie
+        return trie._symbols[trie._symbol_ids[self._index]]
+
+    @property
+    def cardinality(self) -> NodeCardinality:
+        """How many children is the node allowed to have at one time."""
+
+        return _CARDINALITIES[self._trie._cardinalities[self._index]]
+
+    @property
+    def children(self) -> Iterable[INode]:
+        """The children of the node."""
+
+        return self._iter_children()
+
+    def _iter_children(self) -> Iterator[INode]:
+        if not self.is_alive:
+            return
+
+        trie = self._trie
+        child = trie._first_children[self._index]
+
+        while child != _NULL:
+            next_sibling = trie._next_siblings[child]
+            yield ArrayNode(trie, child, trie._generations[child])
+            child = next_sibling
+
+    @property
+    def parent(self) -> Optional[INode]:
+        """A reference to the node's parent node."""
+
+        trie = self._trie
+
+        if not self.is_alive:
+            return None
+
+        parent = trie._parents[self._index]
+
+        if parent == _NULL:
+            return None
+
+        return ArrayNode(trie, parent, trie._generations[parent])
+
+    def set_parent(self, node: Optional[INode]) -> None:
+        """Set parent node reference"""
+
+        raise TypeError(
+            "Array-backed nodes are positioned by their trie and cannot be re-parented."
+        )
+
+    @property
+    def value(self) -> object:
+        """The value associated with this node."""
+
+        return self.get_value()
+
+    def get_value(self) -> object:
+        """Get the value associated with this node."""
+
+        trie = self._trie
+        type_code = trie._types[self._index]
+
+        if type_code == _INT_CODE:
+            number = trie._numbers[self._index]
+            return trie._big_ints.get(self._index, number) if trie._big_ints else number
+
+        if type_code == _FLOAT_CODE:
+            return _bits_to_float(trie._numbers[self._index])
+
+        return trie._symbols[trie._symbol_ids[self._index]]
+
+    def set_value(self, value: object) -> None:
+        """Change the node's value in place, keeping its type and children.
+
+        The node is re-keyed within its parent when its symbol changes.
+        """
+
+        trie = self._trie
+        index = self._index
+        type_code = trie._types[index]
+
+        if type_code == _INT_CODE:
+            symbol = str(value)
+            number = value
+
+            if not _MIN_INT64 <= number <= _MAX_INT64:  # type: ignore[operator]
+                trie._big_ints[index] = number  # type: ignore[assignment]
+                number = 0
+            else:
+                trie._big_ints.pop(index, None)
+        elif type_code == _FLOAT_CODE:
+            symbol = f"[{value:.3}]"
+            number = _float_to_bits(value)  # type: ignore[arg-type]
+        else:
+            symbol = str(value)
+            number = 0
+
+        old_symbol_id = trie._symbol_ids[index]
+
+        if symbol != trie._symbols[old_symbol_id]:
+            parent = trie._parents[index]
+
+            if parent != _NULL and trie._find_child(parent, symbol) != _NULL:
+                raise ValueError(
+                    f"Cannot set value of {trie._symbols[old_symbol_id]} to "
+                    f"{symbol}. A sibling already has that symbol."
+                )
+
+            symbol_id = trie._intern(symbol)
+
+            if parent != _NULL:
+                del trie._child_slots[(parent << 32) | old_symbol_id]
+                trie._child_slots[(parent << 32) | symbol_id] = index
+
+            trie._symbol_ids[index] = symbol_id
+            trie._release_symbol(old_symbol_id)
+
+        trie._numbers[index] = number  # type: ignore[assignment]
+        trie._invalidate_hash(index)
+
+    def equal_to(self, other: INode) -> bool:
+        """Check if the node's value is equal to another."""
+
+        return self.copy().equal_to(other)
+
+    def not_equal_to(self, other: INode) -> bool:
+        """Check if the node's value is not equal to another."""
+
+        return self.copy().not_equal_to(other)
+
+    def less_than_equal_to(self, other: INode) -> bool:
+        """Check if the node's value is less than or equal to another."""
+
+        return self.copy().less_than_equal_to(other)
+
+    def greater_than_equal_to(self, other: INode) -> bool:
+        """Check if the node's value is greater than or equal to another."""
+
+        return self.copy().greater_than_equal_to(other)
+
+    def less_than(self, other: INode) -> bool:
+        """Check if the node's value is less than another."""
+
+        return self.copy().less_than(other)
+
+    def greater_than(self, other: INode) -> bool:
+        """Check if the node's value is greater than another."""
+
+        return self.copy().greater_than(other)
+
+    def add_child(self, node: INode) -> None:
+        """Add a child node to the node."""
+
+        trie = self._trie
+        cardinality = trie._cardinalities[self._index]
+
+        if cardinality == _NONE_CODE:
+            raise TypeError("Cannot add child to node with cardinality NONE.")
+
+        if cardinality == _ONE_CODE and trie._first_children[self._index] != _NULL:
+            raise TypeError("Cannot add additional child to node with cardinality ONE.")
+
+        # Adding a child with an existing symbol replaces the old child, matching the
+        # behavior of the dict-backed nodes.
+        self.remove_child(node.symbol)
+
+        trie._copy_into(self._index, node)
+
+    def remove_child(self, symbol: str) -> bool:
+        """Removes a child node from the node."""
+
+        trie = self._trie
+        child = trie._find_child(self._index, symbol)
+
+        if child == _NULL:
+            return False
+
+        trie._free_descendants(child)
+        trie._unlink(child)
+        trie._free(child)
+        return True
+
+    def get_child(self, symbol: str) -> INode:
+        """Get a child node."""
+
+        trie = self._trie
+        child = trie._find_child(self._index, symbol)
+
+        if child == _NULL:
+            raise KeyError(symbol)
+
+        return ArrayNode(trie, child, trie._generations[child])
+
+    def find_child(self, symbol: str) -> Optional[INode]:
+        """Get a child node, or None if there is no child with the symbol."""
+
+        trie = self._trie
+        child = trie._find_child(self._index, symbol)
+
+        if child == _NULL:
+            return None
+
+        return ArrayNode(trie, child, trie._generations[child])
+
+    def has_child(self, symbol: str) -> bool:
+        """Check if the node has a child."""
+
+        return self._trie._find_child(self._index, symbol) != _NULL
+
+    def children_in_range(self, key_range: KeyRange) -> Iterable[INode]:
+        """Get the children whose values are inside a range."""
+
+        return [c for c in self.children if key_range.contains(c.get_value())]
+
+    def clear_children(self) -> None:
+        """Remove all children and from this node."""
+
+        self._trie._free_descendants(self._index)
+
+    def get_path(self) -> str:
+        """Get the database sentence this node represents."""
+
+        trie = self._trie
+        parts: list[str] = []
+        current = self._index
+
+        while True:
+            parts.append(trie._symbols[trie._symbol_ids[current]])
+            parent = trie._parents[current]
+
+            if parent == _NULL or trie._parents[parent] == _NULL:
+                break
+
+            parts.append("!" if trie._cardinalities[parent] == _ONE_CODE else ".")
+            current = parent
+
+        return "".join(reversed(parts))
+
+    def content_hash(self) -> bytes:
+        """Get a hash of the node's type, value, cardinality and sub_tree.
+
+        Hashes are kept in a column of the trie until the node or its sub_tree
+        changes.
+        """
+
+        return self._trie._content_hash(self._index)
+
+    def copy(self) -> INode:
+        """Create a copy of the node."""
+
+        node_type = self.node_type
+        cardinality = self.cardinality
+        value = self.get_value()
+
+        if node_type == NodeType.INT:
+            return IntNode(value, cardinality)  # type: ignore[arg-type]
+
+        if node_type == NodeType.FLOAT:
+            return FloatNode(value, cardinality)  # type: ignore[arg-type]
+
+        if node_type == NodeType.VARIABLE:
+            return VariableNode(value, cardinality)  # type: ignore[arg-type]
+
+        return SymbolNode(value, cardinality)  # type: ignore[arg-type]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ArrayNode):
+            return NotImplemented
+
+        return (
+            self._trie is other._trie
+            and self._index == other._index
+            and self._generation == other._generation
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self._trie), self._index, self._generation))
+
+    def __repr__(self) -> str:
+        return f"ArrayNode({self.get_path()!r})"
@@ -4,9 +4,13 @@
 
 from __future__ import annotations
 
+import hashlib
+import struct
 from abc import ABC, abstractmethod
 from enum import Enum, auto
-from typing import Generic, Iterable, Optional, Protocol, TypeVar
+from typing import Generic, Iterable, Optional, Protocol, TypeVar, Union, cast
+
+from repraxis.nodes.sorted_children import KeyRange, SortedChildMap
 
 
 class NodeType(Enum):
@@ -76,6 +80,12 @@ class INode(Protocol):
 
         raise NotADirectoryError()
 
+    @abstractmethod
+    def set_value(self, value: object) -> None:
+        """Change the node's value in place, keeping its type and children."""
+
+        raise NotImplementedError()
+
     @abstractmethod
     def equal_to(self, other: INode) -> bool:
         """Check if the node's value is equal to another."""
@@ -130,12 +140,28 @@ class INode(Protocol):
 
         raise NotImplementedError()
 
+    @abstractmethod
+    def find_child(self, symbol: str) -> Optional[INode]:
+        """Get a child node, or None if there is no child with the symbol."""
+
+        raise NotImplementedError()
+
     @abstractmethod
     def has_child(self, symbol: str) -> bool:
         """Check if the node has a child."""
 
         raise NotImplementedError()
 
+    @abstractmethod
+    def children_in_range(self, key_range: KeyRange) -> Iterable[INode]:
+        """Get the children whose values are inside a range.
+
+        Nodes with sorted children find them with bisect lookups. Others check every
+        child.
+        """
+
+        raise NotImplementedError()
+
     @abstractmethod
     def clear_children(self) -> None:
         """Remove all children and from this node."""
@@ -148,6 +174,15 @@ class INode(Protocol):
 
         raise NotImplementedError()
 
+    @abstractmethod
+    def content_hash(self) -> bytes:
+        """Get a hash of the node's type, value, cardinality and sub_tree.
+
+        Nodes holding equal data have equal hashes, whatever their storage backend.
+        """
+
+        raise NotImplementedError()
+
     @abstractmethod
     def copy(self) -> INode:
         """Create a copy of the node."""
@@ -155,6 +190,37 @@ class INode(Protocol):
         raise NotImplementedError()
 
 
+_FLOAT_BYTES = struct.Struct("<d")
+
+
+def node_digest(
+    node_type: NodeType,
+    cardinality: NodeCardinality,
+    value: object,
+    child_digests: Iterable[bytes],
+) -> bytes:
+    """Hash a node's data together with the content hashes of its children.
+
+    Children are hashed in sorted order, so insertion order does not matter.
+    """
+
+    if node_type == NodeType.FLOAT:
+        value_bytes = _FLOAT_BYTES.pack(value)
+    else:
+        value_bytes = str(value).encode()
+
+    digest = hashlib.blake2b(
+        bytes((node_type.value, cardinality.value)), digest_size=16
+    )
+    digest.update(len(value_bytes).to_bytes(4, "little"))
+    digest.update(value_bytes)
+
+    for child_digest in sorted(child_digests):
+        digest.update(child_digest)
+
+    return digest.digest()
+
+
 _T = TypeVar("_T")
 
 
@@ -168,14 +234,16 @@ class Node(ABC, Generic[_T]):
         "_node_type",
         "_parent",
         "_value",
+        "_hash",
     )
 
-    _children: dict[str, INode]
+    _children: Union[dict[str, INode], SortedChildMap]
     _symbol: str
     _cardinality: NodeCardinality
     _node_type: NodeType
     _parent: Optional[INode]
     _value: _T
+    _hash: Optional[bytes]
 
     def __init__(self, symbol: str, value: _T, cardinality: NodeCardinality) -> None:
         super().__init__()
@@ -184,6 +252,7 @@ class Node(ABC, Generic[_T]):
         self._cardinality = cardinality
         self._children = {}
         self._parent = None
+        self._hash = None
 
     @property
     def node_type(self) -> NodeType:
@@ -231,6 +300,44 @@ class Node(ABC, Generic[_T]):
 
         return self._value
 
+    def set_value(self, value: _T) -> None:  # type: ignore[override]
+        """Change the node's value in place, keeping its type and children.
+
+        The node is re-keyed within its parent when its symbol changes, or when its
+        parent keeps its children sorted.
+        """
+
+        symbol = self._format_symbol(value)
+        siblings = (
+            cast(Node, self._parent)._children if self._parent is not None else None
+        )
+
+        if siblings is not None and (
+            symbol != self._symbol or isinstance(siblings, SortedChildMap)
+        ):
+            if symbol != self._symbol and symbol in siblings:
+                raise ValueError(
+                    f"Cannot set value of {self._symbol} to {symbol}. "
+                    "A sibling already has that symbol."
+                )
+
+            del siblings[self._symbol]
+        else:
+            siblings = None
+
+        self._symbol = symbol
+        self._value = value
+
+        if siblings is not None:
+            siblings[symbol] = self
+
+        self._invalidate_hash()
+
+    def _format_symbol(self, value: _T) -> str:
+        """Get the symbol used for a value of this node's type."""
+
+        return str(value)
+
     @abstractmethod
     def equal_to(self, other: INode) -> bool:
         """Check if the node's value is equal to another."""
@@ -276,8 +383,16 @@ class Node(ABC, Generic[_T]):
         if self._cardinality == NodeCardinality.ONE and len(self._children) >= 1:
             raise TypeError("Cannot add additional child to node with cardinality ONE.")
 
+        if (
+            isinstance(self._children, SortedChildMap)
+            and isinstance(node, Node)
+            and not isinstance(node._children, SortedChildMap)
+        ):
+            node.order_children()
+
         self._children[node.symbol] = node
         node.set_parent(self)
+        self._invalidate_hash()
 
     def remove_child(self, symbol: str) -> bool:
         """Removes a child node from the node."""
@@ -286,6 +401,7 @@ class Node(ABC, Generic[_T]):
             child = self._children[symbol]
             child.set_parent(None)
             del self._children[symbol]
+            self._invalidate_hash()
             return True
 
         return False
@@ -295,11 +411,51 @@ class Node(ABC, Generic[_T]):
 
         return self._children[symbol]
 
+    def find_child(self, symbol: str) -> Optional[INode]:
+        """Get a child node, or None if there is no child with the symbol."""
+
+        return self._children.get(symbol)
+
     def has_child(self, symbol: str) -> bool:
         """Check if the node has a child."""
 
         return symbol in self._children
 
+    def children_in_range(self, key_range: KeyRange) -> Iterable[INode]:
+        """Get the children whose values are inside a range.
+
+        Nodes with sorted children find them with bisect lookups. Others check every
+        child.
+        """
+
+        if isinstance(self._children, SortedChildMap):
+            return self._children.in_range(key_range)
+
+        return [c for c in self._children.values() if key_range.contains(c.get_value())]
+
+    @property
+    def ordered(self) -> bool:
+        """Are the node's children kept sorted by value (see order_children())."""
+
+        return isinstance(self._children, SortedChildMap)
+
+    def order_children(self) -> None:
+        """Keep the children of this node and every node below it sorted by value.
+
+        Numbers come first in numeric order, followed by symbols in string order.
+        Children added later, and their own children, are kept sorted too.
+        """
+
+        stack: list[Node] = [self]
+
+        while stack:
+            node = stack.pop()
+
+            if not isinstance(node._children, SortedChildMap):
+                node._children = SortedChildMap(node._children.values())
+
+            stack.extend(cast(Iterable[Node], node._children.values()))
+
     def clear_children(self) -> None:
         """Remove all children and from this node."""
 
@@ -308,6 +464,7 @@ class Node(ABC, Generic[_T]):
             child.set_parent(None)
 
         self._children.clear()
+        self._invalidate_hash()
 
     def get_path(self) -> str:
         """Get the database sentence this node represents."""
@@ -321,6 +478,50 @@ class Node(ABC, Generic[_T]):
 
         return self._parent.get_path() + parent_cardinality_op + self._symbol
 
+    def content_hash(self) -> bytes:
+        """Get a hash of the node's type, value, cardinality and sub_tree.
+
+        Hashes are computed when first requested and kept until the node or its
+        sub_tree changes, so rehashing after a write only visits the changed path.
+        """
+
+        if self._hash is None:
+            stack: list[tuple[Node, bool]] = [(self, False)]
+
+            while stack:
+                node, expanded = stack.pop()
+
+                if node._hash is not None:
+                    continue
+
+                children = cast(Iterable[Node], node._children.values())
+
+                if expanded:
+                    node._hash = node_digest(
+                        node._node_type,
+                        node._cardinality,
+                        node._value,
+                        [child._hash for child in children],  # type: ignore[misc]
+                    )
+                else:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in children)
+
+        return self._hash  # type: ignore[return-value]
+
+    def _invalidate_hash(self) -> None:
+        """Drop the cached hashes of this node and its ancestors.
+
+        A node only has a cached hash if its whole sub_tree does, so the walk stops
+        at the first ancestor without one.
+        """
+
+        node: Optional[Node] = self
+
+        while node is not None and node._hash is not None:
+            node._hash = None
+            node = cast(Optional[Node], node._parent)
+
     @abstractmethod
     def copy(self) -> INode:
         """Create a copy of the node."""
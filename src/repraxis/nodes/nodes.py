@@ -95,6 +95,9 @@ class FloatNode(Node[float]):
         super().__init__(f"[{value:.3}]", value, cardinality)
         self._node_type = NodeType.FLOAT
 
+    def _format_symbol(self, value: float) -> str:
+        return f"[{value:.3}]"
+
     def equal_to(self, other: INode) -> bool:
 
         if other.node_type != self.node_type:
@@ -0,0 +1,255 @@
+"""Sorted Child Containers.
+
+Nodes normally keep their children in an insertion-ordered dict, so the order of query
+results depends on the order facts were inserted. A SortedChildMap keeps children
+sorted by value instead: numbers (ints and floats together) in numeric order, followed
+by symbols in string order. Children can then be scanned by value range with bisect
+lookups, and iteration order is the same no matter how the tree was built.
+
+"""
+
+from __future__ import annotations
+
+import sys
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from repraxis.nodes.base_types import INode
+
+# Sort keys are (rank, value) tuples. NaN sorts after every other number, since it is
+# not ordered with respect to them.
+_NUMBER_RANK = 0
+_NAN_RANK = 1
+_SYMBOL_RANK = 2
+
+SortKey = tuple[int, object]
+
+
+def sort_key(value: object) -> SortKey:
+    """Get the key that orders a node value among its siblings."""
+
+    if isinstance(value, (int, float)):
+        if value != value:  # pylint: disable=comparison-with-itself
+            return (_NAN_RANK, 0)
+
+        return (_NUMBER_RANK, value)
+
+    return (_SYMBOL_RANK, str(value))
+
+
+class KeyRange:
+    """A range of node values, used to skip children that cannot match a query.
+
+    Bounds are either both numbers or both symbols. Children of the other kind are
+    always inside the range, since comparing them with the bounds is an error that
+    the query should still report.
+    """
+
+    __slots__ = ("low", "high", "low_inclusive", "high_inclusive")
+
+    low: Optional[SortKey]
+    high: Optional[SortKey]
+    low_inclusive: bool
+    high_inclusive: bool
+
+    def __init__(
+        self,
+        low: object = None,
+        high: object = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> None:
+        self.low = sort_key(low) if low is not None else None
+        self.high = sort_key(high) if high is not None else None
+        self.low_inclusive = low_inclusive
+        self.high_inclusive = high_inclusive
+
+        if (
+            self.low is not None
+            and self.high is not None
+            and self.low[0] != self.high[0]
+        ):
+            raise ValueError("Range bounds must both be numbers or both be symbols.")
+
+    @property
+    def rank(self) -> int:
+        """The kind of value the range bounds."""
+
+        bound = self.low if self.low is not None else self.high
+        return bound[0] if bound is not None else _SYMBOL_RANK
+
+    def intersect(self, other: KeyRange) -> KeyRange:
+        """Get the range of values inside both ranges.
+
+        Ranges over different kinds of values cannot be combined, so this range is
+        returned unchanged.
+        """
+
+        if other.rank != self.rank:
+            return self
+
+        result = KeyRange()
+        result.low, result.low_inclusive = self.low, self.low_inclusive
+        result.high, result.high_inclusive = self.high, self.high_inclusive
+
+        if other.low is not None and (
+            result.low is None
+            or other.low > result.low
+            or (other.low == result.low and not other.low_inclusive)
+        ):
+            result.low, result.low_inclusive = other.low, other.low_inclusive
+
+        if other.high is not None and (
+            result.high is None
+            or other.high < result.high
+            or (other.high == result.high and not other.high_inclusive)
+        ):
+            result.high, result.high_inclusive = other.high, other.high_inclusive
+
+        return result
+
+    def contains(self, value: object) -> bool:
+        """Check if a node value is inside the range."""
+
+        key = sort_key(value)
+        rank = self.rank
+
+        if key[0] == _NAN_RANK:
+            # Comparisons with NaN are always false.
+            return rank != _NUMBER_RANK
+
+        if key[0] != rank:
+            return True
+
+        if self.low is not None and (
+            key < self.low or (key == self.low and not self.low_inclusive)
+        ):
+            return False
+
+        if self.high is not None and (
+            key > self.high or (key == self.high and not self.high_inclusive)
+        ):
+            return False
+
+        return True
+
+    def __repr__(self) -> str:
+        return (
+            f"KeyRange({'[' if self.low_inclusive else '('}"
+            f"{self.low[1] if self.low else ''}, "
+            f"{self.high[1] if self.high else ''}"
+            f"{']' if self.high_inclusive else ')'})"
+        )
+
+
+class SortedChildMap:
+    """Children of a node mapped by symbol and kept sorted by value.
+
+    Supports the parts of the dict interface used by nodes. Lookups by symbol use a
+    dict, and the sorted order is kept in a list of keys updated with bisect.
+    """
+
+    __slots__ = ("_by_symbol", "_keys", "_nodes")
+
+    _by_symbol: dict[str, INode]
+    _keys: list[SortKey]
+    _nodes: list[INode]
+
+    def __init__(self, children: Iterable[INode] = ()) -> None:
+        self._by_symbol = {}
+        self._keys = []
+        self._nodes = []
+
+        for child in children:
+            self[child.symbol] = child
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, symbol: object) -> bool:
+        return symbol in self._by_symbol
+
+    def __getitem__(self, symbol: str) -> INode:
+        return self._by_symbol[symbol]
+
+    def __setitem__(self, symbol: str, node: INode) -> None:
+        if symbol in self._by_symbol:
+            del self[symbol]
+
+        key = sort_key(node.get_value())
+        index = bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self._nodes.insert(index, node)
+        self._by_symbol[symbol] = node
+
+    def __delitem__(self, symbol: str) -> None:
+        node = self._by_symbol.pop(symbol)
+        key = sort_key(node.get_value())
+        index = bisect_left(self._keys, key)
+
+        # Values of different types can share a key (1 and 1.0), so search the run
+        # of equal keys for the node itself.
+        while self._nodes[index] is not node:
+            index += 1
+
+        del self._keys[index]
+        del self._nodes[index]
+
+    def __sizeof__(self) -> int:
+        return (
+            object.__sizeof__(self)
+            + sys.getsizeof(self._by_symbol)
+            + sys.getsizeof(self._keys)
+            + sum(sys.getsizeof(key) for key in self._keys)
+            + sys.getsizeof(self._nodes)
+        )
+
+    def get(self, symbol: str, default: Optional[INode] = None) -> Optional[INode]:
+        """Get a child by symbol, or the default if there is not one."""
+
+        return self._by_symbol.get(symbol, default)
+
+    def values(self) -> Iterable[INode]:
+        """The children in sorted order."""
+
+        return self._nodes
+
+    def items(self) -> Iterator[tuple[str, INode]]:
+        """The symbols and children in sorted order."""
+
+        return ((node.symbol, node) for node in self._nodes)
+
+    def clear(self) -> None:
+        """Remove every child."""
+
+        self._by_symbol.clear()
+        self._keys.clear()
+        self._nodes.clear()
+
+    def in_range(self, key_range: KeyRange) -> Iterator[INode]:
+        """Get the children inside a range, in sorted order.
+
+        The children of the range's kind are found by bisecting the sorted keys.
+        """
+
+        rank = key_range.rank
+        keys = self._keys
+        start = bisect_left(keys, (rank,))
+        stop = bisect_left(keys, (rank + 1,))
+        before = start
+        # NaN is outside every numeric range.
+        after = bisect_left(keys, (_SYMBOL_RANK,)) if rank == _NUMBER_RANK else stop
+
+        if key_range.low is not None:
+            bisect = bisect_left if key_range.low_inclusive else bisect_right
+            start = max(start, bisect(keys, key_range.low))
+
+        if key_range.high is not None:
+            bisect = bisect_right if key_range.high_inclusive else bisect_left
+            stop = min(stop, bisect(keys, key_range.high))
+
+        # Children of other kinds keep their place before and after the range.
+        yield from self._nodes[:before]
+        yield from self._nodes[start:stop]
+        yield from self._nodes[after:]
@@ -0,0 +1,241 @@
+"""Parallel Unification.
+
+A ParallelUnifier spreads the evaluation of a query's first sentence across a pool of
+worker processes. The database is published once as a shared-memory snapshot (see
+repraxis.shared_snapshot), and each worker attaches to it when it starts, so nothing
+is copied per query. To evaluate a sentence, the coordinator matches its first few
+tokens itself, splits the resulting frontier of nodes into contiguous partitions, and
+sends each worker the snapshot indices of a partition's nodes. Workers unify the rest
+of the sentence below those nodes and check each match the same way assert
+expressions do. Partitions are merged in frontier order, so the bindings come back in
+the same order as a single-process query.
+
+Pass a unifier to DBQuery.run() to use it::
+
+    with ParallelUnifier(db) as unifier:
+        result = DBQuery(["?a.relationships.?b.reputation!?r", "gt ?r 5"]).run(
+            db, unifier=unifier
+        )
+
+This pays off for sentences that start with variables over large worlds, such as
+"?agent.relationships.?other.reputation!?r", where the frontier is wide.
+
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Optional, Sequence, cast
+
+from repraxis.database import RePraxisDatabase
+from repraxis.helpers import bind_sentence, node_from_object
+from repraxis.query.expressions import AssertExpression
+from repraxis.query.helpers import run_steps, unify_from_steps
+from repraxis.query.query_binding_context import QueryBindingContext
+from repraxis.query.query_state import QueryState
+from repraxis.shared_snapshot import (
+    Snapshot,
+    SnapshotNode,
+    SnapshotPublisher,
+    SnapshotReader,
+)
+
+_Partition = Sequence[tuple[int, dict[str, object]]]
+"""Frontier nodes, as snapshot indices with the values bound on the way to them."""
+
+# Each worker gets several partitions, so one slow partition does not hold up the
+# whole query.
+_PARTITIONS_PER_WORKER = 4
+
+# The snapshot reader of the current worker process.
+_worker_reader: Optional[SnapshotReader] = None
+
+
+def _init_worker(name: str) -> None:
+    """Attach a worker process to the published snapshots."""
+
+    global _worker_reader  # pylint: disable=global-statement
+    _worker_reader = SnapshotReader(name)
+
+
+def _evaluate_partition(
+    generation: int,
+    expression: AssertExpression,
+    depth: int,
+    partition: _Partition,
+) -> list[dict[str, object]]:
+    """Evaluate the end of an assert below each node of a partition in a worker."""
+
+    reader = _worker_reader
+
+    if reader is None:
+        raise ValueError("Worker process is not attached to a snapshot.")
+
+    if reader.generation != generation:
+        reader.refresh()
+
+    root = reader.database.root
+    assert isinstance(root, SnapshotNode)
+
+    return _evaluate_below(reader.database, root.snapshot, expression, depth, partition)
+
+
+def _evaluate_below(
+    database: RePraxisDatabase,
+    snapshot: Snapshot,
+    expression: AssertExpression,
+    depth: int,
+    partition: _Partition,
+) -> list[dict[str, object]]:
+    """Unify the end of an assert below each node and keep the matches that assert."""
+
+    tokens = expression.nodes[depth:]
+    results: list[dict[str, object]] = []
+
+    for index, prefix in partition:
+        prefix_nodes = {key: node_from_object(value) for key, value in prefix.items()}
+
+        for context in run_steps(
+            unify_from_steps(
+                [QueryBindingContext(SnapshotNode(snapshot, index))],
+                tokens,
+                expression.ranges,
+            )
+        ):
+            binding = {**prefix_nodes, **context.bindings}
+
+            # Like AssertExpression, check the cardinality of every token.
+            if binding and database.assert_statement(
+                bind_sentence(expression.statement, binding)
+            ):
+                results.append({key: node.get_value() for key, node in binding.items()})
+
+    return results
+
+
+class ParallelUnifier:
+    """Unifies sentences against a database snapshot in a pool of worker processes.
+
+    Unification sees the database as it was when it was last published. Call publish()
+    after writing to the database to refresh the workers. Call close() (or use the
+    unifier as a context manager) to stop the workers and remove the snapshot.
+    """
+
+    __slots__ = ("_publisher", "_reader", "_executor", "_workers", "_depth")
+
+    _publisher: SnapshotPublisher
+    _reader: SnapshotReader
+    _executor: ProcessPoolExecutor
+    _workers: int
+    _depth: int
+
+    def __init__(
+        self,
+        db: RePraxisDatabase,
+        workers: Optional[int] = None,
+        depth: int = 1,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+    ) -> None:
+        if workers is not None and workers < 1:
+            raise ValueError("A parallel unifier needs at least one worker.")
+
+        if depth < 1:
+            raise ValueError("The frontier depth must be at least one.")
+
+        self._workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._depth = depth
+        self._publisher = SnapshotPublisher()
+        self._publisher.publish(db)
+        self._reader = SnapshotReader(self._publisher.name)
+        self._executor = ProcessPoolExecutor(
+            self._workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(self._publisher.name,),
+        )
+
+    @property
+    def workers(self) -> int:
+        """The number of worker processes."""
+        return self._workers
+
+    @property
+    def depth(self) -> int:
+        """The number of tokens matched by the coordinator before partitioning."""
+        return self._depth
+
+    @property
+    def generation(self) -> int:
+        """The generation of the snapshot being unified against."""
+        return self._reader.generation
+
+    def publish(self, db: RePraxisDatabase) -> int:
+        """Replace the snapshot with the current contents of a database."""
+
+        generation = self._publisher.publish(db)
+        self._reader.refresh()
+        return generation
+
+    def evaluate(self, expression: AssertExpression) -> QueryState:
+        """Evaluate an assert expression against the published snapshot.
+
+        Gives the same bindings, in the same order, as evaluating the expression on
+        the published database without input bindings.
+        """
+
+        database = self._reader.database
+        root = database.root
+        assert isinstance(root, SnapshotNode)
+
+        depth = min(self._depth, len(expression.nodes))
+        partition: list[tuple[int, dict[str, object]]] = [
+            (
+                cast(SnapshotNode, context.sub_tree).index,
+                {key: node.get_value() for key, node in context.bindings.items()},
+            )
+            for context in run_steps(
+                unify_from_steps(
+                    [QueryBindingContext(root)],
+                    expression.nodes[:depth],
+                    expression.ranges,
+                )
+            )
+        ]
+
+        if len(partition) < 2 or self._workers == 1:
+            results = _evaluate_below(
+                database, root.snapshot, expression, depth, partition
+            )
+        else:
+            size = -(-len(partition) // (self._workers * _PARTITIONS_PER_WORKER))
+            results = []
+
+            for matches in self._executor.map(
+                _evaluate_partition,
+                repeat(self.generation),
+                repeat(expression),
+                repeat(depth),
+                [partition[i : i + size] for i in range(0, len(partition), size)],
+            ):
+                results.extend(matches)
+
+        if not results:
+            return QueryState(False)
+
+        return QueryState.from_object_bindings(True, results)
+
+    def close(self) -> None:
+        """Stop the workers and remove the snapshot."""
+
+        self._executor.shutdown()
+        self._reader.close()
+        self._publisher.close()
+
+    def __enter__(self) -> ParallelUnifier:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
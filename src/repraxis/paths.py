@@ -0,0 +1,100 @@
+"""Structured Paths.
+
+Paths are an alternative to sentence strings for code that already has its data as
+Python values. A path is a sequence of values (str, int or float) and Var objects.
+Tokens are separated by MANY cardinality by default. Placing the ONE marker between two
+tokens works like the "!" separator in a sentence::
+
+    ("astrid", "relationships", "jordan", "reputation", ONE, 30)
+
+is equivalent to ``"astrid.relationships.jordan.reputation!30"``. Paths are converted
+straight to nodes, so floats keep their full precision and no sentence is formatted or
+parsed.
+
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+from repraxis.helpers import node_from_object
+from repraxis.nodes.base_types import INode, NodeCardinality
+from repraxis.nodes.nodes import VariableNode
+
+ONE = NodeCardinality.ONE
+"""Marks the separator between two tokens as cardinality ONE."""
+
+MANY = NodeCardinality.MANY
+"""Marks the separator between two tokens as cardinality MANY (the default)."""
+
+Path = Sequence[object]
+
+
+class Var:
+    """A variable within a query path."""
+
+    __slots__ = ("_name",)
+
+    _name: str
+
+    def __init__(self, name: str) -> None:
+        if not name or name == "?":
+            raise ValueError("Variables must have a name.")
+
+        self._name = name if name.startswith("?") else f"?{name}"
+
+    @property
+    def name(self) -> str:
+        """The name of the variable, including the leading '?'."""
+        return self._name
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Var) and other._name == self._name
+
+    def __hash__(self) -> int:
+        return hash((Var, self._name))
+
+    def __repr__(self) -> str:
+        return f"Var({self._name!r})"
+
+
+def path_nodes(path: Path) -> list[INode]:
+    """Convert a path into a list of nodes."""
+
+    if isinstance(path, str):
+        raise TypeError("Paths must be sequences of values, not sentence strings.")
+
+    tokens: list[object] = []
+    cardinalities: list[NodeCardinality] = []
+    expecting_token = True
+
+    for item in path:
+        if isinstance(item, NodeCardinality):
+            if expecting_token or item == NodeCardinality.NONE:
+                raise ValueError(f"Misplaced cardinality marker {item} in {path!r}.")
+
+            cardinalities[-1] = item
+            expecting_token = True
+            continue
+
+        if isinstance(item, str) and item.startswith("?"):
+            raise ValueError(
+                f"Found variable-like symbol {item!r} in {path!r}. "
+                "Use Var to add variables to paths."
+            )
+
+        tokens.append(item)
+        cardinalities.append(NodeCardinality.MANY)
+        expecting_token = False
+
+    if expecting_token:
+        raise ValueError(f"Path {path!r} must contain a value after each separator.")
+
+    return [
+        (
+            VariableNode(token.name, cardinality)
+            if isinstance(token, Var)
+            else node_from_object(token, cardinality)
+        )
+        for token, cardinality in zip(tokens, cardinalities)
+    ]
@@ -2,7 +2,10 @@
 
 """
 
+from repraxis.query.compiled_query import CompiledQuery
 from repraxis.query.db_query import DBQuery
+from repraxis.query.prepared_query import PreparedQuery
+from repraxis.query.query_cursor import QueryCursor
 from repraxis.query.query_result import QueryResult
 
-__all__ = ["DBQuery", "QueryResult"]
+__all__ = ["CompiledQuery", "DBQuery", "PreparedQuery", "QueryCursor", "QueryResult"]
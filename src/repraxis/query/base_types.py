@@ -5,6 +5,7 @@
 from abc import ABC, abstractmethod
 
 from repraxis.database import RePraxisDatabase
+from repraxis.query.helpers import Steps
 from repraxis.query.query_state import QueryState
 
 
@@ -16,3 +17,17 @@ class IQueryExpression(ABC):
         """Evaluate the expression and return a new query state."""
 
         raise NotImplementedError()
+
+    def evaluate_steps(
+        self, database: RePraxisDatabase, state: QueryState
+    ) -> Steps[QueryState]:
+        """Evaluate the expression in resumable steps.
+
+        The generator yields the units of work done since its last yield and returns
+        the new query state. Expressions that do not override this are evaluated in
+        a single step.
+        """
+
+        new_state = self.evaluate(database, state)
+        yield 1
+        return new_state
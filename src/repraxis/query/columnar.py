@@ -0,0 +1,198 @@
+"""Columnar Query Results.
+
+Analytics code often wants the values bound to each variable as arrays rather than as
+a list of dicts. The functions here build one NumPy array per variable. For single
+pattern queries, the columns are produced straight from unification: each level of the
+pattern records the nodes it matched and the row of the previous level they extend, and
+the final columns are gathered through those back-pointers without creating a dict per
+match.
+
+NumPy is an optional dependency. Install it with ``pip install repraxis[numpy]``.
+
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence, Union
+
+from repraxis.database import RePraxisDatabase
+from repraxis.helpers import parse_sentence
+from repraxis.nodes.base_types import INode, NodeType
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError(
+            "Columnar query results require NumPy. "
+            "Install it with 'pip install repraxis[numpy]'."
+        )
+
+
+class ColumnarResult:
+    """Query results stored as one array per variable."""
+
+    __slots__ = ("_success", "_columns")
+
+    _success: bool
+    _columns: dict[str, NDArray]
+
+    def __init__(
+        self, success: bool, columns: Optional[dict[str, NDArray]] = None
+    ) -> None:
+        self._success = success
+        self._columns = columns if columns else {}
+
+    @property
+    def success(self) -> bool:
+        """Did the query pass."""
+        return self._success
+
+    @property
+    def columns(self) -> dict[str, NDArray]:
+        """Variable names mapped to arrays of their bound values."""
+        return self._columns
+
+    def __getitem__(self, variable: str) -> NDArray:
+        return self._columns[variable]
+
+    def __len__(self) -> int:
+        for column in self._columns.values():
+            return len(column)
+        return 0
+
+
+def nodes_to_array(nodes: Iterable[INode], count: int) -> NDArray:
+    """Convert node values to an array typed by the nodes' types.
+
+    Columns made entirely of integer nodes become int64 arrays, columns of numbers
+    with at least one float node become float64 arrays, and anything else becomes an
+    object array.
+    """
+
+    _require_numpy()
+
+    nodes = list(nodes)
+    node_types = {node.node_type for node in nodes}
+
+    if node_types == {NodeType.INT}:
+        dtype: object = np.int64
+    elif node_types and node_types <= {NodeType.INT, NodeType.FLOAT}:
+        dtype = np.float64
+    else:
+        dtype = object
+
+    if dtype is object:
+        values = np.empty(count, dtype=object)
+        values[:] = [node.get_value() for node in nodes]
+        return values
+
+    return np.fromiter((node.get_value() for node in nodes), dtype=dtype, count=count)
+
+
+def columns_from_bindings(bindings: list[dict[str, INode]]) -> dict[str, NDArray]:
+    """Convert a list of node bindings into value columns.
+
+    Variables missing from a binding are filled with None, which makes the column an
+    object array.
+    """
+
+    _require_numpy()
+
+    variables: dict[str, None] = {}
+    for binding in bindings:
+        for variable in binding:
+            variables[variable] = None
+
+    columns: dict[str, NDArray] = {}
+
+    for variable in variables:
+        if all(variable in binding for binding in bindings):
+            columns[variable] = nodes_to_array(
+                (binding[variable] for binding in bindings), len(bindings)
+            )
+        else:
+            values = np.empty(len(bindings), dtype=object)
+            values[:] = [
+                binding[variable].get_value() if variable in binding else None
+                for binding in bindings
+            ]
+            columns[variable] = values
+
+    return columns
+
+
+def unify_columns(
+    database: RePraxisDatabase, sentence: Union[str, Sequence[INode]]
+) -> Optional[dict[str, NDArray]]:
+    """Unify a single sentence against the database producing value columns.
+
+    Matches are validated the same way an assert expression validates them, so
+    nodes whose cardinality differs from the pattern are skipped. Returns None when
+    the sentence cannot be handled column-wise (it repeats a variable).
+    """
+
+    _require_numpy()
+
+    tokens = parse_sentence(sentence) if isinstance(sentence, str) else sentence
+    variables = [t.symbol for t in tokens if t.node_type == NodeType.VARIABLE]
+
+    if len(set(variables)) != len(variables):
+        return None
+
+    last_index = len(tokens) - 1
+    frontier: list[INode] = [database.root]
+    parent_rows: list[array[int]] = []
+    variable_levels: dict[str, tuple[int, list[INode]]] = {}
+
+    for depth, token in enumerate(tokens):
+        next_frontier: list[INode] = []
+        rows: array[int] = array("q")
+        check_cardinality = depth < last_index
+        cardinality = token.cardinality
+
+        if token.node_type == NodeType.VARIABLE:
+            for row, sub_tree in enumerate(frontier):
+                for child in sub_tree.children:
+                    if check_cardinality and child.cardinality != cardinality:
+                        continue
+                    next_frontier.append(child)
+                    rows.append(row)
+
+            variable_levels[token.symbol] = (depth, next_frontier)
+        else:
+            symbol = token.symbol
+            for row, sub_tree in enumerate(frontier):
+                if not sub_tree.has_child(symbol):
+                    continue
+                child = sub_tree.get_child(symbol)
+                if check_cardinality and child.cardinality != cardinality:
+                    continue
+                next_frontier.append(child)
+                rows.append(row)
+
+        parent_rows.append(rows)
+        frontier = next_frontier
+
+    count = len(frontier)
+    columns: dict[str, NDArray] = {}
+
+    for variable, (depth, level_nodes) in variable_levels.items():
+        values = nodes_to_array(level_nodes, len(level_nodes))
+
+        # Walk the back-pointers from the final level to the variable's level.
+        rows_index = np.arange(count, dtype=np.int64)
+        for level in range(last_index, depth, -1):
+            rows_index = np.frombuffer(parent_rows[level], dtype=np.int64)[rows_index]
+
+        columns[variable] = values[rows_index]
+
+    return columns
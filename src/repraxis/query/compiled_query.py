@@ -0,0 +1,392 @@
+"""Compiled Queries.
+
+A compiled query turns its expressions into the source of a Python function and builds
+it with exec(). Each variable becomes a loop over the children of a node, constants and
+bound variables become direct lookups in the node's children dict, and bindings live in
+local variables until a match is complete. No intermediate binding dicts are built and
+no sentences are formatted or parsed while the query runs. Results match running the
+query with the interpreter (DBQuery.run()), in the same order.
+
+Queries the generated code does not cover fall back to the interpreter:
+
+- Or expressions and sentences that repeat a variable.
+- Comparisons of variables that are not bound by an earlier expression.
+- Input bindings that do not all have the same variables.
+- Databases that are not made of node objects.
+
+Sentences without variables are checked once before the loops run. When such a check
+fails, the query fails without evaluating comparisons that the interpreter would have
+run first, so errors from comparing values of different types may not be raised.
+
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Callable, Iterable, Optional, Sequence
+
+from repraxis.database import RePraxisDatabase
+from repraxis.helpers import parse_sentence, sentence_has_variables
+from repraxis.nodes.base_types import INode, Node, NodeType
+from repraxis.query.base_types import IQueryExpression
+from repraxis.query.expressions import (
+    AssertExpression,
+    ComparisonExpression,
+    NotExpression,
+    read_heads,
+)
+from repraxis.query.helpers import unify_all
+from repraxis.query.prepared_query import PreparedQuery
+from repraxis.query.query_result import QueryResult
+from repraxis.query.query_state import QueryState
+
+# Python allows 20 statically nested blocks. Queries needing more loops than this are
+# left to the interpreter.
+_MAX_LOOPS = 18
+
+_Signature = Optional[tuple[str, ...]]
+"""The variables of the input bindings, or None when there are none."""
+
+_Function = Callable[[RePraxisDatabase, INode, list], Optional[list]]
+
+
+@lru_cache(maxsize=4096)
+def _operand(symbol: str) -> INode:
+    """Parse a bound value the same way comparison expressions do."""
+
+    return parse_sentence(symbol)[0]
+
+
+class _Compiled:
+    """A generated function and how to read its output."""
+
+    __slots__ = ("function", "source", "succeeds_empty")
+
+    function: _Function
+    source: str
+    succeeds_empty: bool
+
+    def __init__(self, function: _Function, source: str, succeeds_empty: bool) -> None:
+        self.function = function
+        self.source = source
+        self.succeeds_empty = succeeds_empty
+
+
+class _CodeGenerator:
+    """Writes the source of the function for one signature of input bindings."""
+
+    __slots__ = (
+        "lines",
+        "checks",
+        "constants",
+        "bound",
+        "loops",
+        "depth",
+        "names",
+    )
+
+    lines: list[str]
+    checks: list[str]
+    constants: list[object]
+    bound: dict[str, str]
+    loops: int
+    depth: int
+    names: int
+
+    def __init__(self) -> None:
+        self.lines = []
+        self.checks = []
+        self.constants = []
+        self.bound = {}
+        self.loops = 0
+        self.depth = 2
+        self.names = 0
+
+    def constant(self, value: object) -> str:
+        """Pass a value into the generated function and get its name there."""
+
+        for i, existing in enumerate(self.constants):
+            if existing is value:
+                return f"k{i}"
+
+        self.constants.append(value)
+        return f"k{len(self.constants) - 1}"
+
+    def name(self, prefix: str) -> str:
+        """Get a fresh local variable name."""
+
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def emit(self, line: str) -> None:
+        """Add a line at the current depth."""
+
+        self.lines.append("    " * self.depth + line)
+
+    def open(self, line: str, loop: bool = False) -> None:
+        """Add a line that opens a block and move into it."""
+
+        self.emit(line)
+        self.depth += 1
+
+        if loop:
+            self.loops += 1
+
+    def check(self, fails: Callable[[RePraxisDatabase], bool]) -> None:
+        """Fail the query up front if a check of the database returns True."""
+
+        self.checks.append(f"if {self.constant(fails)}(db):")
+        self.checks.append("    return None")
+
+    def unify(self, nodes: Sequence[INode]) -> None:
+        """Match a sentence below the root, binding its unbound variables."""
+
+        parent = "root"
+        last_index = len(nodes) - 1
+
+        for i, node in enumerate(nodes):
+            child = self.name("n")
+
+            # Like the interpreter's assert, every token but the last must match the
+            # cardinality of its separator.
+            conditions = (
+                []
+                if i == last_index
+                else [f"{child}._cardinality is {self.constant(node.cardinality)}"]
+            )
+
+            if node.node_type == NodeType.VARIABLE and node.symbol not in self.bound:
+                self.open(f"for {child} in {parent}._children.values():", loop=True)
+                self.bound[node.symbol] = child
+            else:
+                if node.node_type == NodeType.VARIABLE:
+                    # Bound values must be equal, not just share a symbol, to match
+                    # how bindings are joined.
+                    value = self.bound[node.symbol]
+                    self.emit(f"{child} = {parent}._children.get({value}.symbol)")
+                    conditions.insert(0, f"{value}.equal_to({child})")
+                else:
+                    self.emit(f"{child} = {parent}._children.get({node.symbol!r})")
+
+                conditions.insert(0, f"{child} is not None")
+
+            if conditions:
+                self.open(f"if {' and '.join(conditions)}:")
+
+            parent = child
+
+    def source(self) -> str:
+        """Assemble the source of a factory that returns the function."""
+
+        lines = [
+            f"def factory({', '.join(f'k{i}' for i in range(len(self.constants)))}):",
+            "    def run(db, root, rows):",
+            *("        " + line for line in self.checks),
+            "        out = []",
+            *self.lines,
+            "        return out",
+            "    return run",
+        ]
+
+        return "\n".join(lines) + "\n"
+
+
+class CompiledQuery:
+    """A query compiled into a generated Python function.
+
+    Create compiled queries with DBQuery.compile(). A function is generated the first
+    time the query runs with each set of input binding variables.
+    """
+
+    __slots__ = ("_expressions", "_prepared", "_read_heads", "_functions")
+
+    _expressions: tuple[IQueryExpression, ...]
+    _prepared: PreparedQuery
+    _read_heads: tuple[Optional[str], ...]
+    _functions: dict[_Signature, Optional[_Compiled]]
+
+    def __init__(self, expressions: Iterable[IQueryExpression]) -> None:
+        self._expressions = tuple(expressions)
+        self._prepared = PreparedQuery(self._expressions)
+        self._read_heads = tuple(read_heads(self._expressions))
+        self._functions = {}
+
+    @property
+    def expressions(self) -> tuple[IQueryExpression, ...]:
+        """The parsed expressions that make up the query."""
+        return self._expressions
+
+    def source(self, variables: Optional[Sequence[str]] = None) -> Optional[str]:
+        """Get the generated source for input bindings of the given variables.
+
+        Returns None if the query falls back to the interpreter.
+        """
+
+        compiled = self._compiled(tuple(variables) if variables is not None else None)
+        return compiled.source if compiled is not None else None
+
+    def run(
+        self,
+        db: RePraxisDatabase,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+    ) -> QueryResult:
+        """Run the query against the database."""
+
+        rows = QueryState.from_object_bindings(True, bindings if bindings else [])
+        signature: _Signature = tuple(rows.bindings[0]) if rows.bindings else None
+
+        compiled = (
+            self._compiled(signature)
+            if isinstance(db.root, Node)
+            and all(tuple(row) == signature for row in rows.bindings)
+            else None
+        )
+
+        if compiled is None:
+            return self._prepared.evaluate(db, rows).to_result()
+
+        with db.reading(self._read_heads):
+            results = compiled.function(db, db.root, rows.bindings)
+
+        if results is None:
+            return QueryResult(False)
+
+        return QueryResult(bool(results) or compiled.succeeds_empty, results)
+
+    def _compiled(self, signature: _Signature) -> Optional[_Compiled]:
+        """Get the function for a signature, generating it on first use."""
+
+        if signature in self._functions:
+            return self._functions[signature]
+
+        compiled = self._generate(signature)
+        self._functions[signature] = compiled
+        return compiled
+
+    def _generate(self, signature: _Signature) -> Optional[_Compiled]:
+        """Generate the function for a signature, or None to use the interpreter."""
+
+        code = _CodeGenerator()
+        outputs: list[str] = []
+        has_rows = signature is not None
+        unified = False
+
+        if signature is not None:
+            row = code.name("r")
+            code.open(f"for {row} in rows:", loop=True)
+
+            for variable in signature:
+                local = code.name("b")
+                code.emit(f"{local} = {row}[{variable!r}]")
+                code.bound[variable] = local
+                outputs.append(variable)
+
+        for expression in self._expressions:
+            if isinstance(expression, AssertExpression):
+                variables = [
+                    n.symbol
+                    for n in expression.nodes
+                    if n.node_type == NodeType.VARIABLE
+                ]
+
+                if not variables:
+                    code.check(_fails_assert(expression.statement))
+                    continue
+
+                if len(set(variables)) != len(variables):
+                    return None
+
+                outputs.extend(v for v in variables if v not in code.bound)
+                code.unify(expression.nodes)
+                unified = True
+
+            elif isinstance(expression, ComparisonExpression):
+                operands = [
+                    parse_sentence(expression.lh_value),
+                    parse_sentence(expression.rh_value),
+                ]
+
+                if any(len(nodes) > 1 for nodes in operands):
+                    # Let the interpreter raise its error.
+                    return None
+
+                if not has_rows and not unified:
+                    # Comparisons fail when there are no bindings to compare.
+                    code.checks.append("return None")
+                    break
+
+                arguments: list[str] = []
+
+                for (node,) in operands:
+                    if node.node_type != NodeType.VARIABLE:
+                        arguments.append(code.constant(node))
+                    elif node.symbol in code.bound:
+                        arguments.append(f"_operand({code.bound[node.symbol]}.symbol)")
+                    else:
+                        return None
+
+                code.open(
+                    f"if {code.constant(expression.compare)}({', '.join(arguments)}):"
+                )
+
+            elif isinstance(expression, NotExpression):
+                if not sentence_has_variables(expression.statement):
+                    code.check(_fails_not(expression.statement))
+                elif not has_rows and not unified:
+                    code.check(_fails_not_unified(expression.statement))
+                else:
+                    variables = [
+                        n.symbol
+                        for n in parse_sentence(expression.statement)
+                        if n.node_type == NodeType.VARIABLE and n.symbol in code.bound
+                    ]
+                    binding = ", ".join(
+                        f"{v!r}: {code.bound[v]}" for v in dict.fromkeys(variables)
+                    )
+                    # pylint: disable-next=protected-access
+                    evaluate = code.constant(expression._evaluate_binding)
+                    code.open(f"if {evaluate}(db, {{{binding}}}):")
+
+            else:
+                return None
+
+        else:
+            if has_rows or unified:
+                values = ", ".join(
+                    f"{v!r}: {code.bound[v]}.get_value()" for v in outputs
+                )
+                code.emit(f"out.append({{{values}}})")
+
+        if code.loops > _MAX_LOOPS:
+            return None
+
+        source = code.source()
+        namespace: dict[str, object] = {"_operand": _operand}
+        exec(
+            compile(source, "<compiled query>", "exec"), namespace
+        )  # pylint: disable=exec-used
+        factory: Callable[..., _Function] = namespace["factory"]  # type: ignore
+
+        return _Compiled(
+            factory(*code.constants),
+            source,
+            succeeds_empty=not has_rows and not unified,
+        )
+
+
+def _fails_assert(statement: str) -> Callable[[RePraxisDatabase], bool]:
+    """Check that fails a query if a sentence without variables is missing."""
+
+    return lambda db: not db.assert_statement(statement)
+
+
+def _fails_not(statement: str) -> Callable[[RePraxisDatabase], bool]:
+    """Check that fails a query if a negated sentence without variables is present."""
+
+    return lambda db: db.assert_statement(statement)
+
+
+def _fails_not_unified(statement: str) -> Callable[[RePraxisDatabase], bool]:
+    """Check that fails a query if a negated sentence with variables has a match."""
+
+    return lambda db: bool(unify_all(db, QueryState(True), [statement]))
@@ -4,11 +4,26 @@
 
 from __future__ import annotations
 
-from typing import Iterable, Optional
+import asyncio
+import random
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Union
 
 from repraxis.database import RePraxisDatabase
+from repraxis.helpers import parse_sentence
+from repraxis.nodes.base_types import NodeType
+from repraxis.paths import Path
+from repraxis.query.base_types import IQueryExpression
+from repraxis.query.columnar import (
+    ColumnarResult,
+    columns_from_bindings,
+    unify_columns,
+)
+from repraxis.query.compiled_query import CompiledQuery
 from repraxis.query.expressions import (
     AssertExpression,
+    ComparisonExpression,
     EqualsExpression,
     GreaterThanEqualToExpression,
     GreaterThanExpression,
@@ -16,81 +31,367 @@ from repraxis.query.expressions import (
     LessThanExpression,
     NotEqualExpression,
     NotExpression,
+    OrExpression,
+    push_down_ranges,
+    read_heads,
 )
+from repraxis.query.prepared_query import PreparedQuery
+from repraxis.query.query_cursor import QueryCursor
 from repraxis.query.query_result import QueryResult
 from repraxis.query.query_state import QueryState
+from repraxis.query_cache import CachePattern, cache_pattern
+
+if TYPE_CHECKING:
+    from repraxis.parallel import ParallelUnifier
+
+# Compiled queries, keyed by normalized expressions and least recently used first.
+_COMPILED: OrderedDict[tuple, CompiledQuery] = OrderedDict()
+_COMPILED_LOCK = threading.Lock()
+_MAX_COMPILED = 256
+
+_COMPARISON_EXPRESSIONS: dict[str, type[ComparisonExpression]] = {
+    "eq": EqualsExpression,
+    "neq": NotEqualExpression,
+    "lt": LessThanExpression,
+    "gt": GreaterThanExpression,
+    "lte": LessThanEqualToExpression,
+    "gte": GreaterThanEqualToExpression,
+}
+
+
+def create_expression(
+    expression_str: Union[str, Path], vectorize: bool = False
+) -> IQueryExpression:
+    """Create a query expression from its string form.
+
+    Paths (sequences of values and Var objects) create assert expressions. Expressions
+    joined with "or" create an or expression, as in "?a.friends.?b or ?a.spouse.?b".
+    """
+
+    if not isinstance(expression_str, str):
+        return AssertExpression(expression_str)
+
+    expression_parts = expression_str.split()
+
+    if "or" in expression_parts:
+        branches: list[list[str]] = [[]]
+
+        for part in expression_parts:
+            if part == "or":
+                branches.append([])
+            else:
+                branches[-1].append(part)
+
+        if any(len(branch) == 0 for branch in branches):
+            raise ValueError(f"Unrecognized query expression: {expression_str}")
+
+        return OrExpression(
+            [create_expression(" ".join(branch), vectorize) for branch in branches]
+        )
+
+    if len(expression_parts) == 1:
+        return AssertExpression(expression_parts[0])
+
+    if len(expression_parts) == 2:
+        if expression_parts[0] == "not":
+            return NotExpression(expression_parts[1])
+
+        raise ValueError(f"Unrecognized query expression: {expression_str}")
+
+    if len(expression_parts) == 3:
+        comparison_op = expression_parts[0]
+
+        if comparison_op in _COMPARISON_EXPRESSIONS:
+            return _COMPARISON_EXPRESSIONS[comparison_op](
+                expression_parts[1], expression_parts[2], vectorize
+            )
+
+    raise ValueError(f"Unrecognized query expression: {expression_str}")
 
 
 class DBQuery:
     """A query to run against a database.
 
     Queries are immutable. Adding additional expressions creates a new query
-    instance.
+    instance. Besides expression strings, queries accept paths of values and Var
+    objects, which are asserted like sentences::
+
+        DBQuery().where(("astrid", "relationships", Var("other"), "mood", ONE, 0.5))
     """
 
     __slots__ = ("_expressions",)
 
-    _expressions: list[str]
+    _expressions: list[Union[str, tuple[object, ...]]]
 
-    def __init__(self, expressions: Optional[Iterable[str]] = None) -> None:
-        self._expressions = list(expressions) if expressions else []
+    def __init__(
+        self, expressions: Optional[Iterable[Union[str, Path]]] = None
+    ) -> None:
+        self._expressions = (
+            [e if isinstance(e, str) else tuple(e) for e in expressions]
+            if expressions
+            else []
+        )
 
-    def where(self, expression: str) -> DBQuery:
+    @property
+    def expressions(self) -> tuple[Union[str, tuple[object, ...]], ...]:
+        """The expressions that make up the query."""
+        return tuple(self._expressions)
+
+    def where(self, expression: Union[str, Path]) -> DBQuery:
         """Add an expression to the query"""
         return DBQuery([*self._expressions, expression])
 
+    def prepare(self, vectorize: bool = False) -> PreparedQuery:
+        """Parse the query's expressions once for running many times.
+
+        Prepared queries can also run a batch of independent binding sets in a single
+        pass (see PreparedQuery.run_batch()).
+        """
+
+        return PreparedQuery(self._create_expressions(vectorize))
+
+    def compile(self) -> CompiledQuery:
+        """Compile the query into a generated Python function.
+
+        Compiled queries give the same results as run(), without the interpreter's
+        overhead, so they suit queries that run very often. Compiled queries are
+        cached, so compiling an equal query again returns the same object.
+        """
+
+        return _compile(self._cache_key([])[0], tuple(self._expressions))
+
+    def _create_expressions(self, vectorize: bool) -> list[IQueryExpression]:
+        """Create the query's expressions and push comparisons down into asserts."""
+
+        expressions = [create_expression(e, vectorize) for e in self._expressions]
+        push_down_ranges(expressions)
+        return expressions
+
     def run(
         self,
         db: RePraxisDatabase,
         bindings: Optional[Iterable[dict[str, object]]] = None,
+        vectorize: bool = False,
+        unifier: Optional[ParallelUnifier] = None,
+    ) -> QueryResult:
+        """Run the query against the database.
+
+        When vectorize is True, numeric comparison expressions are evaluated as a
+        single NumPy mask over all bindings. This requires NumPy.
+
+        When a ParallelUnifier is given and there are no input bindings, a first
+        sentence with variables is evaluated by the unifier's worker processes. The
+        unifier must have published the current contents of the database.
+
+        If the database has a query cache enabled, results are reused until a write
+        touches a path the query could match.
+        """
+
+        cache = db.query_cache
+
+        if cache is None:
+            return self._evaluate(db, bindings, vectorize, unifier).to_result()
+
+        input_bindings = list(bindings) if bindings else []
+        key = self._cache_key(input_bindings)
+
+        # Writes must not land between evaluating the query and caching its result.
+        with db.reading(self._read_heads()):
+            cached = cache.get(key)
+
+            if cached is None:
+                cached = self._evaluate(
+                    db, input_bindings, vectorize, unifier
+                ).to_result()
+                cache.put(key, self._cache_patterns(), cached)
+
+        # Callers are free to modify their results, so never hand out cached dicts.
+        return QueryResult(cached.success, [dict(b) for b in cached.bindings])
+
+    def sample(
+        self,
+        db: RePraxisDatabase,
+        k: int = 1,
+        rng: Optional[random.Random] = None,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+    ) -> QueryResult:
+        """Pick up to k of the query's results uniformly at random.
+
+        Results are reservoir sampled as they stream out of the query instead of
+        being collected first. Pass a seeded random.Random as rng for reproducible
+        samples.
+        """
+
+        return self.prepare().sample(db, k, rng, bindings)
+
+    async def run_async(
+        self,
+        db: RePraxisDatabase,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+        vectorize: bool = False,
+        yield_every: int = 1000,
+        max_slice_us: int = 2000,
     ) -> QueryResult:
-        """Run the query against the database."""
+        """Run the query without blocking the asyncio event loop.
+
+        Expressions are evaluated in resumable steps. Control is returned to the event
+        loop after roughly yield_every units of work (node visits or bindings
+        checked) or max_slice_us microseconds, whichever comes first. Cancelling the
+        awaiting task stops the query at its next yield point.
+
+        The database may be modified by other tasks while the query is suspended. In
+        that case, the results may reflect some of those modifications.
+        """
+
+        cursor = self.cursor(db, bindings, vectorize)
+        max_slice_ns = max_slice_us * 1000
+
+        try:
+            while (result := cursor.step(max_slice_ns, yield_every)) is None:
+                await asyncio.sleep(0)
+        finally:
+            cursor.close()
+
+        return result
+
+    def cursor(
+        self,
+        db: RePraxisDatabase,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+        vectorize: bool = False,
+    ) -> QueryCursor:
+        """Create a cursor that evaluates the query in time-budgeted steps."""
+
+        return QueryCursor(
+            db,
+            self._create_expressions(vectorize),
+            QueryState.from_object_bindings(True, bindings if bindings else []),
+        )
+
+    def run_columnar(
+        self,
+        db: RePraxisDatabase,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+        vectorize: bool = False,
+    ) -> ColumnarResult:
+        """Run the query and return one NumPy array per variable.
+
+        Integer-only columns are int64, numeric columns with floats are float64 and
+        everything else is an object array. Queries made of a single pattern are
+        unified straight into columns without building a dict per match. Requires
+        NumPy.
+        """
+
+        if not bindings and len(self._expressions) == 1:
+            expression = create_expression(self._expressions[0])
+
+            if isinstance(expression, AssertExpression) and any(
+                node.node_type == NodeType.VARIABLE for node in expression.nodes
+            ):
+                with db.reading(read_heads([expression])):
+                    columns = unify_columns(db, expression.nodes)
+
+                if columns is not None:
+                    if len(next(iter(columns.values()))) == 0:
+                        return ColumnarResult(False)
+
+                    return ColumnarResult(True, columns)
+
+        state = self._evaluate(db, bindings, vectorize)
+
+        if state.success is False:
+            return ColumnarResult(False)
+
+        return ColumnarResult(True, columns_from_bindings(state.bindings))
+
+    def _cache_key(self, bindings: list[dict[str, object]]) -> tuple:
+        """Get a key identifying the query and its input bindings."""
+
+        return (
+            tuple(
+                (
+                    " ".join(e.split())
+                    if isinstance(e, str)
+                    else tuple((type(v).__name__, v) for v in e)
+                )
+                for e in self._expressions
+            ),
+            tuple(
+                tuple(sorted((k, type(v).__name__, v) for k, v in binding.items()))
+                for binding in bindings
+            ),
+        )
+
+    def _read_heads(self) -> Iterator[Optional[str]]:
+        """Get the first symbols of the sentences the query reads."""
+
+        return read_heads(create_expression(e) for e in self._expressions)
+
+    def _cache_patterns(self) -> list[CachePattern]:
+        """Get the patterns of the sentences the query reads from the database."""
+
+        patterns: list[CachePattern] = []
+        expressions = [create_expression(e) for e in self._expressions]
+
+        while expressions:
+            expression = expressions.pop()
+
+            if isinstance(expression, AssertExpression):
+                patterns.append(cache_pattern(expression.nodes))
+            elif isinstance(expression, NotExpression):
+                patterns.append(cache_pattern(parse_sentence(expression.statement)))
+            elif isinstance(expression, OrExpression):
+                expressions.extend(expression.expressions)
+
+        return patterns
+
+    def _evaluate(
+        self,
+        db: RePraxisDatabase,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+        vectorize: bool = False,
+        unifier: Optional[ParallelUnifier] = None,
+    ) -> QueryState:
+        """Evaluate the query's expressions and return the final query state."""
 
         state = QueryState.from_object_bindings(True, bindings if bindings else [])
+        expressions = self._create_expressions(vectorize)
 
-        for expression_str in self._expressions:
-
-            expression_parts = [part.strip() for part in expression_str.split(" ")]
-
-            if len(expression_parts) == 1:
-                state = AssertExpression(expression_parts[0]).evaluate(db, state)
-
-            elif len(expression_parts) == 2:
-                if expression_parts[0] == "not":
-                    state = NotExpression(expression_parts[1]).evaluate(db, state)
-                else:
-                    raise ValueError(f"Unrecognized query expression: {expression_str}")
-
-            elif len(expression_parts) == 3:
-                comparison_op = expression_parts[0]
-
-                if comparison_op == "eq":
-                    state = EqualsExpression(
-                        expression_parts[1], expression_parts[2]
-                    ).evaluate(db, state)
-                elif comparison_op == "neq":
-                    state = NotEqualExpression(
-                        expression_parts[1], expression_parts[2]
-                    ).evaluate(db, state)
-                elif comparison_op == "lt":
-                    state = LessThanExpression(
-                        expression_parts[1], expression_parts[2]
-                    ).evaluate(db, state)
-                elif comparison_op == "gt":
-                    state = GreaterThanExpression(
-                        expression_parts[1], expression_parts[2]
-                    ).evaluate(db, state)
-                elif comparison_op == "lte":
-                    state = LessThanEqualToExpression(
-                        expression_parts[1], expression_parts[2]
-                    ).evaluate(db, state)
-                elif comparison_op == "gte":
-                    state = GreaterThanEqualToExpression(
-                        expression_parts[1], expression_parts[2]
-                    ).evaluate(db, state)
-                else:
-                    raise ValueError(f"Unrecognized query expression: {expression_str}")
-            else:
-                raise ValueError(f"Unrecognized query expression: {expression_str}")
+        if (
+            unifier is not None
+            and not state.bindings
+            and expressions
+            and isinstance(expressions[0], AssertExpression)
+            and any(n.node_type == NodeType.VARIABLE for n in expressions[0].nodes)
+        ):
+            state = unifier.evaluate(expressions[0])
+
+            if state.success is False:
+                return state
+
+            expressions = expressions[1:]
+
+        return PreparedQuery(expressions).evaluate(db, state)
+
+
+def _compile(
+    key: tuple, expressions: tuple[Union[str, tuple[object, ...]], ...]
+) -> CompiledQuery:
+    """Get the compiled query for a key of normalized expressions."""
+
+    with _COMPILED_LOCK:
+        compiled = _COMPILED.get(key)
+
+        if compiled is not None:
+            _COMPILED.move_to_end(key)
+            return compiled
+
+    compiled = CompiledQuery(DBQuery(expressions)._create_expressions(False))
+
+    with _COMPILED_LOCK:
+        compiled = _COMPILED.setdefault(key, compiled)
+
+        if len(_COMPILED) > _MAX_COMPILED:
+            _COMPILED.popitem(last=False)
 
-        return state.to_result()
+    return compiled
@@ -2,37 +2,86 @@
 
 """
 
+import math
+from abc import abstractmethod
+from typing import ClassVar, Iterable, Iterator, Optional, Sequence, Union
+
 from repraxis.database import RePraxisDatabase
-from repraxis.helpers import bind_sentence, parse_sentence, sentence_has_variables
-from repraxis.nodes.base_types import INode
+from repraxis.helpers import (
+    bind_sentence,
+    create_sentence,
+    parse_sentence,
+    sentence_has_variables,
+)
+from repraxis.nodes.base_types import INode, NodeType
+from repraxis.nodes.sorted_children import KeyRange
+from repraxis.paths import Path, path_nodes
 from repraxis.query.base_types import IQueryExpression
-from repraxis.query.helpers import unify_all
+from repraxis.query.helpers import (
+    Steps,
+    probe_steps,
+    run_steps,
+    unify_all,
+    unify_all_steps,
+    union_bindings_steps,
+)
 from repraxis.query.query_state import QueryState
+from repraxis.query.vectorized import filter_comparison
+
+# Largest number of bindings an assert expression looks up one at a time instead of
+# unifying its sentence and joining the matches.
+_PROBE_LIMIT = 64
 
 
 class AssertExpression(IQueryExpression):
-    """Asserts a given statement is in the database."""
+    """Asserts a given statement is in the database.
 
-    __slots__ = ("statement",)
+    The statement may be a sentence string or a path of values and Var objects.
+    Variables with an entry in ranges are only bound to values inside the range (see
+    push_down_ranges()).
+    """
+
+    __slots__ = ("statement", "nodes", "ranges")
 
     statement: str
+    nodes: list[INode]
+    ranges: dict[str, KeyRange]
 
-    def __init__(self, statement: str) -> None:
+    def __init__(self, statement: Union[str, Path]) -> None:
         super().__init__()
-        self.statement = statement
+        self.ranges = {}
+        if isinstance(statement, str):
+            self.statement = statement
+            self.nodes = parse_sentence(statement)
+        else:
+            self.nodes = path_nodes(statement)
+            self.statement = create_sentence(self.nodes)
 
     def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
-        if sentence_has_variables(self.statement):
-            bindings = unify_all(database, state, [self.statement])
+        return run_steps(self.evaluate_steps(database, state))
+
+    def evaluate_steps(
+        self, database: RePraxisDatabase, state: QueryState
+    ) -> Steps[QueryState]:
+        if any(node.node_type == NodeType.VARIABLE for node in self.nodes):
+            if self._should_probe(state):
+                bindings = yield from probe_steps(
+                    database, state.bindings, self.nodes, self.ranges
+                )
+            else:
+                bindings = yield from unify_all_steps(
+                    database, state, [self.nodes], self.ranges
+                )
 
             if len(bindings) == 0:
                 return QueryState(False)
 
-            valid_bindings = [
-                binding
-                for binding in bindings
-                if database.assert_statement(bind_sentence(self.statement, binding))
-            ]
+            valid_bindings: list[dict[str, INode]] = []
+
+            for binding in bindings:
+                if database.assert_statement(bind_sentence(self.statement, binding)):
+                    valid_bindings.append(binding)
+                yield 1
 
             if len(valid_bindings) == 0:
                 return QueryState(False)
@@ -44,72 +93,60 @@ class AssertExpression(IQueryExpression):
 
         return state
 
+    def _should_probe(self, state: QueryState) -> bool:
+        """Check if there are few enough bindings to look up one at a time.
 
-class EqualsExpression(IQueryExpression):
-    """Evaluates if two values have the same value."""
+        Every binding must fill in at least one variable. Otherwise, looking up each
+        binding repeats the work of unifying the whole sentence.
+        """
 
-    __slots__ = ("lh_value", "rh_value")
+        if not 0 < len(state.bindings) <= _PROBE_LIMIT:
+            return False
 
-    lh_value: str
-    rh_value: str
-
-    def __init__(self, lh_value: str, rh_value: str) -> None:
-        self.lh_value = lh_value
-        self.rh_value = rh_value
-
-    def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
-        lh_nodes = parse_sentence(self.lh_value)
-        rh_nodes = parse_sentence(self.rh_value)
-
-        if len(lh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.lh_value} has too many parts."
-            )
-
-        if len(rh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.rh_value} has too many parts."
-            )
+        variables = [n.symbol for n in self.nodes if n.node_type == NodeType.VARIABLE]
 
-        # If no bindings are found and at least one of the values is a variable,
-        # then the query has failed.
-        if len(state.bindings) == 0 and (
-            sentence_has_variables(self.lh_value)
-            or sentence_has_variables(self.rh_value)
-        ):
-            return QueryState(False)
+        if len(set(variables)) != len(variables):
+            return False
 
-        # Loop through the bindings and find those where the bound values
-        # are equivalent.
-        valid_bindings = [
-            binding
+        return all(
+            any(variable in binding for variable in variables)
             for binding in state.bindings
-            if parse_sentence(bind_sentence(self.lh_value, binding))[0].equal_to(
-                parse_sentence(bind_sentence(self.rh_value, binding))[0]
-            )
-        ]
+        )
 
-        if not valid_bindings:
-            return QueryState(False)
 
-        return QueryState(True, valid_bindings)
+class ComparisonExpression(IQueryExpression):
+    """Base class for expressions comparing two single values.
 
+    Each operand may be a variable, symbol or constant. When vectorized is True and
+    every bound operand is an int or float, the comparison is evaluated as a single
+    NumPy mask over all bindings. Otherwise, bindings are checked one at a time.
+    """
 
-class NotEqualExpression(IQueryExpression):
-    """Evaluates if two values do not the same value."""
+    __slots__ = ("lh_value", "rh_value", "vectorized")
 
-    __slots__ = ("lh_value", "rh_value")
+    operator: ClassVar[str]
 
     lh_value: str
     rh_value: str
+    vectorized: bool
 
-    def __init__(self, lh_value: str, rh_value: str) -> None:
+    def __init__(self, lh_value: str, rh_value: str, vectorized: bool = False) -> None:
         self.lh_value = lh_value
         self.rh_value = rh_value
+        self.vectorized = vectorized
+
+    @abstractmethod
+    def compare(self, lh_node: INode, rh_node: INode) -> bool:
+        """Compare two bound values."""
+
+        raise NotImplementedError()
 
     def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
+        return run_steps(self.evaluate_steps(database, state))
+
+    def evaluate_steps(
+        self, database: RePraxisDatabase, state: QueryState
+    ) -> Steps[QueryState]:
         lh_nodes = parse_sentence(self.lh_value)
         rh_nodes = parse_sentence(self.rh_value)
 
@@ -133,71 +170,25 @@ class NotEqualExpression(IQueryExpression):
         ):
             return QueryState(False)
 
-        # Loop through the bindings and find those where the bound values
-        # are equivalent.
-        valid_bindings = [
-            binding
-            for binding in state.bindings
-            if parse_sentence(bind_sentence(self.lh_value, binding))[0].not_equal_to(
-                parse_sentence(bind_sentence(self.rh_value, binding))[0]
-            )
-        ]
-
-        if not valid_bindings:
-            return QueryState(False)
-
-        return QueryState(True, valid_bindings)
-
-
-class GreaterThanEqualToExpression(IQueryExpression):
-    """Check if one expression's value is greater than or equal to another's"""
-
-    __slots__ = ("lh_value", "rh_value")
-
-    lh_value: str
-    rh_value: str
-
-    def __init__(self, lh_value: str, rh_value: str) -> None:
-        self.lh_value = lh_value
-        self.rh_value = rh_value
+        valid_bindings: Optional[list[dict[str, INode]]] = None
 
-    def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
-        lh_nodes = parse_sentence(self.lh_value)
-        rh_nodes = parse_sentence(self.rh_value)
-
-        if len(lh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.lh_value} has too many parts."
+        if self.vectorized:
+            valid_bindings = filter_comparison(
+                state.bindings, lh_nodes[0], rh_nodes[0], self.operator
             )
 
-        if len(rh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.rh_value} has too many parts."
-            )
-
-        # If no bindings are found and at least one of the values is a variable,
-        # then the query has failed.
-        if len(state.bindings) == 0 and (
-            sentence_has_variables(self.lh_value)
-            or sentence_has_variables(self.rh_value)
-        ):
-            return QueryState(False)
+        if valid_bindings is None:
+            # Loop through the bindings and find those where the bound values
+            # pass the comparison.
+            valid_bindings = []
 
-        # Loop through the bindings and find those where the bound left value
-        # is greater than or equal to the right.
-        valid_bindings = [
-            binding
-            for binding in state.bindings
-            if (
-                parse_sentence(bind_sentence(self.lh_value, binding))[
-                    0
-                ].greater_than_equal_to(
-                    parse_sentence(bind_sentence(self.rh_value, binding))[0]
-                )
-            )
-        ]
+            for binding in state.bindings:
+                if self.compare(
+                    parse_sentence(bind_sentence(self.lh_value, binding))[0],
+                    parse_sentence(bind_sentence(self.rh_value, binding))[0],
+                ):
+                    valid_bindings.append(binding)
+                yield 1
 
         if not valid_bindings:
             return QueryState(False)
@@ -205,168 +196,70 @@ class GreaterThanEqualToExpression(IQueryExpression):
         return QueryState(True, valid_bindings)
 
 
-class GreaterThanExpression(IQueryExpression):
-    """Check if one expression's value is greater than another's"""
-
-    __slots__ = ("lh_value", "rh_value")
-
-    lh_value: str
-    rh_value: str
-
-    def __init__(self, lh_value: str, rh_value: str) -> None:
-        self.lh_value = lh_value
-        self.rh_value = rh_value
-
-    def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
-        lh_nodes = parse_sentence(self.lh_value)
-        rh_nodes = parse_sentence(self.rh_value)
-
-        if len(lh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.lh_value} has too many parts."
-            )
-
-        if len(rh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.rh_value} has too many parts."
-            )
+class EqualsExpression(ComparisonExpression):
+    """Evaluates if two values have the same value."""
 
-        # If no bindings are found and at least one of the values is a variable,
-        # then the query has failed.
-        if len(state.bindings) == 0 and (
-            sentence_has_variables(self.lh_value)
-            or sentence_has_variables(self.rh_value)
-        ):
-            return QueryState(False)
+    __slots__ = ()
 
-        # Loop through the bindings and find those where the bound left value
-        # is greater than or equal to the right.
-        valid_bindings = [
-            binding
-            for binding in state.bindings
-            if (
-                parse_sentence(bind_sentence(self.lh_value, binding))[0].greater_than(
-                    parse_sentence(bind_sentence(self.rh_value, binding))[0]
-                )
-            )
-        ]
+    operator = "eq"
 
-        if not valid_bindings:
-            return QueryState(False)
+    def compare(self, lh_node: INode, rh_node: INode) -> bool:
+        return lh_node.equal_to(rh_node)
 
-        return QueryState(True, valid_bindings)
 
+class NotEqualExpression(ComparisonExpression):
+    """Evaluates if two values do not the same value."""
 
-class LessThanExpression(IQueryExpression):
-    """Check if one expression's value is less than another's"""
+    __slots__ = ()
 
-    __slots__ = ("lh_value", "rh_value")
+    operator = "neq"
 
-    lh_value: str
-    rh_value: str
+    def compare(self, lh_node: INode, rh_node: INode) -> bool:
+        return lh_node.not_equal_to(rh_node)
 
-    def __init__(self, lh_value: str, rh_value: str) -> None:
-        self.lh_value = lh_value
-        self.rh_value = rh_value
 
-    def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
-        lh_nodes = parse_sentence(self.lh_value)
-        rh_nodes = parse_sentence(self.rh_value)
+class GreaterThanEqualToExpression(ComparisonExpression):
+    """Check if one expression's value is greater than or equal to another's"""
 
-        if len(lh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.lh_value} has too many parts."
-            )
+    __slots__ = ()
 
-        if len(rh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.rh_value} has too many parts."
-            )
+    operator = "gte"
 
-        # If no bindings are found and at least one of the values is a variable,
-        # then the query has failed.
-        if len(state.bindings) == 0 and (
-            sentence_has_variables(self.lh_value)
-            or sentence_has_variables(self.rh_value)
-        ):
-            return QueryState(False)
+    def compare(self, lh_node: INode, rh_node: INode) -> bool:
+        return lh_node.greater_than_equal_to(rh_node)
 
-        # Loop through the bindings and find those where the bound left value
-        # is greater than or equal to the right.
-        valid_bindings = [
-            binding
-            for binding in state.bindings
-            if (
-                parse_sentence(bind_sentence(self.lh_value, binding))[0].less_than(
-                    parse_sentence(bind_sentence(self.rh_value, binding))[0]
-                )
-            )
-        ]
 
-        if not valid_bindings:
-            return QueryState(False)
+class GreaterThanExpression(ComparisonExpression):
+    """Check if one expression's value is greater than another's"""
 
-        return QueryState(True, valid_bindings)
+    __slots__ = ()
 
+    operator = "gt"
 
-class LessThanEqualToExpression(IQueryExpression):
-    """Check if one expression's value is less than or equal to another's"""
+    def compare(self, lh_node: INode, rh_node: INode) -> bool:
+        return lh_node.greater_than(rh_node)
 
-    __slots__ = ("lh_value", "rh_value")
 
-    lh_value: str
-    rh_value: str
+class LessThanExpression(ComparisonExpression):
+    """Check if one expression's value is less than another's"""
 
-    def __init__(self, lh_value: str, rh_value: str) -> None:
-        self.lh_value = lh_value
-        self.rh_value = rh_value
+    __slots__ = ()
 
-    def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
-        lh_nodes = parse_sentence(self.lh_value)
-        rh_nodes = parse_sentence(self.rh_value)
+    operator = "lt"
 
-        if len(lh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.lh_value} has too many parts."
-            )
+    def compare(self, lh_node: INode, rh_node: INode) -> bool:
+        return lh_node.less_than(rh_node)
 
-        if len(rh_nodes) > 1:
-            raise ValueError(
-                "Comparator expression may only be single variables, symbols, "
-                f"or constants. {self.rh_value} has too many parts."
-            )
 
-        # If no bindings are found and at least one of the values is a variable,
-        # then the query has failed.
-        if len(state.bindings) == 0 and (
-            sentence_has_variables(self.lh_value)
-            or sentence_has_variables(self.rh_value)
-        ):
-            return QueryState(False)
+class LessThanEqualToExpression(ComparisonExpression):
+    """Check if one expression's value is less than or equal to another's"""
 
-        # Loop through the bindings and find those where the bound left value
-        # is greater than or equal to the right.
-        valid_bindings = [
-            binding
-            for binding in state.bindings
-            if (
-                parse_sentence(bind_sentence(self.lh_value, binding))[
-                    0
-                ].less_than_equal_to(
-                    parse_sentence(bind_sentence(self.rh_value, binding))[0]
-                )
-            )
-        ]
+    __slots__ = ()
 
-        if not valid_bindings:
-            return QueryState(False)
+    operator = "lte"
 
-        return QueryState(True, valid_bindings)
+    def compare(self, lh_node: INode, rh_node: INode) -> bool:
+        return lh_node.less_than_equal_to(rh_node)
 
 
 class NotExpression(IQueryExpression):
@@ -378,12 +271,17 @@ class NotExpression(IQueryExpression):
         self.statement = statement
 
     def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
+        return run_steps(self.evaluate_steps(database, state))
+
+    def evaluate_steps(
+        self, database: RePraxisDatabase, state: QueryState
+    ) -> Steps[QueryState]:
         if sentence_has_variables(self.statement):
             # If there are no existing bindings, then this is the first statement in the query
             # or no previous statements contained variables.
             if len(state.bindings) == 0:
                 # We need to find bindings for all of the variables in this expression
-                bindings = unify_all(database, state, [self.statement])
+                bindings = yield from unify_all_steps(database, state, [self.statement])
 
                 # If bindings for variables are found then we know this expression fails
                 # because we want to ensure that the statement is never true
@@ -394,11 +292,12 @@ class NotExpression(IQueryExpression):
                 return state
 
             # If we have existing bindings, we need to filter the existing bindings
-            valid_bindings = [
-                binding
-                for binding in state.bindings
-                if self._evaluate_binding(database, binding)
-            ]
+            valid_bindings: list[dict[str, INode]] = []
+
+            for binding in state.bindings:
+                if self._evaluate_binding(database, binding):
+                    valid_bindings.append(binding)
+                yield 1
 
             if not valid_bindings:
                 return QueryState(False)
@@ -431,3 +330,196 @@ class NotExpression(IQueryExpression):
             return True
 
         return not database.assert_statement(sentence)
+
+
+class OrExpression(IQueryExpression):
+    """Succeeds for the bindings that satisfy at least one of several expressions.
+
+    Each branch is evaluated against the bindings produced by the expressions before
+    it, so the shared part of the query only runs once. The bindings of every branch
+    that succeeds are merged as a set union.
+    """
+
+    __slots__ = ("expressions",)
+
+    expressions: tuple[IQueryExpression, ...]
+
+    def __init__(self, expressions: Sequence[IQueryExpression]) -> None:
+        if len(expressions) < 2:
+            raise ValueError("Or expressions need at least two branches.")
+
+        self.expressions = tuple(expressions)
+
+    def evaluate(self, database: RePraxisDatabase, state: QueryState) -> QueryState:
+        return run_steps(self.evaluate_steps(database, state))
+
+    def evaluate_steps(
+        self, database: RePraxisDatabase, state: QueryState
+    ) -> Steps[QueryState]:
+        binding_lists: list[list[dict[str, INode]]] = []
+
+        for expression in self.expressions:
+            branch_state = yield from expression.evaluate_steps(database, state)
+
+            if branch_state.success is False:
+                continue
+
+            # A branch without variables that holds before anything is bound places
+            # no constraints on the rest of the query, and neither does the union.
+            if len(branch_state.bindings) == 0:
+                return branch_state
+
+            binding_lists.append(branch_state.bindings)
+
+        if not binding_lists:
+            return QueryState(False)
+
+        bindings = yield from union_bindings_steps(binding_lists)
+
+        return QueryState(True, bindings)
+
+
+def read_heads(expressions: Iterable[IQueryExpression]) -> Iterator[Optional[str]]:
+    """Get the first symbols of the sentences that expressions read.
+
+    None stands for a sentence starting with a variable, which could read any part of
+    the database.
+    """
+
+    pending = list(expressions)
+
+    while pending:
+        expression = pending.pop()
+
+        if isinstance(expression, AssertExpression):
+            nodes = expression.nodes
+        elif isinstance(expression, NotExpression):
+            nodes = parse_sentence(expression.statement)
+        elif isinstance(expression, OrExpression):
+            pending.extend(expression.expressions)
+            continue
+        else:
+            continue
+
+        yield None if nodes[0].node_type == NodeType.VARIABLE else nodes[0].symbol
+
+
+def push_down_ranges(expressions: Sequence[IQueryExpression]) -> None:
+    """Limit the values asserts bind to variables that are compared with constants.
+
+    A comparison such as "gt ?r 5" filters every binding made before it, so earlier
+    asserts can skip children outside the range instead of binding them and filtering
+    them out later. The comparisons are still evaluated, and numeric ranges are widened
+    to keep floats whose symbols round onto the bound. Only comparisons and asserts at
+    the top level of the query are used. A range is not pushed past expressions that
+    could raise an error, so skipping bindings never hides an error the query reports.
+    """
+
+    for index, expression in enumerate(expressions):
+        if not isinstance(expression, ComparisonExpression):
+            continue
+
+        lh_nodes = parse_sentence(expression.lh_value)
+        rh_nodes = parse_sentence(expression.rh_value)
+
+        if len(lh_nodes) > 1 or len(rh_nodes) > 1:
+            # The comparison reports the error when it is evaluated.
+            continue
+
+        lh_node, rh_node = lh_nodes[0], rh_nodes[0]
+        operator = expression.operator
+
+        if rh_node.node_type == NodeType.VARIABLE:
+            lh_node, rh_node = rh_node, lh_node
+            operator = _FLIPPED_OPERATORS.get(operator, operator)
+
+        if (
+            lh_node.node_type != NodeType.VARIABLE
+            or rh_node.node_type == NodeType.VARIABLE
+            or operator not in _RANGE_BOUNDS
+        ):
+            continue
+
+        value = rh_node.get_value()
+        has_low, has_high, inclusive = _RANGE_BOUNDS[operator]
+        low = high = value
+
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            # Bound floats are compared at the precision of their symbols, so values
+            # just outside the range may still pass the comparison.
+            margin = abs(value) * _FLOAT_SYMBOL_ERROR
+            low, high = value - margin, value + margin
+            inclusive = inclusive or margin > 0
+
+        key_range = KeyRange(
+            low if has_low else None,
+            high if has_high else None,
+            inclusive,
+            inclusive,
+        )
+
+        for position in range(index - 1, -1, -1):
+            previous = expressions[position]
+
+            if _may_raise(previous, expressions[:position]):
+                # Skipping bindings before it could hide an error it raises.
+                break
+
+            if isinstance(previous, AssertExpression) and any(
+                node.symbol == lh_node.symbol for node in previous.nodes
+            ):
+                existing = previous.ranges.get(lh_node.symbol)
+                previous.ranges[lh_node.symbol] = (
+                    existing.intersect(key_range) if existing else key_range
+                )
+
+
+def _may_raise(
+    expression: IQueryExpression, previous: Sequence[IQueryExpression]
+) -> bool:
+    """Check if an expression could raise an error for some bindings.
+
+    Equality comparisons of variables bound by previous asserts never raise. Ordering
+    comparisons raise for values of different types.
+    """
+
+    if isinstance(expression, (AssertExpression, NotExpression)):
+        return False
+
+    if not isinstance(expression, (EqualsExpression, NotEqualExpression)):
+        return True
+
+    bound = {
+        node.symbol
+        for p in previous
+        if isinstance(p, AssertExpression)
+        for node in p.nodes
+        if node.node_type == NodeType.VARIABLE
+    }
+
+    return any(
+        len(nodes) > 1
+        or (nodes[0].node_type == NodeType.VARIABLE and nodes[0].symbol not in bound)
+        for nodes in (
+            parse_sentence(expression.lh_value),
+            parse_sentence(expression.rh_value),
+        )
+    )
+
+
+# Largest relative difference between a float and the value of its symbol, which keeps
+# 3 significant digits, with some slack.
+_FLOAT_SYMBOL_ERROR = 0.01
+
+# Operators with the operands swapped, so "gt 5 ?r" becomes "lt ?r 5".
+_FLIPPED_OPERATORS = {"gt": "lt", "lt": "gt", "gte": "lte", "lte": "gte"}
+
+# Whether each operator bounds a variable from below and above, and if the bounds are
+# inclusive.
+_RANGE_BOUNDS: dict[str, tuple[bool, bool, bool]] = {
+    "eq": (True, True, True),
+    "gt": (True, False, False),
+    "gte": (True, False, True),
+    "lt": (False, True, False),
+    "lte": (False, True, True),
+}
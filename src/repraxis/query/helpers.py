@@ -2,79 +2,378 @@
 
 """
 
-from typing import Iterable
+from typing import Generator, Iterable, Optional, Sequence, TypeVar, Union
 
 from repraxis.database import RePraxisDatabase
 from repraxis.helpers import parse_sentence
 from repraxis.nodes.base_types import INode, NodeType
+from repraxis.nodes.sorted_children import KeyRange
 from repraxis.query.query_binding_context import QueryBindingContext
 from repraxis.query.query_state import QueryState
 
+_T = TypeVar("_T")
 
-def unify(database: RePraxisDatabase, sentence: str) -> list[dict[str, INode]]:
-    """Generate potential bindings from the database for a single sentence."""
+# Largest number of children or bindings processed between yields, so a single step
+# stays short however wide the database is.
+_CHUNK_SIZE = 256
 
-    unified = [QueryBindingContext(database.root)]
+Steps = Generator[int, None, _T]
+"""A resumable computation.
 
-    tokens = parse_sentence(sentence)
+Each yield reports the units of work (node visits or bindings checked) performed since
+the previous yield. The generator's return value is the result of the computation.
+"""
+
+
+def run_steps(steps: Steps[_T]) -> _T:
+    """Run a resumable computation to completion and return its result."""
+
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def unify(
+    database: RePraxisDatabase, sentence: Union[str, Sequence[INode]]
+) -> list[dict[str, INode]]:
+    """Generate potential bindings from the database for a single sentence.
+
+    The sentence may also be given as a list of already parsed nodes.
+    """
+
+    return run_steps(unify_steps(database, sentence))
+
+
+def unify_steps(
+    database: RePraxisDatabase,
+    sentence: Union[str, Sequence[INode]],
+    ranges: Optional[dict[str, KeyRange]] = None,
+) -> Steps[list[dict[str, INode]]]:
+    """Unify a single sentence, yielding after each sub_tree in the frontier.
+
+    Variables with an entry in ranges are only bound to children inside the range.
+    """
+
+    tokens = parse_sentence(sentence) if isinstance(sentence, str) else sentence
+    unified = yield from unify_from_steps(
+        [QueryBindingContext(database.root)], tokens, ranges
+    )
+
+    results: list[dict[str, INode]] = []
+
+    for i, unification in enumerate(unified, 1):
+        if len(unification.bindings) > 0:
+            results.append(unification.bindings)
+
+        if i % _CHUNK_SIZE == 0:
+            yield _CHUNK_SIZE
+
+    return results
+
+
+def unify_from_steps(
+    frontier: list[QueryBindingContext],
+    tokens: Sequence[INode],
+    ranges: Optional[dict[str, KeyRange]] = None,
+) -> Steps[list[QueryBindingContext]]:
+    """Unify tokens below each sub_tree in a frontier, yielding after each sub_tree.
+
+    Wide sub_trees also yield after every chunk of children. Returns a context for
+    every match, holding the node the last token matched.
+    """
+
+    unified = frontier
 
     for token in tokens:
         next_unified: list[QueryBindingContext] = []
+        key_range = ranges.get(token.symbol) if ranges else None
 
         for entry in unified:
-            for child in entry.sub_tree.children:
-                if token.node_type == NodeType.VARIABLE:
-                    unification = QueryBindingContext(
-                        child, {key: value for key, value in entry.bindings.items()}
-                    )
-                    unification.bindings[token.symbol] = child
-                    next_unified.append(unification)
-                else:
-                    if token.symbol == child.symbol:
-                        next_unified.append(QueryBindingContext(child, entry.bindings))
+            if token.node_type != NodeType.VARIABLE:
+                # Constants are looked up directly instead of scanning the children.
+                child = entry.sub_tree.find_child(token.symbol)
+
+                if child is not None:
+                    next_unified.append(QueryBindingContext(child, entry.bindings))
+
+                yield 1
+                continue
+
+            visited = 0
+
+            for child in (
+                entry.sub_tree.children
+                if key_range is None
+                else entry.sub_tree.children_in_range(key_range)
+            ):
+                visited += 1
+                unification = QueryBindingContext(
+                    child, {key: value for key, value in entry.bindings.items()}
+                )
+                unification.bindings[token.symbol] = child
+                next_unified.append(unification)
+
+                if visited == _CHUNK_SIZE:
+                    yield visited
+                    visited = 0
+
+            yield visited
 
         unified = next_unified
 
-    return [
-        unification.bindings for unification in unified if len(unification.bindings) > 0
-    ]
+    return unified
 
 
 def unify_all(
-    database: RePraxisDatabase, state: QueryState, sentences: Iterable[str]
+    database: RePraxisDatabase,
+    state: QueryState,
+    sentences: Iterable[Union[str, Sequence[INode]]],
 ) -> list[dict[str, INode]]:
     """Generate potential bindings from the database unifying across all given sentences."""
 
-    possible_bindings = [binding.copy() for binding in state.bindings]
+    return run_steps(unify_all_steps(database, state, sentences))
 
-    for sentence in sentences:
-        iterative_bindings: list[dict[str, INode]] = []
 
-        new_bindings = unify(database, sentence)
+def unify_all_steps(
+    database: RePraxisDatabase,
+    state: QueryState,
+    sentences: Iterable[Union[str, Sequence[INode]]],
+    ranges: Optional[dict[str, KeyRange]] = None,
+) -> Steps[list[dict[str, INode]]]:
+    """Unify across all given sentences, yielding periodically."""
 
-        if not possible_bindings:
-            # Copy the new bindings to the iterative bindings list
-            for binding in new_bindings:
-                iterative_bindings.append(binding.copy())
-        else:
-            for old_binding in possible_bindings:
-                for binding in new_bindings:
-                    new_keys = [k for k in binding.keys() if k not in old_binding]
-                    old_keys = [k for k in binding.keys() if k in old_binding]
-                    exists_incompatible_key = any(
-                        k for k in old_keys if not old_binding[k].equal_to(binding[k])
-                    )
+    possible_bindings: list[dict[str, INode]] = []
 
-                    if exists_incompatible_key:
-                        continue
-                    else:
-                        next_unification = old_binding.copy()
+    for i, binding in enumerate(state.bindings, 1):
+        possible_bindings.append(binding.copy())
 
-                        for k in new_keys:
-                            next_unification[k] = binding[k]
+        if i % _CHUNK_SIZE == 0:
+            yield _CHUNK_SIZE
 
-                        iterative_bindings.append(next_unification)
+    for sentence in sentences:
+        new_bindings = yield from unify_steps(database, sentence, ranges)
+
+        iterative_bindings = yield from join_bindings_steps(
+            possible_bindings, new_bindings
+        )
 
         possible_bindings = iterative_bindings
 
-    return [bindings for bindings in possible_bindings if len(bindings) > 0]
+    results: list[dict[str, INode]] = []
+
+    for i, bindings in enumerate(possible_bindings, 1):
+        if len(bindings) > 0:
+            results.append(bindings)
+
+        if i % _CHUNK_SIZE == 0:
+            yield _CHUNK_SIZE
+
+    return results
+
+
+def probe_steps(
+    database: RePraxisDatabase,
+    bindings: list[dict[str, INode]],
+    sentence: Sequence[INode],
+    ranges: Optional[dict[str, KeyRange]] = None,
+) -> Steps[list[dict[str, INode]]]:
+    """Unify a sentence once per existing binding, with its variables filled in.
+
+    This gives the same bindings, in the same order, as unifying the sentence and
+    joining the matches with the existing bindings. Bound variables are looked up
+    directly like constants, so this is faster when there are few bindings. Each
+    variable may appear in the sentence only once. Unbound variables with an entry
+    in ranges are only bound to children inside the range.
+    """
+
+    results: list[dict[str, INode]] = []
+
+    for binding in bindings:
+        frontier: list[tuple[INode, dict[str, INode]]] = [(database.root, binding)]
+
+        for token in sentence:
+            next_frontier: list[tuple[INode, dict[str, INode]]] = []
+            is_variable = token.node_type == NodeType.VARIABLE
+
+            key_range = ranges.get(token.symbol) if ranges and is_variable else None
+
+            for sub_tree, current in frontier:
+                if is_variable and token.symbol not in current:
+                    for child in (
+                        sub_tree.children
+                        if key_range is None
+                        else sub_tree.children_in_range(key_range)
+                    ):
+                        extended = current.copy()
+                        extended[token.symbol] = child
+                        next_frontier.append((child, extended))
+
+                        if len(next_frontier) % _CHUNK_SIZE == 0:
+                            yield _CHUNK_SIZE
+                    continue
+
+                value = current[token.symbol] if is_variable else token
+                child = sub_tree.find_child(value.symbol)
+
+                # Bound values must be equal, not just share a symbol, to match how
+                # bindings are joined.
+                if child is not None and (not is_variable or value.equal_to(child)):
+                    next_frontier.append((child, current))
+
+            frontier = next_frontier
+            yield len(frontier) + 1
+
+        for _, current in frontier:
+            results.append(current.copy() if current is binding else current)
+
+    return results
+
+
+def join_bindings(
+    possible_bindings: list[dict[str, INode]], new_bindings: list[dict[str, INode]]
+) -> list[dict[str, INode]]:
+    """Join existing bindings with new bindings that agree on shared variables."""
+
+    return run_steps(join_bindings_steps(possible_bindings, new_bindings))
+
+
+def join_bindings_steps(
+    possible_bindings: list[dict[str, INode]], new_bindings: list[dict[str, INode]]
+) -> Steps[list[dict[str, INode]]]:
+    """Join existing bindings with new ones, yielding after each existing binding.
+
+    New bindings are indexed by the values of the variables they share with the
+    existing bindings, so each existing binding only visits compatible new bindings.
+    Results keep the order of a nested loop over existing then new bindings.
+    """
+
+    iterative_bindings: list[dict[str, INode]] = []
+
+    if not possible_bindings:
+        # Copy the new bindings to the iterative bindings list
+        for binding in new_bindings:
+            iterative_bindings.append(binding.copy())
+
+            if len(iterative_bindings) % _CHUNK_SIZE == 0:
+                yield _CHUNK_SIZE
+
+        return iterative_bindings
+
+    # New bindings grouped by their variables. Bindings from unifying a single
+    # sentence all have the same variables, so there is usually one group.
+    groups: dict[tuple[str, ...], list[int]] = {}
+
+    for i, binding in enumerate(new_bindings):
+        groups.setdefault(tuple(binding), []).append(i)
+
+        if i % _CHUNK_SIZE == _CHUNK_SIZE - 1:
+            yield _CHUNK_SIZE
+
+    indexes: dict[tuple[tuple[str, ...], tuple[str, ...]], dict[tuple, list[int]]] = {}
+
+    for old_binding in possible_bindings:
+        matches: list[int] = []
+
+        for variables, members in groups.items():
+            shared = tuple(k for k in variables if k in old_binding)
+            index = indexes.get((variables, shared))
+
+            if index is None:
+                index = {}
+                for j, i in enumerate(members, 1):
+                    key = _join_key(new_bindings[i], shared)
+                    if key is not None:
+                        index.setdefault(key, []).append(i)
+                    if j % _CHUNK_SIZE == 0:
+                        yield _CHUNK_SIZE
+                indexes[(variables, shared)] = index
+
+            key = _join_key(old_binding, shared)
+
+            if key is not None:
+                matches.extend(index.get(key, ()))
+
+        if len(groups) > 1:
+            matches.sort()
+
+        for j, i in enumerate(matches, 1):
+            next_unification = old_binding.copy()
+
+            for k, node in new_bindings[i].items():
+                if k not in old_binding:
+                    next_unification[k] = node
+
+            iterative_bindings.append(next_unification)
+
+            if j % _CHUNK_SIZE == 0:
+                yield _CHUNK_SIZE
+
+        yield len(matches) % _CHUNK_SIZE + 1
+
+    return iterative_bindings
+
+
+def union_bindings(
+    binding_lists: Iterable[list[dict[str, INode]]],
+) -> list[dict[str, INode]]:
+    """Merge lists of bindings, keeping the first copy of each distinct binding."""
+
+    return run_steps(union_bindings_steps(binding_lists))
+
+
+def union_bindings_steps(
+    binding_lists: Iterable[list[dict[str, INode]]],
+) -> Steps[list[dict[str, INode]]]:
+    """Merge lists of bindings, yielding after each list.
+
+    Bindings are deduplicated by hashing their variables and values, so the union
+    takes time in proportion to the number of bindings. Bindings holding NaN are
+    never equal to another binding and are always kept.
+    """
+
+    seen: set[tuple] = set()
+    results: list[dict[str, INode]] = []
+
+    for bindings in binding_lists:
+        for i, binding in enumerate(bindings, 1):
+            if i % _CHUNK_SIZE == 0:
+                yield _CHUNK_SIZE
+
+            variables = tuple(sorted(binding))
+            values = _join_key(binding, variables)
+
+            if values is not None:
+                key = (variables, values)
+
+                if key in seen:
+                    continue
+
+                seen.add(key)
+
+            results.append(binding)
+
+        yield len(bindings) % _CHUNK_SIZE + 1
+
+    return results
+
+
+def _join_key(binding: dict[str, INode], variables: tuple[str, ...]) -> Optional[tuple]:
+    """Get a hashable key that is equal for bindings with equal values.
+
+    Returns None if a value is NaN, since NaN is not equal to anything.
+    """
+
+    key = []
+
+    for variable in variables:
+        node = binding[variable]
+        value = node.get_value()
+
+        if value != value:  # pylint: disable=comparison-with-itself
+            return None
+
+        key.append((node.node_type, value))
+
+    return tuple(key)
@@ -0,0 +1,177 @@
+"""Prepared Queries.
+
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Iterable, Iterator, Optional
+
+from repraxis.database import RePraxisDatabase
+from repraxis.helpers import node_from_object
+from repraxis.nodes.base_types import INode, NodeCardinality
+from repraxis.nodes.nodes import IntNode
+from repraxis.query.base_types import IQueryExpression
+from repraxis.query.expressions import read_heads
+from repraxis.query.query_result import QueryResult
+from repraxis.query.query_state import QueryState
+
+# Binding key recording which input binding set a binding came from. It cannot clash
+# with query variables, which always start with "?".
+_SEED = "#seed"
+
+# Number of bindings passed through the remaining expressions at a time when
+# streaming results.
+_CHUNK_SIZE = 64
+
+
+class PreparedQuery:
+    """A query whose expressions are parsed once and reused across runs.
+
+    Create prepared queries with DBQuery.prepare().
+    """
+
+    __slots__ = ("_expressions",)
+
+    _expressions: tuple[IQueryExpression, ...]
+
+    def __init__(self, expressions: Iterable[IQueryExpression]) -> None:
+        self._expressions = tuple(expressions)
+
+    @property
+    def expressions(self) -> tuple[IQueryExpression, ...]:
+        """The parsed expressions that make up the query."""
+        return self._expressions
+
+    def run(
+        self,
+        db: RePraxisDatabase,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+    ) -> QueryResult:
+        """Run the query against the database."""
+
+        return self.evaluate(
+            db, QueryState.from_object_bindings(True, bindings if bindings else [])
+        ).to_result()
+
+    def run_batch(
+        self, db: RePraxisDatabase, binding_sets: Iterable[dict[str, object]]
+    ) -> list[QueryResult]:
+        """Run the query once for each binding set and return a result for each.
+
+        Each result matches running the query with that binding set alone. All binding
+        sets are evaluated together: every sentence is unified with the database once,
+        and the matches are joined with the bindings of every set. The final bindings
+        are then split up by the set they came from.
+        """
+
+        seeds: list[dict[str, INode]] = []
+
+        for i, binding_set in enumerate(binding_sets):
+            seed = {k: node_from_object(v) for k, v in binding_set.items()}
+            seed[_SEED] = IntNode(i, NodeCardinality.NONE)
+            seeds.append(seed)
+
+        if not seeds:
+            return []
+
+        state = self.evaluate(db, QueryState(True, seeds))
+        results: list[list[dict[str, object]]] = [[] for _ in seeds]
+
+        if state.success:
+            for binding in state.bindings:
+                results[binding[_SEED].get_value()].append(  # type: ignore[index]
+                    {k: v.get_value() for k, v in binding.items() if k != _SEED}
+                )
+
+        return [
+            QueryResult(True, bindings) if bindings else QueryResult(False)
+            for bindings in results
+        ]
+
+    def sample(
+        self,
+        db: RePraxisDatabase,
+        k: int,
+        rng: Optional[random.Random] = None,
+        bindings: Optional[Iterable[dict[str, object]]] = None,
+    ) -> QueryResult:
+        """Pick up to k of the query's results uniformly at random.
+
+        Results are reservoir sampled as they stream out of the query, so the full
+        result list is never built. Pass a seeded random.Random as rng for
+        reproducible samples. The sampled bindings are in no particular order.
+        """
+
+        if k < 1:
+            raise ValueError(f"Sample size must be a positive integer, not {k}.")
+
+        choose = (rng if rng is not None else random).randrange
+        reservoir: list[dict[str, INode]] = []
+        success = False
+        seen = 0
+
+        for state in self.iter_states(
+            db, QueryState.from_object_bindings(True, bindings if bindings else [])
+        ):
+            success = True
+
+            for binding in state.bindings:
+                seen += 1
+
+                if len(reservoir) < k:
+                    reservoir.append(binding)
+                else:
+                    i = choose(seen)
+                    if i < k:
+                        reservoir[i] = binding
+
+        return QueryState(success, reservoir).to_result()
+
+    def iter_states(
+        self, db: RePraxisDatabase, state: QueryState
+    ) -> Iterator[QueryState]:
+        """Evaluate the query, yielding the final bindings a chunk at a time.
+
+        Once an expression produces more than a chunk of bindings, the remaining
+        expressions are evaluated depth-first on one chunk at a time. Only successful
+        states are yielded, and together their bindings match evaluate().
+
+        On a thread-safe database, the query's read locks are held until the iterator
+        is exhausted or closed.
+        """
+
+        with db.reading(read_heads(self._expressions)):
+            yield from self._iter_states(db, state, 0)
+
+    def _iter_states(
+        self, db: RePraxisDatabase, state: QueryState, start: int
+    ) -> Iterator[QueryState]:
+        for i in range(start, len(self._expressions)):
+            if state.success is False:
+                return
+
+            if len(state.bindings) > _CHUNK_SIZE:
+                for j in range(0, len(state.bindings), _CHUNK_SIZE):
+                    chunk = QueryState(True, state.bindings[j : j + _CHUNK_SIZE])
+                    yield from self._iter_states(
+                        db, self._expressions[i].evaluate(db, chunk), i + 1
+                    )
+                return
+
+            state = self._expressions[i].evaluate(db, state)
+
+        if state.success:
+            yield state
+
+    def evaluate(self, db: RePraxisDatabase, state: QueryState) -> QueryState:
+        """Evaluate the expressions, stopping at the first one that fails."""
+
+        with db.reading(read_heads(self._expressions)):
+            for expression in self._expressions:
+                state = expression.evaluate(db, state)
+
+                if state.success is False:
+                    break
+
+        return state
@@ -0,0 +1,168 @@
+"""Query Cursor.
+
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from repraxis.database import RePraxisDatabase
+from repraxis.query.base_types import IQueryExpression
+from repraxis.query.helpers import Steps
+from repraxis.query.query_result import QueryResult
+from repraxis.query.query_state import QueryState
+
+
+# Number of bindings converted to values between yields.
+_RESULT_CHUNK_SIZE = 256
+
+
+class QueryCursor:
+    """Evaluates a query a little at a time.
+
+    Each call to step() advances evaluation until its time budget is spent, keeping the
+    in-progress expression (including its unification frontier) suspended between
+    calls. This lets expensive queries be spread over several game frames without
+    threads. A step always performs at least one unit of work, so a cursor makes
+    progress even with a zero budget.
+
+    The database may be modified between steps. In that case, the results may reflect
+    some of those modifications.
+    """
+
+    __slots__ = (
+        "_database",
+        "_expressions",
+        "_state",
+        "_index",
+        "_steps",
+        "_finishing",
+        "_work_done",
+        "_result",
+    )
+
+    _database: RePraxisDatabase
+    _expressions: list[IQueryExpression]
+    _state: QueryState
+    _index: int
+    _steps: Optional[Steps[object]]
+    _finishing: bool
+    _work_done: int
+    _result: Optional[QueryResult]
+
+    def __init__(
+        self,
+        database: RePraxisDatabase,
+        expressions: list[IQueryExpression],
+        state: QueryState,
+    ) -> None:
+        self._database = database
+        self._expressions = expressions
+        self._state = state
+        self._index = 0
+        self._steps = None
+        self._finishing = False
+        self._work_done = 0
+        self._result = None
+
+    @property
+    def done(self) -> bool:
+        """Has the query finished evaluating."""
+        return self._result is not None
+
+    @property
+    def result(self) -> Optional[QueryResult]:
+        """The final result of the query, or None if it has not finished."""
+        return self._result
+
+    @property
+    def expressions_completed(self) -> int:
+        """The number of expressions fully evaluated so far."""
+        return self._index
+
+    @property
+    def expression_count(self) -> int:
+        """The total number of expressions in the query."""
+        return len(self._expressions)
+
+    @property
+    def work_done(self) -> int:
+        """Units of work (node visits or bindings checked) performed so far."""
+        return self._work_done
+
+    @property
+    def state(self) -> QueryState:
+        """The query state after the last completed expression."""
+        return self._state
+
+    def step(
+        self, budget_ns: int, max_work: Optional[int] = None
+    ) -> Optional[QueryResult]:
+        """Advance evaluation for up to budget_ns nanoseconds.
+
+        Evaluation also pauses after max_work units of work when given. Returns the
+        final result once the query finishes and None while work remains.
+        """
+
+        deadline = time.perf_counter_ns() + budget_ns
+        work = 0
+
+        while self._result is None:
+            if self._steps is None:
+                if self._index == len(self._expressions) or not self._state.success:
+                    # Large results are converted a chunk at a time too.
+                    self._steps = _result_steps(self._state)
+                    self._finishing = True
+                else:
+                    self._steps = self._expressions[self._index].evaluate_steps(
+                        self._database, self._state
+                    )
+
+            try:
+                units = next(self._steps)
+            except StopIteration as stop:
+                self._steps = None
+
+                if self._finishing:
+                    self._result = stop.value
+                    break
+
+                self._state = stop.value
+                self._index += 1
+                continue
+
+            work += units
+            self._work_done += units
+
+            if time.perf_counter_ns() >= deadline or (
+                max_work is not None and work >= max_work
+            ):
+                break
+
+        return self._result
+
+    def close(self) -> None:
+        """Abandon evaluation and release the suspended expression."""
+
+        if self._steps is not None:
+            self._steps.close()
+            self._steps = None
+
+
+def _result_steps(state: QueryState) -> Steps[QueryResult]:
+    """Convert a final query state to a result, yielding after each chunk."""
+
+    if state.success is False:
+        return QueryResult(False)
+
+    results: list[dict[str, object]] = []
+
+    for i, entry in enumerate(state.bindings, 1):
+        results.append({k: v.get_value() for k, v in entry.items()})
+
+        if i % _RESULT_CHUNK_SIZE == 0:
+            yield _RESULT_CHUNK_SIZE
+
+    yield len(results) % _RESULT_CHUNK_SIZE
+    return QueryResult(True, results)
@@ -0,0 +1,154 @@
+"""Vectorized Comparison Filtering.
+
+Comparison expressions normally bind and re-parse both operands for every binding. When
+vectorization is requested and both operands are numeric for every binding, the
+operands are gathered into NumPy arrays and the comparison becomes a single mask. The
+cross-type rules of the node classes are preserved: ints and floats compare by value
+for ordering, but are never equal to one another. Bindings with non-numeric operands
+fall back to the scalar path, which raises the usual TypeErrors.
+
+NumPy is an optional dependency. Install it with ``pip install repraxis[numpy]``.
+
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Union
+
+from repraxis.nodes.base_types import INode, NodeType
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+# Largest magnitude at which every integer is exactly representable as a float64.
+_MAX_EXACT_INT = 2**53
+
+_ORDERING_OPERATORS = {
+    "gt": lambda lh, rh: lh > rh,
+    "gte": lambda lh, rh: lh >= rh,
+    "lt": lambda lh, rh: lh < rh,
+    "lte": lambda lh, rh: lh <= rh,
+}
+
+
+def _numeric_value(node: INode) -> Optional[tuple[bool, Union[int, float]]]:
+    """Get (is_float, value) for a node the way the scalar path would see it.
+
+    The scalar path rebuilds each operand from its symbol, so floats are compared at
+    the precision of their symbol.
+    """
+
+    node_type = node.node_type
+
+    if node_type == NodeType.INT:
+        return False, node.get_value()  # type: ignore[return-value]
+
+    if node_type == NodeType.FLOAT:
+        return True, float(node.symbol.strip("[]"))
+
+    return None
+
+
+def _gather(
+    bindings: list[dict[str, INode]], operand: INode
+) -> Optional[tuple[object, object, bool]]:
+    """Collect the numeric values of an operand across all bindings.
+
+    Returns the float flags, the values and whether any value is a float. Constants
+    are returned as scalars. Returns None if any value is not numeric.
+    """
+
+    if operand.node_type != NodeType.VARIABLE:
+        numeric = _numeric_value(operand)
+
+        if numeric is None:
+            return None
+
+        return numeric[0], numeric[1], numeric[0]
+
+    variable = operand.symbol
+    flags: list[bool] = []
+    values: list[Union[int, float]] = []
+
+    for binding in bindings:
+        node = binding.get(variable)
+
+        if node is None:
+            return None
+
+        numeric = _numeric_value(node)
+
+        if numeric is None:
+            return None
+
+        flags.append(numeric[0])
+        values.append(numeric[1])
+
+    return flags, values, any(flags)
+
+
+def filter_comparison(
+    bindings: list[dict[str, INode]],
+    lh_operand: INode,
+    rh_operand: INode,
+    operator: str,
+) -> Optional[list[dict[str, INode]]]:
+    """Filter bindings with a vectorized comparison.
+
+    Returns None when the comparison cannot be vectorized and must be evaluated one
+    binding at a time.
+    """
+
+    if np is None:
+        raise ImportError(
+            "Vectorized comparisons require NumPy. "
+            "Install it with 'pip install repraxis[numpy]'."
+        )
+
+    if not bindings:
+        return []
+
+    lh = _gather(bindings, lh_operand)
+    rh = _gather(bindings, rh_operand)
+
+    if lh is None or rh is None:
+        return None
+
+    lh_flags, lh_values, lh_has_float = lh
+    rh_flags, rh_values, rh_has_float = rh
+
+    dtype = np.float64 if lh_has_float or rh_has_float else np.int64
+
+    try:
+        lh_array = np.asarray(lh_values, dtype=dtype)
+        rh_array = np.asarray(rh_values, dtype=dtype)
+    except OverflowError:
+        return None
+
+    if dtype is np.float64:
+        # Mixed comparisons go through float64, which is only exact for integers
+        # within 2**53. Anything larger is left to the scalar path.
+        for values, array in ((lh_values, lh_array), (rh_values, rh_array)):
+            if np.any(np.abs(array) > _MAX_EXACT_INT) and not _all_floats(values):
+                return None
+
+    if operator in ("eq", "neq"):
+        same_type = np.asarray(lh_flags) == np.asarray(rh_flags)
+        mask = same_type & (lh_array == rh_array)
+        if operator == "neq":
+            mask = ~mask
+    else:
+        mask = _ORDERING_OPERATORS[operator](lh_array, rh_array)
+
+    mask = np.broadcast_to(mask, (len(bindings),))
+
+    return [bindings[i] for i in np.flatnonzero(mask)]
+
+
+def _all_floats(values: object) -> bool:
+    if isinstance(values, list):
+        return all(isinstance(value, float) for value in values)
+
+    return isinstance(values, float)
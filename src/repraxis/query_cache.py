@@ -0,0 +1,177 @@
+"""Query Result Cache.
+
+The cache stores the results of queries run against a database so that repeating the
+same query between writes does not walk the tree again. Every entry remembers the
+patterns its query reads. Writes describe the path they touch, and only entries with a
+pattern that could match along that path are dropped.
+
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Hashable, Iterable, Optional, Sequence
+
+from repraxis.helpers import SentenceKey
+from repraxis.nodes.base_types import INode, NodeCardinality, NodeType
+
+if TYPE_CHECKING:
+    from repraxis.query.query_result import QueryResult
+
+# A pattern is the symbols of a sentence with None in place of variables.
+CachePattern = tuple[Optional[str], ...]
+
+
+class QueryCache:
+    """A least-recently-used cache of query results.
+
+    The cache may be shared by queries running on several threads.
+    """
+
+    __slots__ = ("_max_size", "_entries", "_by_head", "_hits", "_misses", "_lock")
+
+    _max_size: int
+    _entries: OrderedDict[Hashable, tuple[tuple[CachePattern, ...], QueryResult]]
+    _by_head: dict[Optional[str], set[Hashable]]
+    _hits: int
+    _misses: int
+    _lock: threading.Lock
+
+    def __init__(self, max_size: int = 256) -> None:
+        if max_size < 1:
+            raise ValueError("A query cache must hold at least one result.")
+
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._by_head = {}
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self) -> int:
+        """The maximum number of results held before evicting the oldest."""
+        return self._max_size
+
+    @property
+    def hits(self) -> int:
+        """The number of lookups that found a cached result."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """The number of lookups that did not find a cached result."""
+        return self._misses
+
+    def get(self, key: Hashable) -> Optional[QueryResult]:
+        """Get a cached result, or None if there is not one."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(
+        self, key: Hashable, patterns: Iterable[CachePattern], result: QueryResult
+    ) -> None:
+        """Cache a result along with the patterns its query reads."""
+
+        entry_patterns = tuple(patterns)
+
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+
+            self._entries[key] = (entry_patterns, result)
+
+            for pattern in entry_patterns:
+                self._by_head.setdefault(_head(pattern), set()).add(key)
+
+            while len(self._entries) > self._max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, path: Sequence[SentenceKey]) -> None:
+        """Drop results whose query could match along the given written path."""
+
+        if not self._entries or not path:
+            return
+
+        write = write_prefix(path)
+
+        with self._lock:
+            candidates = self._by_head.get(write[0], set()) | self._by_head.get(
+                None, set()
+            )
+
+            for key in candidates:
+                if any(_overlaps(pattern, write) for pattern in self._entries[key][0]):
+                    self._discard(key)
+
+    def clear(self) -> None:
+        """Drop all cached results. Hit and miss counts are kept."""
+
+        with self._lock:
+            self._entries.clear()
+            self._by_head.clear()
+
+    def _discard(self, key: Hashable) -> None:
+        patterns, _ = self._entries.pop(key)
+
+        for pattern in patterns:
+            head = _head(pattern)
+            keys = self._by_head.get(head)
+
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_head[head]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def cache_pattern(nodes: Sequence[INode]) -> CachePattern:
+    """Convert parsed sentence nodes to a cache pattern."""
+
+    return tuple(
+        None if node.node_type == NodeType.VARIABLE else node.symbol for node in nodes
+    )
+
+
+def write_prefix(path: Sequence[SentenceKey]) -> tuple[str, ...]:
+    """Get the symbols of the part of the tree a write may change.
+
+    Writing below a node with cardinality ONE can replace that node's existing child,
+    so the write may change anything beneath it.
+    """
+
+    symbols: list[str] = []
+
+    for symbol, cardinality, _ in path:
+        symbols.append(symbol)
+
+        if cardinality == NodeCardinality.ONE:
+            break
+
+    return tuple(symbols)
+
+
+def _head(pattern: CachePattern) -> Optional[str]:
+    return pattern[0] if pattern else None
+
+
+def _overlaps(pattern: CachePattern, write: tuple[str, ...]) -> bool:
+    """Check if a pattern and written path agree on their shared prefix."""
+
+    for pattern_symbol, write_symbol in zip(pattern, write):
+        if pattern_symbol is not None and pattern_symbol != write_symbol:
+            return False
+
+    return True
@@ -0,0 +1,458 @@
+"""Derived Rules.
+
+Rules derive new facts from existing ones. A rule has a head sentence and a body of
+query expressions. Whenever the body matches, the head (with its variables bound) is
+a fact::
+
+    Rule("?a.allies.?b", ["?a.friends.?c", "?b.friends.?c", "neq ?a ?b"])
+
+A RuleEngine materializes derived facts into a database and keeps them up to date as
+facts are inserted and deleted through the engine. Insertions are propagated with
+semi-naive evaluation. Each round only looks for derivations that use at least one
+fact added in the previous round. Each body sentence in turn is matched against just
+those new facts, and the rest of the body is joined against the whole database.
+
+Deletions use delete and rederive (DRed). Derived facts that depend on a deleted fact
+are first over-deleted, using the same semi-naive rounds. Any over-deleted fact that
+still has another derivation is then inserted again.
+
+Negated body sentences (not expressions) must only match facts that are never
+derived. A change to a fact that a negated sentence could match re-materializes every
+rule from scratch.
+
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+from repraxis.database import RePraxisDatabase
+from repraxis.helpers import bind_sentence, create_sentence, parse_sentence
+from repraxis.nodes.base_types import INode, NodeCardinality, NodeType
+from repraxis.paths import Path
+from repraxis.query.db_query import DBQuery, create_expression
+from repraxis.query.expressions import AssertExpression, NotExpression, OrExpression
+from repraxis.query.helpers import unify
+from repraxis.query.prepared_query import PreparedQuery
+from repraxis.query.query_state import QueryState
+
+
+class Rule:
+    """A head sentence that holds whenever the body query matches."""
+
+    __slots__ = ("head", "body", "_head_nodes", "_atoms", "_negations", "_rest")
+
+    head: str
+    body: DBQuery
+    _head_nodes: list[INode]
+    _atoms: list[AssertExpression]
+    _negations: list[list[INode]]
+    _rest: list[PreparedQuery]
+
+    def __init__(self, head: str, body: Union[DBQuery, Iterable[Union[str, Path]]]):
+        self.head = head
+        self.body = body if isinstance(body, DBQuery) else DBQuery(body)
+        self._head_nodes = parse_sentence(head)
+        self._atoms = []
+        self._negations = []
+        self._rest = []
+
+        if any(n.cardinality == NodeCardinality.ONE for n in self._head_nodes[:-1]):
+            raise ValueError(
+                f"Rule head '{head}' cannot contain '!'. Derived facts would "
+                "overwrite each other."
+            )
+
+        expressions = [create_expression(e) for e in self.body.expressions]
+        bound: set[str] = set()
+
+        for i, expression in enumerate(expressions):
+            if isinstance(expression, AssertExpression):
+                self._atoms.append(expression)
+                self._rest.append(PreparedQuery(expressions[:i] + expressions[i + 1 :]))
+                bound.update(
+                    n.symbol
+                    for n in expression.nodes
+                    if n.node_type == NodeType.VARIABLE
+                )
+            elif isinstance(expression, NotExpression):
+                self._negations.append(parse_sentence(expression.statement))
+            elif isinstance(expression, OrExpression):
+                raise ValueError(
+                    f"Rule body for '{head}' cannot contain 'or'. Write a separate "
+                    "rule with the same head for each branch."
+                )
+
+        for node in self._head_nodes:
+            if node.node_type == NodeType.VARIABLE and node.symbol not in bound:
+                raise ValueError(
+                    f"Variable {node.symbol} in rule head '{head}' is not bound by "
+                    "a sentence in the rule body."
+                )
+
+    def __repr__(self) -> str:
+        return f"Rule({self.head!r}, {list(self.body.expressions)!r})"
+
+    def derive(self, db: RePraxisDatabase) -> Iterator[str]:
+        """Yield the head of every match of the body in the database."""
+
+        state = self.body.prepare().evaluate(db, QueryState(True))
+
+        if state.success:
+            for binding in state.bindings:
+                yield bind_sentence(self.head, binding)
+
+    def derive_from(
+        self, delta: RePraxisDatabase, db: RePraxisDatabase
+    ) -> Iterator[str]:
+        """Yield the heads of matches that use at least one fact from delta.
+
+        Each body sentence in turn is matched against the facts in delta, and the rest
+        of the body is evaluated against db.
+        """
+
+        for atom, rest in zip(self._atoms, self._rest):
+            if any(n.node_type == NodeType.VARIABLE for n in atom.nodes):
+                # Like AssertExpression, check that the bound sentence asserts, so
+                # the cardinality of each token matches.
+                seeds = [
+                    binding
+                    for binding in unify(delta, atom.nodes)
+                    if delta.assert_statement(bind_sentence(atom.statement, binding))
+                ]
+            else:
+                seeds = [{}] if delta.assert_statement(atom.statement) else []
+
+            if not seeds:
+                continue
+
+            state = rest.evaluate(db, QueryState(True, seeds))
+
+            if state.success:
+                for binding in state.bindings:
+                    yield bind_sentence(self.head, binding)
+
+    def matches_head(self, sentence: str) -> Optional[dict[str, INode]]:
+        """Get the bindings that make the head equal to a sentence, if any."""
+
+        nodes = parse_sentence(sentence)
+
+        if len(nodes) != len(self._head_nodes):
+            return None
+
+        binding: dict[str, INode] = {}
+
+        for pattern, node in zip(self._head_nodes, nodes):
+            if pattern.node_type != NodeType.VARIABLE:
+                if pattern.symbol != node.symbol:
+                    return None
+            elif pattern.symbol in binding:
+                if not binding[pattern.symbol].equal_to(node):
+                    return None
+            else:
+                binding[pattern.symbol] = node
+
+        return binding
+
+    def holds(self, sentence: str, db: RePraxisDatabase) -> bool:
+        """Check if the rule derives the sentence from the database."""
+
+        binding = self.matches_head(sentence)
+
+        if binding is None:
+            return False
+
+        return self.body.prepare().evaluate(db, QueryState(True, [binding])).success
+
+
+class RuleEngine:
+    """Materializes the facts derived by rules and keeps them up to date.
+
+    Insert and delete facts through the engine so that derived facts follow. Changes
+    made to the database directly are not tracked.
+    """
+
+    __slots__ = ("_db", "_rules", "_derived", "_created")
+
+    _db: RePraxisDatabase
+    _rules: list[Rule]
+    _derived: set[str]
+    _created: set[str]
+
+    def __init__(
+        self, db: RePraxisDatabase, rules: Optional[Iterable[Rule]] = None
+    ) -> None:
+        self._db = db
+        self._rules = []
+        self._derived = set()
+        # Sentences of the nodes that were created for derived facts. Only these are
+        # removed when derived facts no longer hold.
+        self._created = set()
+
+        for rule in rules if rules else []:
+            self.add_rule(rule)
+
+    @property
+    def db(self) -> RePraxisDatabase:
+        """The database holding the facts."""
+        return self._db
+
+    @property
+    def rules(self) -> tuple[Rule, ...]:
+        """The rules used to derive facts."""
+        return tuple(self._rules)
+
+    @property
+    def derived(self) -> frozenset[str]:
+        """The facts that were added by rules."""
+        return frozenset(self._derived)
+
+    def add_rule(self, rule: Rule) -> None:
+        """Add a rule and materialize the facts it derives."""
+
+        for negation in rule._negations:  # pylint: disable=protected-access
+            for other in [*self._rules, rule]:
+                if _patterns_overlap(negation, other._head_nodes):
+                    raise ValueError(
+                        f"Rule {rule!r} negates facts that rule {other!r} derives."
+                    )
+
+        self._rules.append(rule)
+
+        added = self._add_derived(h for h in rule.derive(self._db))
+        self._propagate_inserts(added)
+
+    def insert(self, sentence: str) -> None:
+        """Insert a fact and derive the facts that follow from it."""
+
+        replaced = self._replaced_facts(sentence)
+
+        if replaced:
+            # Inserting a new value under a cardinality ONE node deletes the old one.
+            self._retract(replaced, lambda: self._db.insert(sentence))
+        else:
+            self._db.insert(sentence)
+
+        self._derived.discard(sentence)
+        self._created.difference_update(_prefixes(parse_sentence(sentence)))
+
+        if self._touches_negation([sentence, *replaced]):
+            self.rematerialize()
+            return
+
+        self._propagate_inserts([sentence])
+
+    def delete(self, sentence: str) -> bool:
+        """Delete a fact and any derived facts that no longer hold."""
+
+        if sentence == "" or not self._db.assert_statement(sentence):
+            return False
+
+        removed = list(self._db.iter_sentences(sentence))
+        self._retract(removed, lambda: self._db.delete(sentence))
+
+        for fact in removed:
+            self._derived.discard(fact)
+
+        if self._touches_negation(removed):
+            self.rematerialize()
+
+        return True
+
+    def rematerialize(self) -> None:
+        """Delete every derived fact and derive them again from scratch."""
+
+        for fact in list(self._derived):
+            self._delete_derived(fact)
+
+        added: list[str] = []
+
+        for rule in self._rules:
+            added.extend(self._add_derived(rule.derive(self._db)))
+
+        self._propagate_inserts(added)
+
+    def _propagate_inserts(self, delta: list[str]) -> None:
+        """Derive facts using newly added facts until nothing new is derived."""
+
+        while delta:
+            delta_db = _database_of(delta)
+            added: list[str] = []
+
+            for rule in self._rules:
+                added.extend(self._add_derived(rule.derive_from(delta_db, self._db)))
+
+            delta = added
+
+    def _add_derived(self, heads: Iterable[str]) -> list[str]:
+        """Insert the heads that are not already facts and return them."""
+
+        added: list[str] = []
+
+        for head in heads:
+            if not self._db.assert_statement(head):
+                nodes = parse_sentence(head)
+                depth = _existing_depth(self._db, nodes)
+                self._created.update(_prefixes(nodes)[depth:])
+                self._derived.add(head)
+                self._db.insert(head)
+                added.append(head)
+
+        return added
+
+    def _retract(self, removed: list[str], apply_delete: Callable[[], object]) -> None:
+        """Delete facts, then remove derived facts that no longer hold (DRed)."""
+
+        # Over-delete every derived fact with a derivation through a removed fact,
+        # while the removed facts are still in the database to join against.
+        over_deleted: list[str] = []
+        seen: set[str] = set()
+        delta = removed
+
+        while delta:
+            delta_db = _database_of(delta)
+            next_delta: list[str] = []
+
+            for rule in self._rules:
+                for head in rule.derive_from(delta_db, self._db):
+                    if head in self._derived and head not in seen:
+                        seen.add(head)
+                        next_delta.append(head)
+
+            over_deleted.extend(next_delta)
+            delta = next_delta
+
+        apply_delete()
+
+        for fact in over_deleted:
+            self._delete_derived(fact)
+
+        # Rederive the facts that still hold, and anything that follows from them.
+        rederived = self._add_derived(
+            fact
+            for fact in over_deleted
+            if any(rule.holds(fact, self._db) for rule in self._rules)
+        )
+        self._propagate_inserts(rederived)
+
+    def _delete_derived(self, fact: str) -> None:
+        """Delete a derived fact and the nodes that were created for it.
+
+        Nothing is deleted if other facts were added below the fact since then.
+        """
+
+        self._derived.discard(fact)
+        nodes = parse_sentence(fact)
+        prefixes = _prefixes(nodes)
+        path: list[INode] = []
+        node = self._db.root
+
+        for token in nodes:
+            child = node.find_child(token.symbol)
+
+            if child is None:
+                return
+
+            path.append(child)
+            node = child
+
+        if next(iter(node.children), None) is not None:
+            return
+
+        # Walk up while the parent was created for derived facts and holds nothing
+        # else.
+        top = len(path) - 1
+
+        while (
+            top > 0
+            and prefixes[top - 1] in self._created
+            and sum(1 for _ in path[top - 1].children) == 1
+        ):
+            top -= 1
+
+        self._created.difference_update(prefixes[top:])
+        self._db.delete(prefixes[top])
+
+    def _replaced_facts(self, sentence: str) -> list[str]:
+        """Get the facts that inserting a sentence would overwrite."""
+
+        node = self._db.root
+
+        for token in parse_sentence(sentence):
+            if node.cardinality == NodeCardinality.ONE:
+                for child in node.children:
+                    if child.symbol != token.symbol:
+                        return list(self._db.iter_sentences(child.get_path()))
+                    break
+
+            child = node.find_child(token.symbol)
+
+            if child is None:
+                return []
+
+            node = child
+
+        return []
+
+    def _touches_negation(self, facts: list[str]) -> bool:
+        """Check if any fact could match a negated rule body sentence."""
+
+        negations = [
+            n for rule in self._rules for n in rule._negations  # pylint: disable=W0212
+        ]
+
+        if not negations:
+            return False
+
+        return any(
+            _patterns_overlap(negation, parse_sentence(fact))
+            for fact in facts
+            for negation in negations
+        )
+
+
+def _database_of(facts: Iterable[str]) -> RePraxisDatabase:
+    db = RePraxisDatabase()
+
+    for fact in facts:
+        db.insert(fact)
+
+    return db
+
+
+def _existing_depth(db: RePraxisDatabase, nodes: list[INode]) -> int:
+    """Count how many leading nodes of a sentence are already in the database."""
+
+    node = db.root
+    depth = 0
+
+    for token in nodes:
+        child = node.find_child(token.symbol)
+
+        if child is None:
+            break
+
+        node = child
+        depth += 1
+
+    return depth
+
+
+def _prefixes(nodes: list[INode]) -> list[str]:
+    """Get the sentence of each prefix of a parsed sentence, shortest first."""
+
+    return [create_sentence(nodes[: i + 1]) for i in range(len(nodes))]
+
+
+def _patterns_overlap(pattern: list[INode], other: list[INode]) -> bool:
+    """Check if one pattern could match a prefix of the other, or vice versa."""
+
+    for a, b in zip(pattern, other):
+        if (
+            a.node_type != NodeType.VARIABLE
+            and b.node_type != NodeType.VARIABLE
+            and a.symbol != b.symbol
+        ):
+            return False
+
+    return True
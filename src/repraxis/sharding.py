@@ -0,0 +1,336 @@
+"""Sharded Database.
+
+A ShardedDatabase spreads facts across several worker processes, each owning a regular
+RePraxisDatabase. Facts are partitioned by their first token (the children of the root
+node), so every sentence lives on exactly one shard. Writes and point checks are routed
+to the owning shard. Queries are evaluated by the coordinator: each pattern is matched
+on the shards that could hold it (all of them when the pattern starts with a variable),
+and bindings from different patterns are joined on their shared variables in the
+coordinator, which allows joins across shards.
+
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import zlib
+from multiprocessing.connection import Connection
+from typing import Iterable, Optional, Sequence
+
+from repraxis.database import RePraxisDatabase
+from repraxis.helpers import bind_sentence, parse_sentence, sentence_has_variables
+from repraxis.nodes.base_types import INode, NodeType
+from repraxis.query.base_types import IQueryExpression
+from repraxis.query.db_query import DBQuery, create_expression
+from repraxis.query.expressions import AssertExpression, NotExpression, OrExpression
+from repraxis.query.helpers import join_bindings, unify, union_bindings
+from repraxis.query.query_result import QueryResult
+from repraxis.query.query_state import QueryState
+
+
+def _shard_worker(connection: Connection) -> None:
+    """Serve commands for a single shard until asked to close."""
+
+    db = RePraxisDatabase()
+
+    while True:
+        command, argument = connection.recv()
+
+        if command == "close":
+            connection.send(("ok", None))
+            connection.close()
+            return
+
+        try:
+            if command == "insert":
+                db.insert(argument)
+                response: object = None
+            elif command == "delete":
+                response = db.delete(argument)
+            elif command == "clear":
+                db.clear()
+                response = None
+            elif command == "match":
+                response = DBQuery([argument]).run(db).bindings
+            elif command == "check":
+                # Each check is either an assertion of a complete sentence or an
+                # existence test for a sentence that still contains variables.
+                response = [
+                    (
+                        bool(unify(db, sentence))
+                        if exists
+                        else db.assert_statement(sentence)
+                    )
+                    for exists, sentence in argument
+                ]
+            else:
+                raise ValueError(f"Unknown shard command: {command}")
+        except Exception as ex:  # pylint: disable=broad-except
+            connection.send(("error", ex))
+        else:
+            connection.send(("ok", response))
+
+
+class ShardedDatabase:
+    """A database partitioned by first token across worker processes.
+
+    Call close() (or use the database as a context manager) to stop the workers.
+    """
+
+    __slots__ = ("_connections", "_processes", "_local")
+
+    _connections: list[Connection]
+    _processes: list[multiprocessing.process.BaseProcess]
+    _local: RePraxisDatabase
+
+    def __init__(
+        self,
+        shard_count: int,
+        mp_context: Optional[multiprocessing.context.BaseContext] = None,
+    ) -> None:
+        if shard_count < 1:
+            raise ValueError("A sharded database needs at least one shard.")
+
+        context = mp_context if mp_context is not None else multiprocessing
+        self._connections = []
+        self._processes = []
+        # Used for expressions that never touch the database (comparisons).
+        self._local = RePraxisDatabase()
+
+        for _ in range(shard_count):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=_shard_worker, args=(child_end,))
+            process.daemon = True
+            process.start()
+            child_end.close()
+            self._connections.append(parent_end)
+            self._processes.append(process)
+
+    @property
+    def shard_count(self) -> int:
+        """The number of shards."""
+        return len(self._connections)
+
+    def shard_for(self, symbol: str) -> int:
+        """Get the index of the shard that owns facts starting with the symbol."""
+
+        return zlib.crc32(symbol.encode("utf-8")) % len(self._connections)
+
+    def _owners(self, first_token: INode) -> list[int]:
+        if first_token.node_type == NodeType.VARIABLE:
+            return list(range(len(self._connections)))
+
+        return [self.shard_for(first_token.symbol)]
+
+    def _request(self, shards: Sequence[int], command: str, argument: object) -> list:
+        """Send a command to several shards, then gather their responses in order."""
+
+        for shard in shards:
+            self._connections[shard].send((command, argument))
+
+        return self._gather(shards)
+
+    def _gather(self, shards: Iterable[int]) -> list:
+        responses: list = []
+        error: Optional[Exception] = None
+
+        for shard in shards:
+            status, response = self._connections[shard].recv()
+
+            if status == "error" and error is None:
+                error = response
+
+            responses.append(response)
+
+        if error is not None:
+            raise error
+
+        return responses
+
+    def insert(self, sentence: str) -> None:
+        """Insert a statement into the database."""
+
+        first_token = parse_sentence(sentence)[0]
+
+        if first_token.node_type == NodeType.VARIABLE:
+            raise TypeError(
+                f"Found variable {first_token.symbol} in sentence '({sentence})'. "
+                "Sentence cannot contain variables when inserting a value."
+            )
+
+        self._request([self.shard_for(first_token.symbol)], "insert", sentence)
+
+    def assert_statement(self, sentence: str) -> bool:
+        """Check if a given sentence exists within the database."""
+
+        first_token = parse_sentence(sentence)[0]
+
+        if first_token.node_type == NodeType.VARIABLE:
+            raise TypeError(
+                f"Found variable {first_token.symbol} in sentence '({sentence})'. "
+                "Sentence cannot contain variables when asserting a value."
+            )
+
+        shard = self.shard_for(first_token.symbol)
+        return self._request([shard], "check", [(False, sentence)])[0][0]
+
+    def delete(self, sentence: str) -> bool:
+        """Delete a sentence from the database and any data in its sub_tree."""
+
+        if sentence == "":
+            return False
+
+        shards = self._owners(parse_sentence(sentence)[0])
+        return any(self._request(shards, "delete", sentence))
+
+    def clear(self) -> None:
+        """Clear the contents of the database."""
+
+        self._request(range(len(self._connections)), "clear", None)
+
+    def __contains__(self, key: str) -> bool:
+        return self.assert_statement(key)
+
+    def run(
+        self, query: DBQuery, bindings: Optional[Iterable[dict[str, object]]] = None
+    ) -> QueryResult:
+        """Run a query across all shards."""
+
+        state = QueryState.from_object_bindings(True, bindings if bindings else [])
+
+        for expression_str in query.expressions:
+            state = self._evaluate(create_expression(expression_str), state)
+
+            if state.success is False:
+                break
+
+        return state.to_result()
+
+    def _evaluate(self, expression: IQueryExpression, state: QueryState) -> QueryState:
+        if isinstance(expression, AssertExpression):
+            return self._evaluate_assert(expression.statement, state)
+
+        if isinstance(expression, NotExpression):
+            return self._evaluate_not(expression.statement, state)
+
+        if isinstance(expression, OrExpression):
+            return self._evaluate_or(expression, state)
+
+        return expression.evaluate(self._local, state)
+
+    def _evaluate_assert(self, statement: str, state: QueryState) -> QueryState:
+        shards = self._owners(parse_sentence(statement)[0])
+
+        if not sentence_has_variables(statement):
+            if not self._request(shards, "check", [(False, statement)])[0][0]:
+                return QueryState(False)
+            return state
+
+        new_bindings: list[dict[str, INode]] = []
+
+        for shard_bindings in self._request(shards, "match", statement):
+            new_bindings.extend(
+                QueryState.from_object_bindings(True, shard_bindings).bindings
+            )
+
+        bindings = [
+            binding
+            for binding in join_bindings(state.bindings, new_bindings)
+            if len(binding) > 0
+        ]
+
+        if len(bindings) == 0:
+            return QueryState(False)
+
+        return QueryState(True, bindings)
+
+    def _evaluate_not(self, statement: str, state: QueryState) -> QueryState:
+        if not sentence_has_variables(statement):
+            if self._check([statement])[0]:
+                return QueryState(False)
+            return state
+
+        if len(state.bindings) == 0:
+            if self._check([statement])[0]:
+                return QueryState(False)
+            return state
+
+        sentences = [bind_sentence(statement, binding) for binding in state.bindings]
+        results = dict(zip(sentences, self._check(sentences)))
+
+        valid_bindings = [
+            binding
+            for binding, sentence in zip(state.bindings, sentences)
+            if not results[sentence]
+        ]
+
+        if not valid_bindings:
+            return QueryState(False)
+
+        return QueryState(True, valid_bindings)
+
+    def _evaluate_or(self, expression: OrExpression, state: QueryState) -> QueryState:
+        binding_lists: list[list[dict[str, INode]]] = []
+
+        for branch in expression.expressions:
+            branch_state = self._evaluate(branch, state)
+
+            if branch_state.success is False:
+                continue
+
+            if len(branch_state.bindings) == 0:
+                return branch_state
+
+            binding_lists.append(branch_state.bindings)
+
+        if not binding_lists:
+            return QueryState(False)
+
+        return QueryState(True, union_bindings(binding_lists))
+
+    def _check(self, sentences: list[str]) -> list[bool]:
+        """Check whether sentences (possibly containing variables) have matches."""
+
+        unique_sentences = list(dict.fromkeys(sentences))
+        requests: dict[int, list[tuple[bool, str]]] = {}
+
+        for sentence in unique_sentences:
+            exists = sentence_has_variables(sentence)
+            for shard in self._owners(parse_sentence(sentence)[0]):
+                requests.setdefault(shard, []).append((exists, sentence))
+
+        shards = list(requests)
+
+        for shard in shards:
+            self._connections[shard].send(("check", requests[shard]))
+
+        found: dict[str, bool] = dict.fromkeys(unique_sentences, False)
+
+        for shard, responses in zip(shards, self._gather(shards)):
+            for (_, sentence), response in zip(requests[shard], responses):
+                found[sentence] = found[sentence] or response
+
+        return [found[sentence] for sentence in sentences]
+
+    def close(self) -> None:
+        """Stop all shard worker processes."""
+
+        for connection in self._connections:
+            try:
+                connection.send(("close", None))
+                connection.recv()
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+            connection.close()
+
+        for process in self._processes:
+            process.join()
+
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self) -> ShardedDatabase:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
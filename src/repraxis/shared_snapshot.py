@@ -0,0 +1,812 @@
+"""Shared-Memory Snapshots.
+
+A SnapshotPublisher writes a read-only copy of a database tree into a block of shared
+memory. Worker processes open the same blocks with a SnapshotReader and query them in
+place. Nothing is copied or unpickled into the worker. Only the node views that a query
+touches are created.
+
+Snapshots are position independent. Nodes are stored in breadth-first order across
+parallel columns, and all references are indices, so a block reads the same wherever it
+is mapped. The children of each node are stored next to each other. A column of child
+indices sorted by symbol lets find_child() use a binary search.
+
+Publishers also own a small directory block holding the name and generation of the
+latest snapshot. Publishing writes a new block, points the directory at it and unlinks
+the old block. Readers check the directory in refresh() and swap to the newer snapshot.
+Queries that are already running keep the snapshot they started with.
+
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+import threading
+import time
+from array import array
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Iterator, Optional
+
+from repraxis.database import RePraxisDatabase
+from repraxis.nodes.base_types import INode, NodeCardinality, NodeType, node_digest
+from repraxis.nodes.nodes import FloatNode, IntNode, SymbolNode, VariableNode
+from repraxis.nodes.sorted_children import KeyRange
+
+_NODE_TYPES: tuple[NodeType, ...] = tuple(NodeType)
+_NODE_TYPE_CODES: dict[NodeType, int] = {t: i for i, t in enumerate(_NODE_TYPES)}
+_CARDINALITIES: tuple[NodeCardinality, ...] = tuple(NodeCardinality)
+_CARDINALITY_CODES: dict[NodeCardinality, int] = {
+    c: i for i, c in enumerate(_CARDINALITIES)
+}
+
+_INT_CODE = _NODE_TYPE_CODES[NodeType.INT]
+_FLOAT_CODE = _NODE_TYPE_CODES[NodeType.FLOAT]
+_ONE_CODE = _CARDINALITY_CODES[NodeCardinality.ONE]
+
+_FLOAT_BITS = struct.Struct("=d")
+_INT_BITS = struct.Struct("=q")
+
+_SNAPSHOT_MAGIC = b"RPXS"
+_DIRECTORY_MAGIC = b"RPXD"
+_FORMAT_VERSION = 1
+
+# Magic, format version, generation, node count, symbol count and symbol bytes.
+_HEADER = struct.Struct("=4sIQQQQ")
+
+# Magic, sequence number, generation, name length and name. The sequence number is odd
+# while the publisher is updating the directory.
+_DIRECTORY = struct.Struct("=4sQQH62s")
+_SEQUENCE = struct.Struct("=Q")
+_SEQUENCE_OFFSET = 4
+
+_COLUMN_NAMES = (
+    "numbers",
+    "symbol_offsets",
+    "parents",
+    "first_children",
+    "child_counts",
+    "sorted_children",
+    "symbol_ids",
+    "types",
+    "cardinalities",
+    "symbol_data",
+)
+
+_MAX_ATTACH_ATTEMPTS = 100
+
+# Names of the blocks created by this process, which stay registered with its resource
+# tracker when they are also attached.
+_CREATED: set[str] = set()
+_CREATED_LOCK = threading.Lock()
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _column_layout(
+    node_count: int, symbol_count: int, symbol_bytes: int
+) -> tuple[dict[str, tuple[str, int, int]], int]:
+    """Get the (typecode, offset, length) of each column and the block size."""
+
+    columns = (
+        ("numbers", "q", node_count),
+        ("symbol_offsets", "q", symbol_count + 1),
+        ("parents", "i", node_count),
+        ("first_children", "i", node_count),
+        ("child_counts", "i", node_count),
+        ("sorted_children", "i", node_count),
+        ("symbol_ids", "i", node_count),
+        ("types", "b", node_count),
+        ("cardinalities", "b", node_count),
+        ("symbol_data", "B", symbol_bytes),
+    )
+
+    layout: dict[str, tuple[str, int, int]] = {}
+    offset = _align(_HEADER.size)
+
+    for name, typecode, length in columns:
+        layout[name] = (typecode, offset, length)
+        offset = _align(offset + length * array(typecode).itemsize)
+
+    return layout, offset
+
+
+def _create(size: int, name: Optional[str] = None) -> SharedMemory:
+    """Create a block that this process owns."""
+
+    shm = SharedMemory(name, create=True, size=size)
+
+    with _CREATED_LOCK:
+        _CREATED.add(shm.name)
+
+    return shm
+
+
+def _unlink(shm: SharedMemory) -> None:
+    """Close and remove a block created by this process."""
+
+    shm.close()
+    shm.unlink()
+
+    with _CREATED_LOCK:
+        _CREATED.discard(shm.name)
+
+
+def _attach(name: str) -> SharedMemory:
+    """Open an existing block without handing its cleanup to this process."""
+
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name, track=False)  # type: ignore[call-arg]
+
+    # Before Python 3.13, opening a block registers it with the resource tracker,
+    # which unlinks it when this process exits even though the publisher owns it.
+    # Blocks this process created stay registered, so they are still removed if it
+    # exits without unlinking them.
+    shm = SharedMemory(name)
+
+    with _CREATED_LOCK:
+        if shm.name not in _CREATED:
+            # pylint: disable-next=protected-access
+            resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+
+    return shm
+
+
+class Snapshot:
+    """A read-only database tree stored in a block of shared memory."""
+
+    __slots__ = (
+        "_numbers",
+        "_symbol_offsets",
+        "_parents",
+        "_first_children",
+        "_child_counts",
+        "_sorted_children",
+        "_symbol_ids",
+        "_types",
+        "_cardinalities",
+        "_symbol_data",
+        "_symbols",
+        "_hashes",
+        "_generation",
+        "_node_count",
+        "_shm",
+    )
+
+    _numbers: memoryview
+    _symbol_offsets: memoryview
+    _parents: memoryview
+    _first_children: memoryview
+    _child_counts: memoryview
+    _sorted_children: memoryview
+    _symbol_ids: memoryview
+    _types: memoryview
+    _cardinalities: memoryview
+    _symbol_data: memoryview
+    _symbols: list[Optional[str]]
+    _hashes: Optional[list[bytes]]
+    _generation: int
+    _node_count: int
+    _shm: Optional[SharedMemory]
+
+    def __init__(self, shm: SharedMemory) -> None:
+        magic, version, generation, node_count, symbol_count, symbol_bytes = (
+            _HEADER.unpack_from(shm.buf, 0)
+        )
+
+        if magic != _SNAPSHOT_MAGIC or version != _FORMAT_VERSION:
+            raise ValueError(f"Shared memory block {shm.name!r} is not a snapshot.")
+
+        layout, _ = _column_layout(node_count, symbol_count, symbol_bytes)
+        buffer = shm.buf
+
+        for name, (typecode, offset, length) in layout.items():
+            column = buffer[offset : offset + length * array(typecode).itemsize]
+            setattr(self, f"_{name}", column.cast(typecode))
+
+        self._symbols = [None] * symbol_count
+        self._hashes = None
+        self._generation = generation
+        self._node_count = node_count
+        self._shm = shm
+
+    @property
+    def generation(self) -> int:
+        """The generation number the publisher gave this snapshot."""
+        return self._generation
+
+    @property
+    def root(self) -> SnapshotNode:
+        """The root node of the tree."""
+        return SnapshotNode(self, 0)
+
+    def __len__(self) -> int:
+        return self._node_count
+
+    def symbol(self, index: int) -> str:
+        """Get the symbol of the node stored at the given index."""
+
+        symbol_id = self._symbol_ids[index]
+        symbol = self._symbols[symbol_id]
+
+        if symbol is None:
+            start = self._symbol_offsets[symbol_id]
+            end = self._symbol_offsets[symbol_id + 1]
+            symbol = str(self._symbol_data[start:end], "utf-8")
+            self._symbols[symbol_id] = symbol
+
+        return symbol
+
+    def find_child(self, index: int, symbol: str) -> int:
+        """Get the index of the child with a symbol, or -1 if there is none."""
+
+        low = self._first_children[index]
+        high = low + self._child_counts[index]
+        sorted_children = self._sorted_children
+
+        while low < high:
+            middle = (low + high) // 2
+            child = sorted_children[middle]
+            child_symbol = self.symbol(child)
+
+            if child_symbol < symbol:
+                low = middle + 1
+            elif child_symbol > symbol:
+                high = middle
+            else:
+                return child
+
+        return -1
+
+    def content_hash(self, index: int) -> bytes:
+        """Get the content hash of the node stored at the given index.
+
+        The first call hashes every node, children before parents, and keeps the
+        results for the life of the snapshot.
+        """
+
+        if self._hashes is None:
+            hashes: list[bytes] = [b""] * self._node_count
+
+            # Nodes are stored in breadth-first order, so children follow parents.
+            for i in range(self._node_count - 1, -1, -1):
+                first = self._first_children[i]
+                node = SnapshotNode(self, i)
+                hashes[i] = node_digest(
+                    node.node_type,
+                    node.cardinality,
+                    node.get_value(),
+                    hashes[first : first + self._child_counts[i]],
+                )
+
+            self._hashes = hashes
+
+        return self._hashes[index]
+
+    def close(self) -> None:
+        """Release this process's view of the shared memory block."""
+
+        if self._shm is None:
+            return
+
+        for name in _COLUMN_NAMES:
+            getattr(self, f"_{name}").release()
+
+        self._shm.close()
+        self._shm = None
+
+    def __del__(self) -> None:
+        # The column views must be released before the block can be unmapped.
+        if getattr(self, "_shm", None) is not None:
+            self.close()
+
+    @staticmethod
+    def write(root: INode, generation: int) -> SharedMemory:
+        """Write the tree below root into a new shared memory block."""
+
+        types = array("b")
+        cardinalities = array("b")
+        numbers = array("q")
+        symbol_ids = array("i")
+        parents = array("i")
+        first_children = array("i")
+        child_counts = array("i")
+        sorted_children = array("i", [0])
+        symbol_lookup: dict[str, int] = {}
+        symbol_data = bytearray()
+        symbol_offsets = array("q", [0])
+
+        # Children are appended to the queue as each node is visited, so the children
+        # of every node end up next to each other in breadth-first order.
+        queue: list[INode] = [root]
+        parents.append(-1)
+        visited = 0
+
+        while visited < len(queue):
+            node = queue[visited]
+            node_type = node.node_type
+            symbol = node.symbol
+
+            types.append(_NODE_TYPE_CODES[node_type])
+            cardinalities.append(_CARDINALITY_CODES[node.cardinality])
+
+            if node_type == NodeType.INT:
+                numbers.append(node.get_value())  # type: ignore[arg-type]
+            elif node_type == NodeType.FLOAT:
+                numbers.append(_INT_BITS.unpack(_FLOAT_BITS.pack(node.get_value()))[0])
+            else:
+                numbers.append(0)
+
+            symbol_id = symbol_lookup.get(symbol)
+
+            if symbol_id is None:
+                symbol_id = len(symbol_lookup)
+                symbol_lookup[symbol] = symbol_id
+                symbol_data += symbol.encode("utf-8")
+                symbol_offsets.append(len(symbol_data))
+
+            symbol_ids.append(symbol_id)
+
+            first = len(queue)
+            children = list(node.children)
+            by_symbol = sorted(range(len(children)), key=lambda i: children[i].symbol)
+
+            first_children.append(first)
+            child_counts.append(len(children))
+            sorted_children.extend(first + i for i in by_symbol)
+            parents.extend([visited] * len(children))
+            queue.extend(children)
+            visited += 1
+
+        layout, size = _column_layout(len(queue), len(symbol_lookup), len(symbol_data))
+        shm = _create(size)
+
+        try:
+            _HEADER.pack_into(
+                shm.buf,
+                0,
+                _SNAPSHOT_MAGIC,
+                _FORMAT_VERSION,
+                generation,
+                len(queue),
+                len(symbol_lookup),
+                len(symbol_data),
+            )
+
+            columns = {
+                "numbers": numbers,
+                "symbol_offsets": symbol_offsets,
+                "parents": parents,
+                "first_children": first_children,
+                "child_counts": child_counts,
+                "sorted_children": sorted_children,
+                "symbol_ids": symbol_ids,
+                "types": types,
+                "cardinalities": cardinalities,
+                "symbol_data": array("B", symbol_data),
+            }
+
+            for name, (_, offset, _) in layout.items():
+                data = memoryview(columns[name]).cast("B")
+                shm.buf[offset : offset + len(data)] = data
+                data.release()
+
+        except BaseException:
+            _unlink(shm)
+            raise
+
+        return shm
+
+
+class SnapshotNode:
+    """A read-only view of a single node stored in a Snapshot."""
+
+    __slots__ = ("_snapshot", "_index")
+
+    _snapshot: Snapshot
+    _index: int
+
+    def __init__(self, snapshot: Snapshot, index: int) -> None:
+        self._snapshot = snapshot
+        self._index = index
+
+    @property
+    def snapshot(self) -> Snapshot:
+        """The snapshot holding this node."""
+        return self._snapshot
+
+    @property
+    def index(self) -> int:
+        """The position of the node in the snapshot."""
+        return self._index
+
+    @property
+    def node_type(self) -> NodeType:
+        """The type of data held in the node."""
+
+        return _NODE_TYPES[self._snapshot._types[self._index]]
+
+    @property
+    def symbol(self) -> str:
+        """Get the symbol associated with the node in the database."""
+
+        return self._snapshot.symbol(self._index)
+
+    @property
+    def cardinality(self) -> NodeCardinality:
+        """How many children is the node allowed to have at one time."""
+
+        return _CARDINALITIES[self._snapshot._cardinalities[self._index]]
+
+    @property
+    def children(self) -> Iterable[INode]:
+        """The children of the node."""
+
+        return self._iter_children()
+
+    def _iter_children(self) -> Iterator[INode]:
+        snapshot = self._snapshot
+        first = snapshot._first_children[self._index]
+
+        for index in range(first, first + snapshot._child_counts[self._index]):
+            yield SnapshotNode(snapshot, index)
+
+    @property
+    def parent(self) -> Optional[INode]:
+        """A reference to the node's parent node."""
+
+        parent = self._snapshot._parents[self._index]
+
+        if parent < 0:
+            return None
+
+        return SnapshotNode(self._snapshot, parent)
+
+    def set_parent(self, node: Optional[INode]) -> None:
+        """Set parent node reference"""
+
+        raise TypeError("Snapshot nodes are read-only.")
+
+    @property
+    def value(self) -> object:
+        """The value associated with this node."""
+
+        return self.get_value()
+
+    def get_value(self) -> object:
+        """Get the value associated with this node."""
+
+        snapshot = self._snapshot
+        type_code = snapshot._types[self._index]
+
+        if type_code == _INT_CODE:
+            return snapshot._numbers[self._index]
+
+        if type_code == _FLOAT_CODE:
+            return _FLOAT_BITS.unpack(_INT_BITS.pack(snapshot._numbers[self._index]))[0]
+
+        return snapshot.symbol(self._index)
+
+    def set_value(self, value: object) -> None:
+        """Change the node's value in place, keeping its type and children."""
+
+        raise TypeError("Snapshot nodes are read-only.")
+
+    def equal_to(self, other: INode) -> bool:
+        """Check if the node's value is equal to another."""
+
+        return self.copy().equal_to(other)
+
+    def not_equal_to(self, other: INode) -> bool:
+        """Check if the node's value is not equal to another."""
+
+        return self.copy().not_equal_to(other)
+
+    def less_than_equal_to(self, other: INode) -> bool:
+        """Check if the node's value is less than or equal to another."""
+
+        return self.copy().less_than_equal_to(other)
+
+    def greater_than_equal_to(self, other: INode) -> bool:
+        """Check if the node's value is greater than or equal to another."""
+
+        return self.copy().greater_than_equal_to(other)
+
+    def less_than(self, other: INode) -> bool:
+        """Check if the node's value is less than another."""
+
+        return self.copy().less_than(other)
+
+    def greater_than(self, other: INode) -> bool:
+        """Check if the node's value is greater than another."""
+
+        return self.copy().greater_than(other)
+
+    def add_child(self, node: INode) -> None:
+        """Add a child node to the node."""
+
+        raise TypeError("Snapshot nodes are read-only.")
+
+    def remove_child(self, symbol: str) -> bool:
+        """Removes a child node from the node."""
+
+        raise TypeError("Snapshot nodes are read-only.")
+
+    def get_child(self, symbol: str) -> INode:
+        """Get a child node."""
+
+        child = self._snapshot.find_child(self._index, symbol)
+
+        if child < 0:
+            raise KeyError(symbol)
+
+        return SnapshotNode(self._snapshot, child)
+
+    def find_child(self, symbol: str) -> Optional[INode]:
+        """Get a child node, or None if there is no child with the symbol."""
+
+        child = self._snapshot.find_child(self._index, symbol)
+
+        if child < 0:
+            return None
+
+        return SnapshotNode(self._snapshot, child)
+
+    def has_child(self, symbol: str) -> bool:
+        """Check if the node has a child."""
+
+        return self._snapshot.find_child(self._index, symbol) >= 0
+
+    def children_in_range(self, key_range: KeyRange) -> Iterable[INode]:
+        """Get the children whose values are inside a range."""
+
+        return [c for c in self.children if key_range.contains(c.get_value())]
+
+    def clear_children(self) -> None:
+        """Remove all children and from this node."""
+
+        raise TypeError("Snapshot nodes are read-only.")
+
+    def get_path(self) -> str:
+        """Get the database sentence this node represents."""
+
+        snapshot = self._snapshot
+        parts: list[str] = []
+        current = self._index
+
+        while True:
+            parts.append(snapshot.symbol(current))
+            parent = snapshot._parents[current]
+
+            if parent < 0 or snapshot._parents[parent] < 0:
+                break
+
+            parts.append("!" if snapshot._cardinalities[parent] == _ONE_CODE else ".")
+            current = parent
+
+        return "".join(reversed(parts))
+
+    def content_hash(self) -> bytes:
+        """Get a hash of the node's type, value, cardinality and sub_tree."""
+
+        return self._snapshot.content_hash(self._index)
+
+    def copy(self) -> INode:
+        """Create a copy of the node."""
+
+        node_type = self.node_type
+        cardinality = self.cardinality
+        value = self.get_value()
+
+        if node_type == NodeType.INT:
+            return IntNode(value, cardinality)  # type: ignore[arg-type]
+
+        if node_type == NodeType.FLOAT:
+            return FloatNode(value, cardinality)  # type: ignore[arg-type]
+
+        if node_type == NodeType.VARIABLE:
+            return VariableNode(value, cardinality)  # type: ignore[arg-type]
+
+        return SymbolNode(value, cardinality)  # type: ignore[arg-type]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SnapshotNode):
+            return NotImplemented
+
+        return self._snapshot is other._snapshot and self._index == other._index
+
+    def __hash__(self) -> int:
+        return hash((id(self._snapshot), self._index))
+
+    def __repr__(self) -> str:
+        return f"SnapshotNode({self.get_path()!r})"
+
+
+class SnapshotPublisher:
+    """Publishes snapshots of a database for SnapshotReaders to query.
+
+    Call close() (or use the publisher as a context manager) to remove the shared
+    memory blocks once readers are done with them.
+    """
+
+    __slots__ = ("_directory", "_block", "_generation")
+
+    _directory: SharedMemory
+    _block: Optional[SharedMemory]
+    _generation: int
+
+    def __init__(self, name: Optional[str] = None) -> None:
+        self._directory = _create(_DIRECTORY.size, name)
+        self._block = None
+        self._generation = 0
+        _DIRECTORY.pack_into(self._directory.buf, 0, _DIRECTORY_MAGIC, 0, 0, 0, b"")
+
+    @property
+    def name(self) -> str:
+        """The name readers use to find the published snapshots."""
+        return self._directory.name
+
+    @property
+    def generation(self) -> int:
+        """The generation of the latest snapshot, or 0 if none were published."""
+        return self._generation
+
+    def publish(self, db: RePraxisDatabase) -> int:
+        """Publish a snapshot of the database and return its generation."""
+
+        generation = self._generation + 1
+        block = Snapshot.write(db.root, generation)
+        block_name = block.name.encode("utf-8")
+
+        if len(block_name) > 62:
+            _unlink(block)
+            raise ValueError(f"Shared memory block name {block.name!r} is too long.")
+
+        buffer = self._directory.buf
+        sequence = _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)[0]
+
+        _SEQUENCE.pack_into(buffer, _SEQUENCE_OFFSET, sequence + 1)
+        _DIRECTORY.pack_into(
+            buffer,
+            0,
+            _DIRECTORY_MAGIC,
+            sequence + 1,
+            generation,
+            len(block_name),
+            block_name,
+        )
+        _SEQUENCE.pack_into(buffer, _SEQUENCE_OFFSET, sequence + 2)
+
+        # Readers that already opened the previous block keep their mapping.
+        if self._block is not None:
+            _unlink(self._block)
+
+        self._block = block
+        self._generation = generation
+
+        return generation
+
+    def close(self) -> None:
+        """Remove the directory and the latest snapshot."""
+
+        if self._block is not None:
+            _unlink(self._block)
+            self._block = None
+
+        _unlink(self._directory)
+
+    def __enter__(self) -> SnapshotPublisher:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+
+class SnapshotReader:
+    """Queries the latest snapshot published under a name.
+
+    Call refresh() to swap to a newer snapshot. Nodes returned by earlier queries keep
+    the snapshot they came from open until they are released.
+    """
+
+    __slots__ = ("_directory", "_snapshot", "_database")
+
+    _directory: Optional[SharedMemory]
+    _snapshot: Optional[Snapshot]
+    _database: Optional[RePraxisDatabase]
+
+    def __init__(self, name: str) -> None:
+        self._directory = _attach(name)
+        self._snapshot = None
+        self._database = None
+
+        if _DIRECTORY.unpack_from(self._directory.buf, 0)[0] != _DIRECTORY_MAGIC:
+            self._directory.close()
+            raise ValueError(
+                f"Shared memory block {name!r} is not a snapshot directory."
+            )
+
+        self.refresh()
+
+    @property
+    def generation(self) -> int:
+        """The generation of the snapshot being read, or 0 if there is none yet."""
+
+        if self._snapshot is None:
+            return 0
+
+        return self._snapshot.generation
+
+    @property
+    def database(self) -> RePraxisDatabase:
+        """A read-only database over the current snapshot."""
+
+        if self._database is None:
+            raise ValueError("No snapshot has been published yet.")
+
+        return self._database
+
+    def refresh(self) -> bool:
+        """Swap to the latest published snapshot. Returns True if it changed."""
+
+        for _ in range(_MAX_ATTACH_ATTEMPTS):
+            generation, name = self._read_directory()
+
+            if generation == self.generation:
+                return False
+
+            try:
+                block = _attach(name)
+            except FileNotFoundError:
+                # A newer snapshot replaced this one before it could be opened.
+                continue
+
+            try:
+                snapshot = Snapshot(block)
+            except ValueError:
+                block.close()
+                raise
+
+            self._snapshot = snapshot
+            self._database = RePraxisDatabase(snapshot.root)
+            return True
+
+        raise ValueError("Could not open the latest snapshot.")
+
+    def _read_directory(self) -> tuple[int, str]:
+        """Read a consistent (generation, name) pair from the directory."""
+
+        if self._directory is None:
+            raise ValueError("Snapshot reader is closed.")
+
+        buffer = self._directory.buf
+
+        while True:
+            before = _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)[0]
+
+            if before & 1:
+                time.sleep(0)
+                continue
+
+            _, _, generation, length, name = _DIRECTORY.unpack_from(buffer, 0)
+
+            if _SEQUENCE.unpack_from(buffer, _SEQUENCE_OFFSET)[0] == before:
+                return generation, str(name[:length], "utf-8")
+
+    def close(self) -> None:
+        """Stop reading snapshots."""
+
+        self._snapshot = None
+        self._database = None
+
+        if self._directory is not None:
+            self._directory.close()
+            self._directory = None
+
+    def __enter__(self) -> SnapshotReader:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
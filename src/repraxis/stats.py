@@ -0,0 +1,159 @@
+"""Tree Statistics.
+
+Summaries of the shape and size of a database tree, for monitoring how large a
+database grows and where its memory goes. Statistics are gathered with a single
+iterative walk of the tree.
+
+"""
+
+from __future__ import annotations
+
+import sys
+from typing import Optional
+
+from repraxis.nodes.array_trie import ArrayNode, ArrayTrie
+from repraxis.nodes.base_types import INode, Node, NodeCardinality, NodeType
+
+
+class TreeStats:
+    """Statistics about a database tree.
+
+    Counts do not include the root. The depth histogram, max fanout and mean fanout
+    lists are indexed by depth, where the root is at depth 0. Byte sizes are
+    estimates of the memory held by the nodes, their child containers and symbols.
+    subtree_bytes maps the symbol of each child of the root to the estimated size of
+    its subtree.
+    """
+
+    __slots__ = (
+        "node_count",
+        "leaf_count",
+        "nodes_by_type",
+        "nodes_by_cardinality",
+        "depth_histogram",
+        "max_fanout",
+        "mean_fanout",
+        "estimated_bytes",
+        "subtree_bytes",
+    )
+
+    node_count: int
+    leaf_count: int
+    nodes_by_type: dict[NodeType, int]
+    nodes_by_cardinality: dict[NodeCardinality, int]
+    depth_histogram: list[int]
+    max_fanout: list[int]
+    mean_fanout: list[float]
+    estimated_bytes: int
+    subtree_bytes: dict[str, int]
+
+    def __init__(self) -> None:
+        self.node_count = 0
+        self.leaf_count = 0
+        self.nodes_by_type = dict.fromkeys(NodeType, 0)
+        self.nodes_by_cardinality = dict.fromkeys(NodeCardinality, 0)
+        self.depth_histogram = []
+        self.max_fanout = []
+        self.mean_fanout = []
+        self.estimated_bytes = 0
+        self.subtree_bytes = {}
+
+    @property
+    def max_depth(self) -> int:
+        """The depth of the deepest node."""
+        return len(self.depth_histogram) - 1
+
+    def __repr__(self) -> str:
+        return (
+            f"TreeStats(node_count={self.node_count}, leaf_count={self.leaf_count}, "
+            f"max_depth={self.max_depth}, estimated_bytes={self.estimated_bytes})"
+        )
+
+
+def collect_stats(root: INode) -> TreeStats:
+    """Walk the tree below root and gather statistics."""
+
+    stats = TreeStats()
+    estimator = _SizeEstimator()
+    fanout_totals: list[int] = []
+
+    stats.estimated_bytes = estimator.size_of(root)
+
+    # Each entry is a node, its depth and the symbol of the subtree holding it.
+    stack: list[tuple[INode, int, str]] = [(root, 0, "")]
+
+    while stack:
+        node, depth, subtree = stack.pop()
+
+        if depth == len(stats.depth_histogram):
+            stats.depth_histogram.append(0)
+            stats.max_fanout.append(0)
+            fanout_totals.append(0)
+
+        stats.depth_histogram[depth] += 1
+
+        fanout = 0
+        for child in node.children:
+            fanout += 1
+            stack.append((child, depth + 1, subtree if depth > 0 else child.symbol))
+
+        fanout_totals[depth] += fanout
+        stats.max_fanout[depth] = max(stats.max_fanout[depth], fanout)
+
+        if depth == 0:
+            continue
+
+        stats.node_count += 1
+        stats.nodes_by_type[node.node_type] += 1
+        stats.nodes_by_cardinality[node.cardinality] += 1
+
+        if fanout == 0:
+            stats.leaf_count += 1
+
+        size = estimator.size_of(node)
+        stats.estimated_bytes += size
+        stats.subtree_bytes[subtree] = stats.subtree_bytes.get(subtree, 0) + size
+
+    stats.mean_fanout = [
+        total / count for total, count in zip(fanout_totals, stats.depth_histogram)
+    ]
+
+    return stats
+
+
+class _SizeEstimator:
+    """Estimates the memory held by individual nodes."""
+
+    __slots__ = ("_trie_node_bytes",)
+
+    _trie_node_bytes: dict[int, float]
+
+    def __init__(self) -> None:
+        self._trie_node_bytes = {}
+
+    def size_of(self, node: INode) -> int:
+        if isinstance(node, Node):
+            # pylint: disable=protected-access
+            size = sys.getsizeof(node) + sys.getsizeof(node._children)
+            size += sys.getsizeof(node.symbol)
+
+            if node.get_value() is not node.symbol:
+                size += sys.getsizeof(node.get_value())
+
+            return size
+
+        if isinstance(node, ArrayNode):
+            return round(self._array_node_bytes(node.trie))
+
+        return sys.getsizeof(node) + sys.getsizeof(node.symbol)
+
+    def _array_node_bytes(self, trie: ArrayTrie) -> float:
+        size: Optional[float] = self._trie_node_bytes.get(id(trie))
+
+        if size is None:
+            # Array-backed nodes share their storage, so each is charged an equal
+            # share of the trie.
+            size = trie.estimated_bytes / max(len(trie), 1)
+            self._trie_node_bytes[id(trie)] = size
+
+        return size
@@ -0,0 +1,277 @@
+"""Thread-Safe Database.
+
+A ThreadSafeDatabase can be written and queried from several threads at once. It is
+meant for free-threaded (no-GIL) CPython builds, where queries on different threads
+run in parallel, but it is also safe on regular builds.
+
+The children of the root node are spread across striped readers-writer locks (see
+repraxis.locking). Every public method locks the stripes of the top-level subtrees it
+touches: reads share them and writes hold them exclusively. Queries run through
+DBQuery.run(), DBQuery.run_columnar() and PreparedQuery lock the stripes of the
+sentences they read, or every stripe when a sentence starts with a variable. Writers
+are also serialized with each other, so a query on "astrid" never waits for writes to
+"jordan", but two writes never run at once.
+
+Not covered:
+
+- Query cursors and DBQuery.run_async(), which are suspended between steps and may
+  see writes made in the meantime, as with a regular database.
+- Nodes modified directly instead of through the database.
+- The other database passed to diff(), which is read without locking it.
+
+Change listeners are called after the stripes of the write are released, so they may
+query and write to the database.
+
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import (
+    Callable,
+    ContextManager,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from repraxis.changes import Change, ChangeListener, Subscription
+from repraxis.database import RePraxisDatabase
+from repraxis.helpers import parse_sentence, sentence_keys
+from repraxis.loading import DEFAULT_CHUNK_SIZE, LoadReport, LoadSource
+from repraxis.locking import StripedLock
+from repraxis.nodes.base_types import INode, Node, NodeType
+from repraxis.paths import Path, path_nodes
+from repraxis.query_cache import QueryCache
+from repraxis.stats import TreeStats
+
+_T = TypeVar("_T")
+
+# Locks every stripe.
+_ALL: tuple[Optional[str]] = (None,)
+
+
+class ThreadSafeDatabase(RePraxisDatabase):
+    """A database that may be shared by several threads.
+
+    Only databases of node objects are supported. stripe_count sets the number of
+    locks the top-level subtrees are spread across.
+    """
+
+    __slots__ = ("_locks",)
+
+    _locks: StripedLock
+
+    def __init__(
+        self,
+        root: Optional[INode] = None,
+        ordered_children: bool = False,
+        stripe_count: int = 16,
+    ) -> None:
+        if root is not None and not isinstance(root, Node):
+            raise ValueError(
+                "Thread-safe databases are only supported for node objects."
+            )
+
+        super().__init__(root, ordered_children)
+        self._locks = StripedLock(stripe_count)
+
+    @property
+    def locks(self) -> StripedLock:
+        """The locks guarding the top-level subtrees."""
+        return self._locks
+
+    def reading(self, heads: Iterable[Optional[str]] = ()) -> ContextManager[None]:
+        return self._locks.reading(heads)
+
+    def _write(
+        self, heads: Iterable[Optional[str]], method: Callable[..., _T], *args: object
+    ) -> _T:
+        """Call a RePraxisDatabase write method with the stripes of the heads held."""
+
+        locks = self._locks
+        locks.acquire_exclusive()
+
+        try:
+            changes = self._changes
+
+            # Changes are delivered when the batch ends, after the stripes are
+            # released, so listeners may use the database.
+            if changes is not None:
+                changes.begin_batch()
+
+            try:
+                stripes = locks.acquire(heads, write=True)
+
+                try:
+                    return method(self, *args)
+                finally:
+                    locks.release(stripes, write=True)
+            finally:
+                if changes is not None:
+                    changes.end_batch()
+        finally:
+            locks.release_exclusive()
+
+    def _read(
+        self, heads: Iterable[Optional[str]], method: Callable[..., _T], *args: object
+    ) -> _T:
+        """Call a RePraxisDatabase read method with the stripes of the heads shared."""
+
+        locks = self._locks
+        stripes = locks.acquire(heads, write=False)
+
+        try:
+            return method(self, *args)
+        finally:
+            locks.release(stripes, write=False)
+
+    def enable_query_cache(self, max_size: int = 256) -> QueryCache:
+        with self._locks.exclusive():
+            return super().enable_query_cache(max_size)
+
+    def disable_query_cache(self) -> None:
+        with self._locks.exclusive():
+            super().disable_query_cache()
+
+    def subscribe(
+        self, prefix: str, listener: ChangeListener, per_tick: bool = False
+    ) -> Subscription:
+        with self._locks.exclusive():
+            return super().subscribe(prefix, listener, per_tick)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Hold change notifications until the end of the with block.
+
+        Other threads cannot write to the database until the batch ends.
+        """
+
+        with self._locks.exclusive(), super().batch():
+            yield
+
+    def insert(self, sentence: str, ttl: Optional[int] = None) -> None:
+        nodes = parse_sentence(sentence)
+        self._write(
+            [_node_head(nodes)], RePraxisDatabase._insert_nodes, nodes, sentence, ttl
+        )
+
+    def insert_path(self, path: Path, ttl: Optional[int] = None) -> None:
+        nodes = path_nodes(path)
+        self._write(
+            [_node_head(nodes)], RePraxisDatabase._insert_nodes, nodes, None, ttl
+        )
+
+    def advance(self, ticks: int = 1) -> list[str]:
+        return self._write(_ALL, RePraxisDatabase.advance, ticks)
+
+    def load_sentences(
+        self, source: LoadSource, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> LoadReport:
+        return self._write(_ALL, RePraxisDatabase.load_sentences, source, chunk_size)
+
+    def assert_statement(self, sentence: str) -> bool:
+        return self._read(
+            [_sentence_head(sentence)], RePraxisDatabase.assert_statement, sentence
+        )
+
+    def assert_path(self, path: Path) -> bool:
+        return self._read([_path_head(path)], RePraxisDatabase.assert_path, path)
+
+    def get(self, path: str, default: object = None) -> object:
+        return self._read([_sentence_head(path)], RePraxisDatabase.get, path, default)
+
+    def set(self, path: str, value: object) -> None:
+        self._write([_sentence_head(path)], RePraxisDatabase.set, path, value)
+
+    def increment(self, path: str, delta: Union[int, float] = 1) -> Union[int, float]:
+        return self._write(
+            [_sentence_head(path)], RePraxisDatabase.increment, path, delta
+        )
+
+    def delete(self, sentence: str) -> bool:
+        if sentence == "":
+            return False
+
+        nodes = parse_sentence(sentence)
+        return self._write([_node_head(nodes)], RePraxisDatabase._delete_nodes, nodes)
+
+    def delete_path(self, path: Path) -> bool:
+        nodes = path_nodes(path)
+        return self._write([_node_head(nodes)], RePraxisDatabase._delete_nodes, nodes)
+
+    def iter_sentences(self, prefix: Union[str, Path, None] = None) -> Iterator[str]:
+        """Yield the sentence of every fact (leaf) in the database.
+
+        The sentences are collected while the database is locked, so unlike
+        RePraxisDatabase.iter_sentences(), they are not produced lazily.
+        """
+
+        with self._locks.reading([_prefix_head(prefix)]):
+            return iter(list(super().iter_sentences(prefix)))
+
+    def iter_paths(
+        self, prefix: Union[str, Path, None] = None
+    ) -> Iterator[tuple[object, ...]]:
+        """Yield the path of every fact (leaf) in the database.
+
+        The paths are collected while the database is locked, so unlike
+        RePraxisDatabase.iter_paths(), they are not produced lazily.
+        """
+
+        with self._locks.reading([_prefix_head(prefix)]):
+            return iter(list(super().iter_paths(prefix)))
+
+    def clear(self) -> None:
+        self._write(_ALL, RePraxisDatabase.clear)
+
+    def stats(self) -> TreeStats:
+        return self._read(_ALL, RePraxisDatabase.stats)
+
+    def content_hash(self) -> bytes:
+        return self._read(_ALL, RePraxisDatabase.content_hash)
+
+    def diff(self, other: RePraxisDatabase) -> Iterator[Change]:
+        """Yield the changes that turn this database into another one.
+
+        The changes are collected while this database is locked. The other database is
+        not locked.
+        """
+
+        with self._locks.reading(_ALL):
+            return iter(list(super().diff(other)))
+
+
+def _sentence_head(sentence: str) -> Optional[str]:
+    """Get the first symbol of a sentence, or None if it is a variable."""
+
+    if not sentence:
+        return None
+
+    symbol, _, node_type = sentence_keys(sentence)[0]
+    return None if node_type == NodeType.VARIABLE else symbol
+
+
+def _path_head(path: Path) -> Optional[str]:
+    """Get the first symbol of a path, or None if it is a variable."""
+
+    return _node_head(path_nodes(path))
+
+
+def _node_head(nodes: Sequence[INode]) -> Optional[str]:
+    """Get the symbol of the first node, or None if it is a variable."""
+
+    node = nodes[0]
+    return None if node.node_type == NodeType.VARIABLE else node.symbol
+
+
+def _prefix_head(prefix: Union[str, Path, None]) -> Optional[str]:
+    """Get the first symbol of an optional prefix, or None to read everything."""
+
+    if not prefix:
+        return None
+
+    return _sentence_head(prefix) if isinstance(prefix, str) else _path_head(prefix)
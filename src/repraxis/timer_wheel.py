@@ -0,0 +1,148 @@
+"""Hierarchical Timer Wheel.
+
+A timer wheel schedules items to expire at a future tick. Level 0 has one slot per tick
+for the next 64 ticks. Each higher level has slots spanning 64 times as many ticks as
+the level below. When the lower level wraps around, the entries in the next slot of the
+level above are moved down. Scheduling is O(1). Advancing is O(1) per tick plus O(1)
+per entry moved or expired, and every entry moves down at most once per level.
+
+"""
+
+from __future__ import annotations
+
+from typing import Generic, TypeVar
+
+_T = TypeVar("_T")
+
+_SLOT_BITS = 6
+_SLOTS = 1 << _SLOT_BITS
+_SLOT_MASK = _SLOTS - 1
+_LEVELS = 4
+_MAX_DELAY = 1 << (_SLOT_BITS * _LEVELS)
+
+
+class TimerWheel(Generic[_T]):
+    """Schedules items to expire at integer ticks."""
+
+    __slots__ = ("_now", "_levels", "_level_counts", "_overflow", "_count")
+
+    _now: int
+    _levels: list[list[list[tuple[int, _T]]]]
+    _level_counts: list[int]
+    _overflow: list[tuple[int, _T]]
+    _count: int
+
+    def __init__(self, now: int = 0) -> None:
+        self._now = now
+        self._levels = [[[] for _ in range(_SLOTS)] for _ in range(_LEVELS)]
+        self._level_counts = [0] * _LEVELS
+        self._overflow = []
+        self._count = 0
+
+    @property
+    def now(self) -> int:
+        """The current tick."""
+        return self._now
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, deadline: int, item: _T) -> None:
+        """Schedule an item to expire when the wheel advances to the deadline."""
+
+        if deadline <= self._now:
+            raise ValueError(
+                f"Deadline {deadline} must be after the current tick {self._now}."
+            )
+
+        self._place(deadline, item)
+        self._count += 1
+
+    def advance(self, ticks: int = 1) -> list[tuple[int, _T]]:
+        """Advance the wheel and return the (deadline, item) pairs that expired."""
+
+        if ticks < 0:
+            raise ValueError("Cannot advance a timer wheel backwards.")
+
+        expired: list[tuple[int, _T]] = []
+        target = self._now + ticks
+        level_zero = self._levels[0]
+
+        while self._now < target:
+            if self._count == 0:
+                # Nothing is scheduled, so skip straight to the target tick.
+                self._now = target
+                break
+
+            if self._level_counts[0] == 0:
+                # Nothing can expire before the next cascade of the lowest occupied
+                # level, so skip the empty ticks in between.
+                span = _SLOTS
+                for level in range(1, _LEVELS):
+                    if self._level_counts[level]:
+                        break
+                    span <<= _SLOT_BITS
+
+                boundary = (self._now // span + 1) * span
+
+                if boundary > target:
+                    self._now = target
+                    break
+
+                self._now = boundary - 1
+
+            self._now += 1
+            now = self._now
+
+            if now & _SLOT_MASK == 0:
+                self._cascade()
+
+            slot = level_zero[now & _SLOT_MASK]
+
+            if slot:
+                expired.extend(slot)
+                self._count -= len(slot)
+                self._level_counts[0] -= len(slot)
+                slot.clear()
+
+        return expired
+
+    def _cascade(self) -> None:
+        """Move entries down from higher levels as lower levels wrap around."""
+
+        now = self._now
+
+        for level in range(1, _LEVELS):
+            index = (now >> (_SLOT_BITS * level)) & _SLOT_MASK
+            slot = self._levels[level][index]
+            entries = list(slot)
+            self._level_counts[level] -= len(entries)
+            slot.clear()
+
+            for deadline, item in entries:
+                self._place(deadline, item)
+
+            if index != 0:
+                return
+
+        # Every level wrapped, so bring in any entries that are now within range.
+        entries = self._overflow
+        self._overflow = []
+
+        for deadline, item in entries:
+            self._place(deadline, item)
+
+    def _place(self, deadline: int, item: _T) -> None:
+        delay = deadline - self._now
+
+        if delay >= _MAX_DELAY:
+            self._overflow.append((deadline, item))
+            return
+
+        level = 0
+        while delay >= 1 << (_SLOT_BITS * (level + 1)):
+            level += 1
+
+        index = (deadline >> (_SLOT_BITS * level)) & _SLOT_MASK
+        self._levels[level][index].append((deadline, item))
+        self._level_counts[level] += 1
@@ -0,0 +1,172 @@
+# pylint: disable=C0116,W0621
+
+"""Test the array-backed storage engine.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.query import DBQuery
+
+
+@pytest.fixture
+def trie():
+    return ArrayTrie()
+
+
+@pytest.fixture
+def db(trie: ArrayTrie):
+    database = RePraxisDatabase(trie.root)
+
+    database.insert("astrid.relationships.jordan.reputation!30")
+    database.insert("astrid.relationships.jordan.tags.rivalry")
+    database.insert("astrid.relationships.britt.reputation!-10")
+    database.insert("astrid.relationships.britt.tags.ex_lover")
+    database.insert("astrid.relationships.lee.reputation!20")
+    database.insert("astrid.relationships.lee.tags.friend")
+    database.insert("britt.relationships.player.tags.spouse")
+    database.insert("player.relationships.jordan.reputation!-20")
+    database.insert("player.relationships.jordan.tags.enemy")
+    database.insert("player.relationships.britt.tags.spouse")
+
+    return database
+
+
+def test_insert_and_assert(db: RePraxisDatabase):
+    assert db.assert_statement("astrid.relationships.jordan.reputation!30")
+    assert not db.assert_statement("astrid.relationships.jordan.reputation.30")
+    assert not db.assert_statement("astrid.relationships.haley")
+    assert "player.relationships.britt.tags.spouse" in db
+
+
+def test_update_and_delete(db: RePraxisDatabase):
+    db.insert("astrid.relationships.jordan.reputation!-99")
+
+    assert db.assert_statement("astrid.relationships.jordan.reputation!-99")
+    assert not db.assert_statement("astrid.relationships.jordan.reputation!30")
+
+    assert db.delete("astrid.relationships.jordan")
+    assert not db.assert_statement("astrid.relationships.jordan.tags.rivalry")
+    assert db.assert_statement("astrid.relationships.lee.tags.friend")
+    assert db.delete("katara") is False
+
+
+def test_get_path(db: RePraxisDatabase):
+    node = (
+        db.root.get_child("astrid")
+        .get_child("relationships")
+        .get_child("lee")
+        .get_child("reputation")
+        .get_child("20")
+    )
+
+    assert node.get_path() == "astrid.relationships.lee.reputation!20"
+    assert node.get_value() == 20
+
+
+def test_queries_match_object_tree(db: RePraxisDatabase):
+    query = (
+        DBQuery()
+        .where("?speaker.relationships.?other.reputation!?r0")
+        .where("gt ?r0 10")
+        .where("player.relationships.?other.reputation!?r1")
+        .where("lt ?r1 0")
+        .where("neq ?speaker player")
+    )
+
+    result = query.run(db)
+
+    assert result.success is True
+    assert result.bindings == [
+        {"?speaker": "astrid", "?other": "jordan", "?r0": 30, "?r1": -20}
+    ]
+
+    query = (
+        DBQuery()
+        .where("astrid.relationships.?other")
+        .where("not astrid.relationships.?other.reputation!30")
+        .where("not ?other.relationships.?others_spouse.tags.spouse")
+    )
+
+    result = query.run(db)
+
+    assert result.success is True
+    assert result.bindings == [{"?other": "lee"}]
+
+
+def test_float_values():
+    db = RePraxisDatabase(ArrayTrie().root)
+
+    db.insert("katara.combat_skill![43.6]")
+
+    result = DBQuery(["katara.combat_skill!?x"]).run(db)
+
+    assert result.bindings[0]["?x"] == 43.6
+    assert db.get("katara.combat_skill") == 43.6
+
+
+def test_big_integers(trie: ArrayTrie):
+    db = RePraxisDatabase(trie.root)
+    big = 99999999999999999999
+
+    db.insert(f"a.b!{big}")
+    db.insert("a.c!5")
+
+    assert db.get("a.b") == big
+    assert DBQuery(["a.?k!?v"]).run(db).bindings == [
+        {"?k": "b", "?v": big},
+        {"?k": "c", "?v": 5},
+    ]
+
+    db.set("a.b", 7)
+    assert db.get("a.b") == 7
+
+    db.set("a.b", -big)
+    assert db.get("a.b") == -big
+
+    # Reused slots do not keep the big value.
+    db.delete("a.b")
+    db.insert("a.d!3")
+    assert db.get("a.d") == 3
+    assert len(trie) == 6
+
+
+def test_free_slots_are_reused(trie: ArrayTrie):
+    db = RePraxisDatabase(trie.root)
+
+    for i in range(100):
+        db.insert(f"counter!{i}")
+
+    assert len(trie) == 3
+    assert trie.capacity == 3
+
+    db.insert("a.b.c.d")
+    db.delete("a.b")
+    db.insert("e.f.g.h")
+
+    assert len(trie) == 8
+    assert trie.capacity == 8
+
+
+def test_clear(db: RePraxisDatabase, trie: ArrayTrie):
+    db.clear()
+
+    assert len(trie) == 1
+    assert not db.assert_statement("astrid")
+
+
+def test_set_and_increment(db: RePraxisDatabase, trie: ArrayTrie):
+    size = len(trie)
+
+    for _ in range(5):
+        db.increment("astrid.relationships.lee.reputation", 2)
+
+    assert db.get("astrid.relationships.lee.reputation") == 30
+    assert len(trie) == size
+
+    db.set("astrid.relationships.lee.reputation", 1.25)
+
+    assert db.get("astrid.relationships.lee.reputation") == 1.25
+    assert db.assert_statement("astrid.relationships.lee.reputation![1.25]")
@@ -0,0 +1,136 @@
+# pylint: disable=C0116,W0621
+
+"""Test change notifications.
+
+"""
+
+import io
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.changes import Change, ChangeType
+from repraxis.nodes.array_trie import ArrayTrie
+
+INSERT = ChangeType.INSERT
+DELETE = ChangeType.DELETE
+
+
+@pytest.fixture(params=["nodes", "array"])
+def db(request: pytest.FixtureRequest):
+    db = RePraxisDatabase(ArrayTrie().root if request.param == "array" else None)
+
+    db.insert("astrid.relationships.jordan.reputation!30")
+    db.insert("astrid.traits.kind")
+    db.insert("player.relationships.britt.tags.spouse")
+
+    return db
+
+
+def _changes(*changes: tuple[ChangeType, str]) -> list[Change]:
+    return [Change(change_type, sentence) for change_type, sentence in changes]
+
+
+def test_subscribe_by_prefix(db: RePraxisDatabase):
+    received: list[list[Change]] = []
+    db.subscribe("astrid.relationships", received.append)
+
+    db.insert("astrid.relationships.lee.reputation!10")
+    db.insert("astrid.relationships.lee.reputation!10")
+    db.insert("astrid.traits.brave")
+    db.insert("player.relationships.lee")
+    db.insert("astrid.relationships.jordan.reputation!-5")
+    db.delete("astrid.relationships.britt")
+    db.delete("astrid")
+
+    assert received == [
+        _changes((INSERT, "astrid.relationships.lee.reputation!10")),
+        _changes(
+            (DELETE, "astrid.relationships.jordan.reputation!30"),
+            (INSERT, "astrid.relationships.jordan.reputation!-5"),
+        ),
+        _changes((DELETE, "astrid")),
+    ]
+
+
+def test_set_increment_and_clear(db: RePraxisDatabase):
+    received: list[list[Change]] = []
+    db.subscribe("", received.append)
+
+    db.set("astrid.relationships.jordan.reputation", 30)
+    db.increment("astrid.relationships.jordan.reputation", 5)
+    db.set("astrid.stats.speed", 1.5)
+    db.clear()
+
+    assert received == [
+        _changes(
+            (DELETE, "astrid.relationships.jordan.reputation!30"),
+            (INSERT, "astrid.relationships.jordan.reputation!35"),
+        ),
+        _changes((INSERT, "astrid.stats.speed![1.5]")),
+        _changes((ChangeType.CLEAR, "")),
+    ]
+
+
+def test_batch(db: RePraxisDatabase):
+    astrid: list[list[Change]] = []
+    player: list[list[Change]] = []
+    db.subscribe("astrid", astrid.append)
+    db.subscribe("player", player.append)
+
+    with db.batch():
+        db.insert("astrid.traits.brave")
+
+        with db.batch():
+            db.insert("player.traits.shy")
+
+        db.delete("astrid.traits.kind")
+
+        assert not astrid and not player
+
+    assert astrid == [
+        _changes((INSERT, "astrid.traits.brave"), (DELETE, "astrid.traits.kind"))
+    ]
+    assert player == [_changes((INSERT, "player.traits.shy"))]
+
+    db.load_sentences(io.StringIO("astrid.mood!happy\nplayer.mood!sad\n"))
+
+    assert astrid[-1] == _changes((INSERT, "astrid.mood!happy"))
+    assert len(player) == 2
+
+
+def test_per_tick_and_expiry(db: RePraxisDatabase):
+    received: list[list[Change]] = []
+    db.subscribe("astrid", received.append, per_tick=True)
+
+    db.insert("astrid.traits.brave", ttl=2)
+    db.delete("astrid.traits.kind")
+
+    assert not received
+
+    db.advance()
+
+    assert received == [
+        _changes((INSERT, "astrid.traits.brave"), (DELETE, "astrid.traits.kind"))
+    ]
+
+    db.advance()
+
+    assert received[-1] == _changes((DELETE, "astrid.traits.brave"))
+
+
+def test_cancel(db: RePraxisDatabase):
+    received: list[list[Change]] = []
+    subscription = db.subscribe("astrid", received.append)
+
+    with db.batch():
+        db.insert("astrid.traits.brave")
+        subscription.cancel()
+
+    db.insert("astrid.traits.shy")
+
+    assert not subscription.active
+    assert not received
+
+    with pytest.raises(TypeError):
+        db.subscribe("?agent.traits", received.append)
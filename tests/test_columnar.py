@@ -0,0 +1,73 @@
+# pylint: disable=C0116,W0621
+
+"""Test columnar query results.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def db():
+    database = RePraxisDatabase()
+
+    database.insert("astrid.relationships.jordan.reputation!30")
+    database.insert("astrid.relationships.jordan.tags.rivalry")
+    database.insert("astrid.relationships.britt.reputation!-10")
+    database.insert("astrid.relationships.lee.reputation!20")
+    database.insert("player.relationships.jordan.reputation!-20")
+    database.insert("player.relationships.jordan.tags.enemy")
+    database.insert("katara.skills.combat![43.6]")
+    database.insert("katara.skills.healing!90")
+
+    return database
+
+
+def test_single_pattern_columns(db: RePraxisDatabase):
+    query = DBQuery().where("?a.relationships.?b.reputation!?r")
+    result = query.run_columnar(db)
+
+    assert result.success
+    assert len(result) == 4
+    assert result["?a"].dtype == object
+    assert result["?r"].dtype == np.int64
+    assert list(result["?a"]) == ["astrid", "astrid", "astrid", "player"]
+    assert list(result["?b"]) == ["jordan", "britt", "lee", "jordan"]
+    assert list(result["?r"]) == [30, -10, 20, -20]
+
+
+def test_columns_match_bindings(db: RePraxisDatabase):
+    query = DBQuery().where("?a.relationships.?b.reputation!?r")
+    bindings = query.run(db).bindings
+    columns = query.run_columnar(db).columns
+
+    for variable, column in columns.items():
+        assert list(column) == [binding[variable] for binding in bindings]
+
+
+def test_cardinality_is_validated(db: RePraxisDatabase):
+    result = DBQuery().where("?a.relationships.?b.reputation.?r").run_columnar(db)
+
+    assert not result.success
+    assert len(result) == 0
+
+
+def test_mixed_numbers_become_floats(db: RePraxisDatabase):
+    result = DBQuery().where("katara.skills.?skill!?value").run_columnar(db)
+
+    assert result["?value"].dtype == np.float64
+    assert list(result["?value"]) == [43.6, 90.0]
+
+
+def test_multi_expression_query(db: RePraxisDatabase):
+    query = DBQuery().where("?a.relationships.?b.reputation!?r").where("gt ?r 0")
+    result = query.run_columnar(db)
+
+    assert result.success
+    assert list(result["?b"]) == ["jordan", "lee"]
+    assert result["?r"].dtype == np.int64
@@ -0,0 +1,164 @@
+# pylint: disable=C0116,W0621
+
+"""Test compiling queries into generated Python functions.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.paths import Var
+from repraxis.query import CompiledQuery, DBQuery
+from repraxis.thread_safe import ThreadSafeDatabase
+
+
+def _fill(database: RePraxisDatabase) -> RePraxisDatabase:
+    for i in range(6):
+        for j in range(6):
+            if i != j and (i + j) % 3 != 0:
+                database.insert(
+                    f"agent_{i}.relationships.agent_{j}.reputation!{(i * 7 + j) % 11}"
+                )
+        database.insert(f"agent_{i}.traits.{['kind', 'rude'][i % 2]}")
+
+    database.insert("agent_2.relationships.agent_3.tags.rival")
+    database.insert("agent_5.stats.speed![2.5]")
+    database.insert("agent_5.stats.weight![1.234]")
+    database.insert("agent_4.stats!speed![1.5]")
+
+    return database
+
+
+@pytest.fixture(params=[False, True], ids=["dict", "ordered"])
+def db(request):
+    return _fill(RePraxisDatabase(ordered_children=request.param))
+
+
+QUERIES = [
+    DBQuery(["?agent.relationships.?other.reputation!?r", "gt ?r 5"]),
+    DBQuery(
+        [
+            "?agent.relationships.?other.reputation!?r",
+            "?other.relationships.?agent.reputation!?r2",
+            "lt ?r ?r2",
+            "not ?other.traits.rude",
+        ]
+    ),
+    DBQuery(["?agent.traits.kind", "not ?agent.relationships.?x.tags.rival"]),
+    DBQuery(["?agent.relationships.?other", "eq ?other agent_3"]),
+    DBQuery(["agent_5.stats.speed!?speed", "gte ?speed ?min"]),
+    DBQuery(["agent_5.stats.weight!?w", "gt ?w [1.233]"]),
+    DBQuery(["?agent.stats.?stat!?value"]),
+    DBQuery(["agent_0.traits.rude"]),
+    DBQuery(["not agent_0.traits.rude", "not ?a.traits.mean"]),
+    DBQuery(["not ?a.traits.kind", "?a.traits.rude"]),
+    DBQuery(["lt 1 2", "?a.traits.kind"]),
+    DBQuery(["?a.traits.kind", "agent_9.traits.kind"]),
+    DBQuery(["?agent.relationships.?other.reputation!?r", "neq ?r 3"]),
+    DBQuery().where(("agent_2", "relationships", Var("other"), "tags", Var("tag"))),
+    DBQuery([]),
+]
+
+BINDING_SETS = [
+    [{"?agent": "agent_0"}],
+    [{"?agent": "agent_2", "?min": 1}, {"?agent": "agent_4", "?min": 3.5}],
+    [{"?agent": "agent_9"}],
+    [{"?other": "agent_1", "?min": 2}],
+    [{"?min": 2}],
+    [{}],
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_matches_interpreter(db: RePraxisDatabase, query: DBQuery):
+    compiled = query.compile()
+
+    for bindings in [None, *BINDING_SETS]:
+        if "?min" in " ".join(str(e) for e in query.expressions) and not (
+            bindings and "?min" in bindings[0]
+        ):
+            # Comparing an unbound variable raises in both.
+            continue
+
+        expected = query.run(db, bindings)
+        result = compiled.run(db, bindings)
+
+        assert result.success == expected.success
+        assert result.bindings == expected.bindings
+
+
+def test_generates_code(db: RePraxisDatabase):
+    compiled = DBQuery(
+        ["?agent.relationships.?other.reputation!?r", "gt ?r 5"]
+    ).compile()
+    source = compiled.source()
+
+    assert source is not None
+    assert "for " in source and "_children.get('relationships')" in source
+    assert compiled.source(["?agent"]) != source
+
+
+def test_cached_per_query():
+    query = DBQuery(["?a.traits.kind", "gt ?r 5"])
+
+    assert query.compile() is query.compile()
+    assert DBQuery(["?a.traits.kind", "gt  ?r 5"]).compile() is query.compile()
+    assert DBQuery(["?a.traits.kind"]).compile() is not query.compile()
+    assert isinstance(query.compile(), CompiledQuery)
+
+
+def test_fallbacks(db: RePraxisDatabase):
+    queries = [
+        DBQuery(["?a.traits.kind or ?a.traits.rude"]),
+        DBQuery(["?a.relationships.?a.reputation!?r"]),
+        DBQuery(["?a.traits.kind", "gt ?r 5"]),
+    ]
+
+    for query in queries:
+        assert query.compile().source() is None
+
+    for query in queries[:2]:
+        assert query.compile().run(db).bindings == query.run(db).bindings
+
+    # Input bindings with different variables also use the interpreter.
+    query = DBQuery(["?agent.relationships.?other.reputation!?r"])
+    bindings = [{"?agent": "agent_0"}, {"?other": "agent_0"}]
+    assert (
+        query.compile().run(db, bindings).bindings == query.run(db, bindings).bindings
+    )
+
+
+def test_other_backends():
+    db = _fill(RePraxisDatabase(ArrayTrie().root))
+
+    for query in QUERIES[:4]:
+        assert query.compile().run(db).bindings == query.run(db).bindings
+
+
+def test_joins_use_values():
+    db = RePraxisDatabase()
+    db.insert("a.score![nan]")
+    db.insert("b.score![nan]")
+    db.insert("a.count!5")
+    db.insert("b.count.5")
+
+    for query in [
+        DBQuery(["a.score!?s", "b.score!?s"]),
+        DBQuery(["?x.count!?n"]),
+        DBQuery(["a.count!?n", "?x.count!?n"]),
+    ]:
+        result = query.compile().run(db)
+        expected = query.run(db)
+
+        assert result.success == expected.success
+        assert result.bindings == expected.bindings
+
+    assert DBQuery(["?x.count!?n"]).compile().run(db).bindings == [{"?x": "a", "?n": 5}]
+
+
+def test_thread_safe_database():
+    db = _fill(ThreadSafeDatabase())
+    query = DBQuery(["?agent.relationships.?other.reputation!?r", "gt ?r 5"])
+
+    assert query.compile().run(db).bindings == query.run(db).bindings
@@ -0,0 +1,130 @@
+# pylint: disable=C0116,W0621
+
+"""Test content hashes and database diffs.
+
+"""
+
+import random
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.changes import ChangeType
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.shared_snapshot import SnapshotPublisher, SnapshotReader
+
+SENTENCES = [
+    "astrid.relationships.jordan.reputation!30",
+    "astrid.relationships.jordan.tags.rivalry",
+    "astrid.relationships.britt.reputation!-10",
+    "astrid.stats.speed![1.5]",
+    "player.relationships.britt.tags.spouse",
+]
+
+
+def _database(backend: str, sentences: list[str]) -> RePraxisDatabase:
+    db = RePraxisDatabase(ArrayTrie().root if backend == "array" else None)
+
+    for sentence in sentences:
+        db.insert(sentence)
+
+    return db
+
+
+def _diff(old: RePraxisDatabase, new: RePraxisDatabase) -> tuple[set, set]:
+    changes = list(old.diff(new))
+    inserted = {c.sentence for c in changes if c.change_type == ChangeType.INSERT}
+    deleted = {c.sentence for c in changes if c.change_type == ChangeType.DELETE}
+
+    assert len(inserted) + len(deleted) == len(changes)
+
+    return inserted, deleted
+
+
+@pytest.fixture(params=["nodes", "array"])
+def backend(request: pytest.FixtureRequest) -> str:
+    return request.param
+
+
+def test_equal_content_hashes(backend: str):
+    db = _database(backend, SENTENCES)
+
+    assert db.content_hash() == _database("nodes", SENTENCES[::-1]).content_hash()
+    assert db.content_hash() == _database("array", SENTENCES).content_hash()
+    assert db.content_hash() != RePraxisDatabase().content_hash()
+
+    with SnapshotPublisher() as publisher:
+        publisher.publish(db)
+
+        with SnapshotReader(publisher.name) as reader:
+            assert reader.database.content_hash() == db.content_hash()
+
+
+def test_hashes_follow_writes(backend: str):
+    db = _database(backend, SENTENCES)
+    original = db.content_hash()
+
+    db.insert("astrid.relationships.jordan.reputation!31")
+    assert db.content_hash() != original
+
+    db.set("astrid.relationships.jordan.reputation", 30)
+    assert db.content_hash() == original
+
+    db.increment("astrid.stats.speed", 0.25)
+    db.delete("player")
+    expected = _database("nodes", [*SENTENCES[:3], "astrid.stats.speed![1.75]"])
+
+    assert db.content_hash() == expected.content_hash()
+
+    db.clear()
+    assert db.content_hash() == RePraxisDatabase().content_hash()
+
+
+def test_diff(backend: str):
+    old = _database(backend, SENTENCES)
+    new = _database(backend, SENTENCES)
+
+    assert not list(old.diff(new))
+
+    new.insert("astrid.relationships.jordan.reputation!25")
+    new.insert("astrid.stats.speed![1.5].max![3.5]")
+    new.insert("lee.traits.kind")
+    new.delete("astrid.relationships.britt")
+    new.delete("player.relationships.britt.tags")
+
+    assert _diff(old, new) == (
+        {
+            "astrid.relationships.jordan.reputation!25",
+            "astrid.stats.speed![1.5].max![3.5]",
+            "lee.traits.kind",
+            "player.relationships.britt",
+        },
+        {
+            "astrid.relationships.jordan.reputation!30",
+            "astrid.relationships.britt.reputation!-10",
+            "astrid.stats.speed![1.5]",
+            "player.relationships.britt.tags.spouse",
+        },
+    )
+
+
+def test_diff_matches_sentence_sets(backend: str):
+    rng = random.Random(3)
+    old = RePraxisDatabase(ArrayTrie().root if backend == "array" else None)
+    new = RePraxisDatabase()
+
+    for _ in range(300):
+        sentence = ".".join(f"s{rng.randrange(4)}" for _ in range(rng.randrange(1, 5)))
+        value = f"{sentence}.value!{rng.randrange(3)}"
+
+        for db in (old, new):
+            if rng.random() < 0.6:
+                db.insert(value)
+            elif rng.random() < 0.5:
+                db.delete(sentence)
+
+        old_facts = set(old.iter_sentences())
+        new_facts = set(new.iter_sentences())
+
+        assert _diff(old, new) == (new_facts - old_facts, old_facts - new_facts)
+        assert (old.content_hash() == new.content_hash()) == (old_facts == new_facts)
@@ -0,0 +1,81 @@
+# pylint: disable=C0116,W0621
+
+"""Test bulk loading sentences.
+
+"""
+
+import io
+import pathlib
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+
+WORLD = """\
+# Relationships
+astrid.relationships.jordan.reputation!30
+astrid.relationships.jordan.tags.rivalry
+astrid.relationships.britt.reputation!-10
+
+astrid.relationships.britt.reputation!5
+astrid.relationships.?other.tags.friend
+astrid.relationships.britt!oops
+player.stats.speed![1.5
+player.stats.speed![1.25]
+   player.relationships.britt.tags.spouse
+"""
+
+
+def test_load_from_stream():
+    db = RePraxisDatabase()
+    report = db.load_sentences(io.StringIO(WORLD))
+
+    assert report.lines == 11
+    assert report.skipped == 2
+    assert report.loaded == 6
+    assert [error.line_number for error in report.errors] == [7, 8, 9]
+    assert report.bytes_read == len(WORLD.encode())
+    assert not report.success
+
+    expected = RePraxisDatabase()
+    expected.insert("astrid.relationships.jordan.reputation!30")
+    expected.insert("astrid.relationships.jordan.tags.rivalry")
+    expected.insert("astrid.relationships.britt.reputation!5")
+    expected.insert("player.stats.speed![1.25]")
+    expected.insert("player.relationships.britt.tags.spouse")
+
+    assert sorted(db.iter_sentences()) == sorted(expected.iter_sentences())
+
+
+def test_load_in_small_chunks(tmp_path: pathlib.Path):
+    sentences = [
+        f"agent_{i}.relationships.agent_{j}.met" for i in range(5) for j in range(5)
+    ]
+    path = tmp_path / "world.txt"
+    path.write_text("\n".join(sentences), encoding="utf-8")
+
+    db = RePraxisDatabase()
+    report = db.load_sentences(path, chunk_size=7)
+
+    assert report.success
+    assert report.loaded == 25
+    assert report.bytes_read == path.stat().st_size
+    assert report.megabytes_per_second > 0
+    assert sorted(db.iter_sentences()) == sorted(sentences)
+
+    db = RePraxisDatabase()
+    db.load_sentences(io.BytesIO(path.read_bytes()), chunk_size=3)
+
+    assert sorted(db.iter_sentences()) == sorted(sentences)
+
+
+def test_load_invalidates_query_cache():
+    db = RePraxisDatabase()
+    cache = db.enable_query_cache()
+    db.insert("astrid.traits.kind")
+
+    query = DBQuery(["astrid.traits.?trait"])
+    query.run(db)
+    db.load_sentences(io.StringIO("astrid.traits.brave\n"))
+
+    assert len(query.run(db).bindings) == 2
+    assert cache.hits == 0
@@ -0,0 +1,95 @@
+# pylint: disable=C0116,W0621
+
+"""Test unifying sentences in parallel over a database snapshot.
+
+"""
+
+import pytest
+
+from repraxis import DBQuery, RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.parallel import ParallelUnifier
+from repraxis.query.expressions import AssertExpression
+from repraxis.query.query_state import QueryState
+
+SENTENCES = [
+    f"agent_{i}.relationships.agent_{(i * 7) % 13}.reputation!{(i * 37) % 100 - 50}"
+    for i in range(40)
+] + [
+    "agent_3.relationships.agent_3.tags.self",
+    "agent_5.stats.speed![1.5]",
+    "agent_6.stats!speed![2.5]",
+    "player.relationships.agent_1.tags.spouse",
+]
+
+
+@pytest.fixture(params=["nodes", "array"])
+def db(request: pytest.FixtureRequest):
+    db = RePraxisDatabase(ArrayTrie().root if request.param == "array" else None)
+
+    for sentence in SENTENCES:
+        db.insert(sentence)
+
+    return db
+
+
+def _values(state: QueryState) -> list[dict[str, object]]:
+    return state.to_result().bindings
+
+
+@pytest.mark.parametrize("depth", [1, 2, 4])
+def test_matches_assert_expression(db: RePraxisDatabase, depth: int):
+    with ParallelUnifier(db, workers=2, depth=depth) as unifier:
+        for sentence in [
+            "?a.relationships.?b.reputation!?r",
+            "?a.relationships.?a.tags.?t",
+            "?a.?kind",
+            "agent_5.stats.speed!?s",
+            "?a.stats.speed!?s",
+            "?a.stats.speed![1.5]",
+            "?a.missing.?b",
+        ]:
+            expression = AssertExpression(sentence)
+            state = unifier.evaluate(expression)
+            expected = expression.evaluate(db, QueryState(True))
+
+            assert state.success == expected.success
+            assert _values(state) == _values(expected)
+
+
+def test_runs_queries(db: RePraxisDatabase):
+    queries = [
+        DBQuery(["?a.relationships.?b.reputation!?r", "gt ?r 10", "neq ?a ?b"]),
+        DBQuery(["?a.stats.?s!?v", "?a.relationships.?b"]),
+        DBQuery(["?a.relationships.?b", "?b.relationships.?a"]),
+        DBQuery(["?a.missing.?b", "lt 1 2"]),
+        DBQuery(["lt 1 2", "?a.stats.speed!?s"]),
+    ]
+
+    with ParallelUnifier(db, workers=2) as unifier:
+        for query in queries:
+            result = query.run(db, unifier=unifier)
+            expected = query.run(db)
+
+            assert result.success == expected.success
+            assert result.bindings == expected.bindings
+
+
+def test_publish(db: RePraxisDatabase):
+    query = DBQuery(["?a.relationships.player.reputation!?r"])
+
+    with ParallelUnifier(db, workers=2) as unifier:
+        db.insert("agent_9.relationships.player.reputation!99")
+
+        assert not query.run(db, unifier=unifier).success
+
+        assert unifier.publish(db) == 2
+        assert query.run(db, unifier=unifier).bindings == [{"?a": "agent_9", "?r": 99}]
+
+
+def test_invalid_options(db: RePraxisDatabase):
+    with pytest.raises(ValueError):
+        ParallelUnifier(db, workers=0)
+
+    with pytest.raises(ValueError):
+        ParallelUnifier(db, depth=0)
@@ -0,0 +1,76 @@
+# pylint: disable=C0116,W0621
+
+"""Test the structured path API.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.paths import ONE, Var, path_nodes
+from repraxis.query import DBQuery
+
+
+@pytest.fixture(params=["nodes", "array"])
+def db(request: pytest.FixtureRequest):
+    database = (
+        RePraxisDatabase(ArrayTrie().root)
+        if request.param == "array"
+        else RePraxisDatabase()
+    )
+
+    database.insert_path(("astrid", "relationships", "jordan", "reputation", ONE, 30))
+    database.insert_path(("astrid", "relationships", "britt", "reputation", ONE, -10))
+    database.insert_path(("astrid", "relationships", "lee", "reputation", ONE, 20))
+    database.insert_path(("astrid", "mood", ONE, 0.4567))
+
+    return database
+
+
+def test_paths_match_sentences(db: RePraxisDatabase):
+    assert db.assert_statement("astrid.relationships.jordan.reputation!30")
+    assert db.assert_path(("astrid", "relationships", "jordan", "reputation", ONE, 30))
+    assert not db.assert_path(("astrid", "relationships", "jordan", "reputation", 30))
+    assert db.get("astrid.mood") == 0.4567
+
+
+def test_path_queries(db: RePraxisDatabase):
+    other, rep = Var("other"), Var("?r")
+
+    query = (
+        DBQuery()
+        .where(("astrid", "relationships", other, "reputation", ONE, rep))
+        .where("gt ?r 0")
+    )
+
+    result = query.run(db)
+    expected = DBQuery(["astrid.relationships.?other.reputation!?r", "gt ?r 0"]).run(db)
+
+    assert result.success is True
+    assert result.bindings == expected.bindings
+    assert DBQuery([("astrid", "mood", ONE, Var("m"))]).run(db).bindings == [
+        {"?m": 0.4567}
+    ]
+
+
+def test_delete_path(db: RePraxisDatabase):
+    assert db.delete_path(("astrid", "relationships", "lee"))
+    assert not db.assert_statement("astrid.relationships.lee")
+
+
+def test_invalid_paths():
+    with pytest.raises(ValueError):
+        path_nodes(("astrid", ONE))
+
+    with pytest.raises(ValueError):
+        path_nodes((ONE, "astrid"))
+
+    with pytest.raises(ValueError):
+        path_nodes(("astrid", "?other"))
+
+    with pytest.raises(TypeError):
+        path_nodes("astrid.mood")
+
+    with pytest.raises(TypeError):
+        RePraxisDatabase().insert_path(("astrid", Var("x")))
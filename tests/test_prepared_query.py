@@ -0,0 +1,167 @@
+# pylint: disable=C0116,W0621
+
+"""Test prepared queries and batches of binding sets.
+
+"""
+
+import collections
+import random
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+from repraxis.query.helpers import join_bindings
+from repraxis.query.query_state import QueryState
+
+
+@pytest.fixture
+def db():
+    database = RePraxisDatabase()
+
+    for i in range(6):
+        for j in range(6):
+            if i != j and (i + j) % 3 != 0:
+                database.insert(
+                    f"agent_{i}.relationships.agent_{j}.reputation!{(i * 7 + j) % 11}"
+                )
+        database.insert(f"agent_{i}.traits.{['kind', 'rude'][i % 2]}")
+
+    database.insert("agent_2.relationships.agent_3.tags.rival")
+    database.insert("agent_5.stats.speed![2.5]")
+
+    return database
+
+
+QUERIES = [
+    DBQuery(["?agent.relationships.?other.reputation!?r", "gt ?r 5"]),
+    DBQuery(
+        [
+            "?agent.relationships.?other.reputation!?r",
+            "?other.relationships.?agent.reputation!?r2",
+            "lt ?r ?r2",
+            "not ?other.traits.rude",
+        ]
+    ),
+    DBQuery(["?agent.traits.kind", "not ?agent.relationships.?x.tags.rival"]),
+    DBQuery(["?agent.relationships.?other", "eq ?other agent_3"]),
+    DBQuery(["agent_5.stats.speed!?speed", "gte ?speed ?min"]),
+    DBQuery(["agent_0.traits.rude"]),
+    DBQuery([]),
+]
+
+BINDING_SETS = [
+    {"?agent": "agent_0"},
+    {"?agent": "agent_2", "?min": 1},
+    {"?agent": "agent_4", "?min": 3.5},
+    {"?agent": "agent_9"},
+    {"?other": "agent_1", "?min": 2},
+    {},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_batch_matches_separate_runs(db: RePraxisDatabase, query: DBQuery):
+    expected = []
+    for binding_set in BINDING_SETS:
+        try:
+            expected.append(query.run(db, [binding_set]))
+        except TypeError:
+            # Comparisons with unbound variables fail, so skip those sets.
+            expected.append(None)
+
+    prepared = query.prepare()
+    binding_sets = [b for b, e in zip(BINDING_SETS, expected) if e is not None]
+    results = prepared.run_batch(db, binding_sets)
+
+    for result, expected_result in zip(results, [e for e in expected if e]):
+        assert result.success == expected_result.success
+        assert result.bindings == expected_result.bindings
+
+    assert prepared.run_batch(db, []) == []
+
+
+def test_prepared_run(db: RePraxisDatabase):
+    query = DBQuery(["?agent.traits.?trait"])
+    prepared = query.prepare()
+
+    assert prepared.run(db).bindings == query.run(db).bindings
+    assert prepared.run(db, [{"?agent": "agent_1"}]).bindings == [
+        {"?agent": "agent_1", "?trait": "rude"}
+    ]
+
+
+def test_join_bindings_order():
+    old = QueryState.from_object_bindings(
+        True, [{"?a": "x"}, {"?a": "y", "?b": 1}, {"?c": 2}]
+    ).bindings
+    new = QueryState.from_object_bindings(
+        True,
+        [{"?a": "y", "?d": 1}, {"?b": 1}, {"?a": "x", "?d": 2}, {"?a": "y", "?d": 3}],
+    ).bindings
+
+    joined = QueryState(True, join_bindings(old, new)).to_result().bindings
+
+    assert joined == [
+        {"?a": "x", "?b": 1},
+        {"?a": "x", "?d": 2},
+        {"?a": "y", "?b": 1, "?d": 1},
+        {"?a": "y", "?b": 1},
+        {"?a": "y", "?b": 1, "?d": 3},
+        {"?c": 2, "?a": "y", "?d": 1},
+        {"?c": 2, "?b": 1},
+        {"?c": 2, "?a": "x", "?d": 2},
+        {"?c": 2, "?a": "y", "?d": 3},
+    ]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_iter_states_matches_run(query: DBQuery):
+    db = RePraxisDatabase()
+
+    for i in range(20):
+        for j in range(20):
+            db.insert(f"agent_{i}.relationships.agent_{j}.reputation!{(i * j) % 13}")
+        db.insert(f"agent_{i}.traits.{['kind', 'rude'][i % 2]}")
+
+    bindings = [
+        binding
+        for state in query.prepare().iter_states(db, QueryState(True))
+        for binding in QueryState(True, state.bindings).to_result().bindings
+    ]
+
+    assert bindings == query.run(db).bindings
+
+
+def test_sample(db: RePraxisDatabase):
+    query = DBQuery(["?agent.relationships.?other.reputation!?r"])
+    matches = query.run(db).bindings
+    sample = query.sample(db, 5, random.Random(7)).bindings
+
+    assert len(sample) == 5
+    assert all(binding in matches for binding in sample)
+    assert query.sample(db, 5, random.Random(7)).bindings == sample
+    assert len(query.sample(db, 100).bindings) == len(matches)
+    assert (
+        query.sample(db, bindings=[{"?other": "agent_3"}]).bindings[0]["?other"]
+        == "agent_3"
+    )
+    assert not DBQuery(["?agent.traits.bored"]).sample(db).success
+    assert DBQuery(["agent_0.traits.kind"]).sample(db).success
+
+    with pytest.raises(ValueError):
+        query.sample(db, 0)
+
+
+def test_sample_is_uniform(db: RePraxisDatabase):
+    query = DBQuery(["?agent.traits.?trait"])
+    rng = random.Random(1)
+    counts = collections.Counter(
+        binding["?agent"]
+        for _ in range(3000)
+        for binding in query.sample(db, 2, rng).bindings
+    )
+
+    # Each of the 6 agents is picked 1000 times on average.
+    assert len(counts) == 6
+    assert all(900 < count < 1100 for count in counts.values())
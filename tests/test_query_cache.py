@@ -0,0 +1,130 @@
+# pylint: disable=C0116,W0621
+
+"""Test caching query results.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+from repraxis.query_cache import QueryCache
+
+
+@pytest.fixture
+def db():
+    database = RePraxisDatabase()
+
+    database.insert("astrid.relationships.jordan.reputation!30")
+    database.insert("astrid.relationships.britt.reputation!-10")
+    database.insert("astrid.relationships.lee.reputation!20")
+    database.insert("player.relationships.jordan.reputation!-20")
+    database.insert("player.relationships.britt.tags.spouse")
+
+    database.enable_query_cache()
+
+    return database
+
+
+REPUTATION_QUERY = (
+    DBQuery().where("astrid.relationships.?other.reputation!?r").where("gt ?r 0")
+)
+
+
+def test_repeated_query_hits_cache(db: RePraxisDatabase):
+    first = REPUTATION_QUERY.run(db)
+    second = DBQuery(REPUTATION_QUERY.expressions).run(db)
+
+    assert first.bindings == second.bindings
+    assert db.query_cache is not None
+    assert db.query_cache.misses == 1
+    assert db.query_cache.hits == 1
+
+
+def test_bindings_are_part_of_the_key(db: RePraxisDatabase):
+    query = DBQuery().where("astrid.relationships.?other.reputation!?r")
+
+    assert len(query.run(db, [{"?other": "lee"}]).bindings) == 1
+    assert len(query.run(db, [{"?other": "britt"}]).bindings) == 1
+    assert len(query.run(db).bindings) == 3
+    assert db.query_cache is not None
+    assert db.query_cache.hits == 0
+
+
+def test_relevant_writes_invalidate(db: RePraxisDatabase):
+    REPUTATION_QUERY.run(db)
+
+    db.insert("astrid.relationships.britt.reputation!15")
+    result = REPUTATION_QUERY.run(db)
+
+    assert {b["?other"] for b in result.bindings} == {"jordan", "lee", "britt"}
+
+    db.delete("astrid.relationships.lee")
+    result = REPUTATION_QUERY.run(db)
+
+    assert {b["?other"] for b in result.bindings} == {"jordan", "britt"}
+    assert db.query_cache is not None
+    assert db.query_cache.hits == 0
+
+
+def test_unrelated_writes_keep_results(db: RePraxisDatabase):
+    REPUTATION_QUERY.run(db)
+
+    db.insert("player.relationships.lee.reputation!5")
+    db.insert("astrid.traits.kind")
+    REPUTATION_QUERY.run(db)
+
+    assert db.query_cache is not None
+    assert db.query_cache.hits == 1
+
+
+def test_variable_heads_see_every_write(db: RePraxisDatabase):
+    query = DBQuery().where("?a.relationships.?b.tags.spouse")
+
+    assert len(query.run(db).bindings) == 1
+
+    db.insert("britt.relationships.player.tags.spouse")
+
+    assert len(query.run(db).bindings) == 2
+
+
+def test_or_branches_are_watched(db: RePraxisDatabase):
+    query = DBQuery().where("astrid.relationships.?b or player.relationships.?b")
+
+    assert len(query.run(db).bindings) == 3
+
+    db.insert("player.relationships.haley.tags.friend")
+
+    assert len(query.run(db).bindings) == 4
+    assert db.query_cache is not None
+    assert db.query_cache.hits == 0
+
+
+def test_clear_and_disable(db: RePraxisDatabase):
+    REPUTATION_QUERY.run(db)
+    db.clear()
+
+    assert REPUTATION_QUERY.run(db).success is False
+
+    db.disable_query_cache()
+
+    assert db.query_cache is None
+
+
+def test_results_are_copied(db: RePraxisDatabase):
+    REPUTATION_QUERY.run(db).bindings[0]["?r"] = 1000
+
+    assert all(b["?r"] != 1000 for b in REPUTATION_QUERY.run(db).bindings)
+
+
+def test_least_recently_used_eviction():
+    cache = QueryCache(2)
+
+    cache.put("a", [("a",)], object())  # type: ignore[arg-type]
+    cache.put("b", [("b",)], object())  # type: ignore[arg-type]
+    cache.get("a")
+    cache.put("c", [("c",)], object())  # type: ignore[arg-type]
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
@@ -4,9 +4,14 @@
 
 """
 
+import asyncio
+import gc
+import time
+
 import pytest
 
 from repraxis import RePraxisDatabase
+from repraxis.paths import ONE
 from repraxis.query import DBQuery
 
 
@@ -239,6 +244,59 @@ def test_empty_query(db: RePraxisDatabase):
     assert result.success is True
 
 
+def test_delete_single_token():
+    db = RePraxisDatabase()
+    db.insert("katara.element")
+
+    assert db.delete("katara")
+    assert not db.assert_statement("katara")
+
+
+def test_query_stops_at_failed_expression(db: RePraxisDatabase):
+    query = DBQuery(["astrid.relationships.haley", "?a.relationships.?b"])
+
+    assert not query.run(db).success
+    assert not query.cursor(db).step(10**9).success
+
+
+def test_or_expression(db: RePraxisDatabase):
+    query = DBQuery(
+        [
+            "astrid.relationships.?other",
+            "?other.relationships.player.tags.spouse or "
+            "astrid.relationships.?other.reputation!?r",
+            "not astrid.relationships.?other.tags.rivalry",
+        ]
+    )
+
+    assert query.run(db).bindings == [
+        {"?other": "britt"},
+        {"?other": "britt", "?r": -10},
+        {"?other": "lee", "?r": 20},
+    ]
+
+    # Bindings matching more than one branch are only returned once.
+    query = DBQuery(
+        ["?a.relationships.?b.tags.?t", "gt ?b astrid or not ?b.relationships.?c"]
+    )
+    bindings = query.run(db).bindings
+
+    assert len(bindings) == 6
+    assert query.cursor(db).step(10**9).bindings == bindings
+
+
+def test_or_expression_without_variables(db: RePraxisDatabase):
+    assert DBQuery(["astrid.relationships.haley or player"]).run(db).success
+    assert not DBQuery(["haley or not player"]).run(db).success
+
+    # A branch without variables that holds leaves the other variables unbound.
+    query = DBQuery(["player or ?a.relationships.?b", "?b.relationships.?c"])
+    assert query.run(db).bindings == DBQuery(["?b.relationships.?c"]).run(db).bindings
+
+    with pytest.raises(ValueError):
+        DBQuery(["player or"]).run(db)
+
+
 def test_float_nodes():
     db = RePraxisDatabase()
 
@@ -309,3 +367,268 @@ def test_symbol_nodes():
     assert result.success
     assert len(result.bindings) == 1
     assert result.bindings[0]["?x"] == "asami"
+
+
+def test_run_async_matches_run(db: RePraxisDatabase):
+    query = (
+        DBQuery()
+        .where("?speaker.relationships.?other.reputation!?r0")
+        .where("gt ?r0 10")
+        .where("player.relationships.?other.reputation!?r1")
+        .where("lt ?r1 0")
+        .where("neq ?speaker player")
+    )
+
+    result = asyncio.run(query.run_async(db, yield_every=1))
+
+    assert result.success is True
+    assert result.bindings == query.run(db).bindings
+
+
+def test_run_async_yields_to_event_loop():
+    db = RePraxisDatabase()
+
+    for i in range(200):
+        db.insert(f"agent_{i}.relationships.player.reputation!{i}")
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    async def main():
+        task = asyncio.create_task(ticker())
+        result = await DBQuery(["?a.relationships.?b.reputation!?r"]).run_async(
+            db, yield_every=10
+        )
+        task.cancel()
+        return result
+
+    result = asyncio.run(main())
+
+    assert len(result.bindings) == 200
+    assert ticks > 10
+
+
+def test_run_async_cancellation():
+    db = RePraxisDatabase()
+
+    for i in range(200):
+        db.insert(f"agent_{i}.relationships.player.reputation!{i}")
+
+    async def main():
+        task = asyncio.create_task(
+            DBQuery(["?a.relationships.?b.reputation!?r"]).run_async(db, yield_every=1)
+        )
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+
+def test_query_cursor_resumes_between_steps():
+    db = RePraxisDatabase()
+
+    for i in range(100):
+        db.insert(f"agent_{i}.relationships.player.reputation!{i}")
+
+    query = DBQuery().where("?a.relationships.?b.reputation!?r").where("gte ?r 50")
+    cursor = query.cursor(db)
+
+    steps = 0
+    while cursor.step(0, max_work=5) is None:
+        steps += 1
+
+    assert steps > 10
+    assert cursor.done
+    assert cursor.expressions_completed == 2
+    assert cursor.result is not None
+    assert cursor.result.bindings == query.run(db).bindings
+
+
+@pytest.fixture(scope="module")
+def wide_db():
+    db = RePraxisDatabase()
+
+    for i in range(50000):
+        db.insert(f"agent_{i}.age!{i % 100}")
+
+    return db
+
+
+@pytest.fixture
+def no_gc():
+    # Collector pauses over a large heap are not part of the query's work.
+    gc.disable()
+    yield
+    gc.enable()
+
+
+WIDE_QUERY = DBQuery(["?a.age!?g", "gt ?g 50"])
+
+
+@pytest.mark.usefixtures("no_gc")
+def test_query_cursor_steps_stay_short_on_wide_roots(wide_db: RePraxisDatabase):
+    cursor = WIDE_QUERY.cursor(wide_db)
+    longest = 0.0
+
+    while True:
+        step_start = time.perf_counter()
+        result = cursor.step(2_000_000, 1000)
+        longest = max(longest, time.perf_counter() - step_start)
+
+        if result is not None:
+            break
+
+    assert len(result.bindings) == 24500
+    # Scanning the root's children or converting the results in one step would
+    # take far longer than the budget.
+    assert longest < 0.03
+
+
+@pytest.mark.usefixtures("no_gc")
+def test_run_async_yields_on_wide_roots(wide_db: RePraxisDatabase):
+    longest_gap = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal longest_gap
+        last = time.perf_counter()
+
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            longest_gap = max(longest_gap, now - last)
+            last = now
+
+    async def main():
+        nonlocal done
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+
+        result = await WIDE_QUERY.run_async(
+            wide_db, yield_every=1000, max_slice_us=2000
+        )
+
+        done = True
+        await task
+        return result
+
+    result = asyncio.run(main())
+
+    assert len(result.bindings) == 24500
+    assert longest_gap < 0.03
+
+
+def test_query_cursor_with_large_budget(db: RePraxisDatabase):
+    query = DBQuery().where("astrid.relationships.?other.reputation!?r")
+    result = query.cursor(db).step(10**9)
+
+    assert result is not None
+    assert len(result.bindings) == 3
+
+
+def test_get_value(db: RePraxisDatabase):
+    assert db.get("astrid.relationships.jordan.reputation") == 30
+    assert db.get("astrid.relationships.haley.reputation") is None
+    assert db.get("astrid.relationships.haley.reputation", 0) == 0
+
+    db.insert("astrid.mood![0.5]")
+
+    assert db.get("astrid.mood") == 0.5
+
+    with pytest.raises(TypeError):
+        db.get("astrid.relationships")
+
+
+def test_repeated_assert_statement(db: RePraxisDatabase):
+    for _ in range(3):
+        assert db.assert_statement("astrid.relationships.jordan.reputation!30")
+        assert "astrid.relationships.jordan.reputation.30" not in db
+
+    with pytest.raises(TypeError):
+        db.assert_statement("astrid.relationships.?other")
+
+
+def test_set_value(db: RePraxisDatabase):
+    db.set("astrid.relationships.jordan.reputation", 31)
+
+    assert db.get("astrid.relationships.jordan.reputation") == 31
+    assert db.assert_statement("astrid.relationships.jordan.reputation!31")
+    assert not db.assert_statement("astrid.relationships.jordan.reputation!30")
+
+    db.set("astrid.relationships.jordan.reputation", "unknown")
+
+    assert db.assert_statement("astrid.relationships.jordan.reputation!unknown")
+
+    db.set("astrid.mood", "happy")
+
+    assert db.assert_statement("astrid.mood!happy")
+
+    result = DBQuery(["astrid.relationships.?other.reputation!?r"]).run(db)
+
+    assert len(result.bindings) == 3
+
+
+def test_increment_value(db: RePraxisDatabase):
+    assert db.increment("astrid.relationships.lee.reputation") == 21
+    assert db.increment("astrid.relationships.lee.reputation", -5) == 16
+    assert db.increment("astrid.relationships.lee.reputation", 0.5) == 16.5
+    assert db.increment("astrid.gold", 10) == 10
+    assert db.get("astrid.gold") == 10
+
+    with pytest.raises(TypeError):
+        db.increment("astrid.relationships")
+
+    db.set("astrid.name", "Astrid")
+
+    with pytest.raises(TypeError):
+        db.increment("astrid.name")
+
+
+def test_iter_sentences(db: RePraxisDatabase):
+    sentences = list(db.iter_sentences())
+
+    assert len(sentences) == 10
+    assert "astrid.relationships.jordan.reputation!30" in sentences
+
+    copy = RePraxisDatabase()
+    for sentence in sentences:
+        copy.insert(sentence)
+
+    assert sorted(copy.iter_sentences()) == sorted(sentences)
+    assert sorted(db.iter_sentences("astrid.relationships.lee")) == [
+        "astrid.relationships.lee.reputation!20",
+        "astrid.relationships.lee.tags.friend",
+    ]
+    assert list(db.iter_sentences("astrid.relationships.lee.tags.friend")) == [
+        "astrid.relationships.lee.tags.friend"
+    ]
+    assert not list(db.iter_sentences("astrid.relationships.haley"))
+
+
+def test_iter_paths(db: RePraxisDatabase):
+    paths = list(db.iter_paths(("player",)))
+
+    assert ("player", "relationships", "jordan", "reputation", ONE, -20) in paths
+    assert len(paths) == 3
+
+    copy = RePraxisDatabase()
+    for path in db.iter_paths():
+        copy.insert_path(path)
+
+    assert sorted(copy.iter_sentences()) == sorted(db.iter_sentences())
+
+
+def test_iter_deep_tree():
+    db = RePraxisDatabase()
+    db.insert(".".join(f"n{i}" for i in range(3000)))
+
+    (sentence,) = db.iter_sentences()
+
+    assert sentence.count(".") == 2999
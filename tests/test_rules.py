@@ -0,0 +1,117 @@
+# pylint: disable=C0116,W0621
+
+"""Test derived rules.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.rules import Rule, RuleEngine
+
+ALLIES = Rule("?a.allies.?b", ["?a.friends.?c", "?b.friends.?c", "neq ?a ?b"])
+REACH = [
+    Rule("?a.reach.?b", ["?a.link.?b"]),
+    Rule("?a.reach.?c", ["?a.reach.?b", "?b.link.?c"]),
+]
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine(RePraxisDatabase(), [ALLIES, *REACH])
+
+
+def test_materialize_existing_facts():
+    db = RePraxisDatabase()
+    db.insert("astrid.friends.lee")
+    db.insert("jordan.friends.lee")
+
+    engine = RuleEngine(db, [ALLIES])
+
+    assert engine.derived == {"astrid.allies.jordan", "jordan.allies.astrid"}
+    assert db.assert_statement("jordan.allies.astrid")
+
+
+def test_incremental_inserts(engine: RuleEngine):
+    engine.insert("a.link.b")
+    engine.insert("c.link.d")
+
+    assert not engine.db.assert_statement("a.reach.d")
+
+    engine.insert("b.link.c")
+
+    assert engine.derived >= {"a.reach.c", "a.reach.d", "b.reach.d"}
+
+
+def test_delete_and_rederive(engine: RuleEngine):
+    for sentence in ["a.link.b", "b.link.c", "a.link.c"]:
+        engine.insert(sentence)
+
+    engine.delete("b.link.c")
+
+    # a still reaches c through the direct link.
+    assert engine.db.assert_statement("a.reach.c")
+    assert not engine.db.assert_statement("b.reach.c")
+
+    engine.delete("a.link")
+
+    assert sorted(engine.db.iter_sentences()) == ["a", "b.link"]
+
+
+def test_overwrite_one_value():
+    engine = RuleEngine(
+        RePraxisDatabase(), [Rule("?a.rich", ["?a.gold!?g", "gt ?g 5"])]
+    )
+
+    engine.insert("astrid.gold!10")
+    assert engine.db.assert_statement("astrid.rich")
+
+    engine.insert("astrid.gold!2")
+    assert not engine.db.assert_statement("astrid.rich")
+
+
+def test_incremental_checks_cardinality():
+    rule = Rule("?a.rich", ["?a.gold.?g"])
+    engine = RuleEngine(RePraxisDatabase(), [rule])
+
+    db = RePraxisDatabase()
+
+    for sentence in ["astrid.gold!10", "lee.gold.5"]:
+        engine.insert(sentence)
+        db.insert(sentence)
+
+    rebuilt = RuleEngine(db, [rule])
+
+    assert engine.derived == rebuilt.derived == {"lee.rich"}
+    assert not engine.db.assert_statement("astrid.rich")
+
+
+def test_negated_base_facts(engine: RuleEngine):
+    engine.add_rule(Rule("?a.trusted", ["?a.allies.?b", "not ?a.traits.liar"]))
+    engine.insert("astrid.friends.lee")
+    engine.insert("jordan.friends.lee")
+
+    assert engine.db.assert_statement("astrid.trusted")
+
+    engine.insert("astrid.traits.liar")
+
+    assert not engine.db.assert_statement("astrid.trusted")
+    assert engine.db.assert_statement("jordan.trusted")
+
+    engine.delete("astrid.traits")
+
+    assert engine.db.assert_statement("astrid.trusted")
+
+
+def test_invalid_rules(engine: RuleEngine):
+    with pytest.raises(ValueError):
+        Rule("?a.best_friend!?b", ["?a.friends.?b"])
+
+    with pytest.raises(ValueError):
+        Rule("?a.allies.?d", ["?a.friends.?c"])
+
+    with pytest.raises(ValueError):
+        Rule("?a.close.?b", ["?a.friends.?b or ?a.spouse.?b"])
+
+    with pytest.raises(ValueError):
+        engine.add_rule(Rule("?a.lonely", ["?a.friends", "not ?a.allies.?b"]))
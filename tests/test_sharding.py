@@ -0,0 +1,113 @@
+# pylint: disable=C0116,W0621
+
+"""Test the sharded database.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+from repraxis.sharding import ShardedDatabase
+
+SENTENCES = [
+    "astrid.relationships.jordan.reputation!30",
+    "astrid.relationships.jordan.tags.rivalry",
+    "astrid.relationships.britt.reputation!-10",
+    "astrid.relationships.britt.tags.ex_lover",
+    "astrid.relationships.lee.reputation!20",
+    "astrid.relationships.lee.tags.friend",
+    "britt.relationships.player.tags.spouse",
+    "player.relationships.jordan.reputation!-20",
+    "player.relationships.jordan.tags.enemy",
+    "player.relationships.britt.tags.spouse",
+]
+
+QUERIES = [
+    DBQuery().where("astrid.relationships.britt"),
+    DBQuery().where("astrid.relationships.haley"),
+    DBQuery().where("?A.relationships.?other.reputation!?r").where("lte ?r 0"),
+    DBQuery()
+    .where("?speaker.relationships.?other.reputation!?r0")
+    .where("gt ?r0 10")
+    .where("player.relationships.?other.reputation!?r1")
+    .where("lt ?r1 0")
+    .where("neq ?speaker player"),
+    DBQuery()
+    .where("astrid.relationships.?other")
+    .where("not astrid.relationships.?other.reputation!30")
+    .where("not ?other.relationships.?others_spouse.tags.spouse"),
+    DBQuery()
+    .where("astrid.relationships.?other")
+    .where("not player.relationships.?x.tags.spouse"),
+    DBQuery()
+    .where("?a.relationships.?b")
+    .where("?a.relationships.?b.tags.spouse or ?b.relationships.?a.tags.spouse"),
+    DBQuery().where("astrid.relationships.haley").where("?a.relationships.?b"),
+    DBQuery()
+    .where("not astrid.relationships.britt")
+    .where("?a.relationships.?b.tags.spouse"),
+]
+
+
+@pytest.fixture(scope="module")
+def sharded():
+    with ShardedDatabase(3) as database:
+        for sentence in SENTENCES:
+            database.insert(sentence)
+        yield database
+
+
+@pytest.fixture(scope="module")
+def db():
+    database = RePraxisDatabase()
+    for sentence in SENTENCES:
+        database.insert(sentence)
+    return database
+
+
+def _canonical(bindings: list[dict[str, object]]) -> list[tuple]:
+    return sorted(tuple(sorted(binding.items())) for binding in bindings)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_queries_match_single_database(
+    sharded: ShardedDatabase, db: RePraxisDatabase, query: DBQuery
+):
+    expected = query.run(db)
+    result = sharded.run(query)
+
+    assert result.success == expected.success
+    assert _canonical(result.bindings) == _canonical(expected.bindings)
+
+
+def test_failed_expression_stops_query(sharded: ShardedDatabase):
+    query = DBQuery(["missing.fact", "?a.relationships.?b"])
+
+    assert not sharded.run(query).success
+    assert not sharded.run(query, [{"?a": "astrid"}]).success
+
+
+def test_routing(sharded: ShardedDatabase):
+    assert sharded.assert_statement("astrid.relationships.jordan.reputation!30")
+    assert "player.relationships.britt.tags.spouse" in sharded
+    assert "player.relationships.astrid" not in sharded
+
+
+def test_query_with_bindings(sharded: ShardedDatabase):
+    query = DBQuery().where("?a.relationships.?other.reputation!?r").where("gte ?r 10")
+    result = sharded.run(query, [{"?other": "lee"}])
+
+    assert result.bindings == [{"?other": "lee", "?a": "astrid", "?r": 20}]
+
+
+def test_insert_and_delete():
+    with ShardedDatabase(2) as database:
+        database.insert("katara.element!water")
+        assert database.assert_statement("katara.element!water")
+
+        assert database.delete("katara.element")
+        assert not database.assert_statement("katara.element")
+
+        with pytest.raises(TypeError):
+            database.insert("?x.element!fire")
@@ -0,0 +1,138 @@
+# pylint: disable=C0116,W0621
+
+"""Test querying database snapshots published to shared memory.
+
+"""
+
+import multiprocessing
+from multiprocessing.connection import Connection
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.query import DBQuery
+from repraxis.shared_snapshot import SnapshotPublisher, SnapshotReader
+
+SENTENCES = [
+    "astrid.relationships.jordan.reputation!30",
+    "astrid.relationships.jordan.tags.rivalry",
+    "astrid.relationships.britt.reputation!-10",
+    "astrid.relationships.lee.reputation!20",
+    "astrid.stats.speed![1.5]",
+    "player.relationships.jordan.reputation!-20",
+    "player.relationships.britt.tags.spouse",
+]
+
+QUERY = DBQuery(
+    [
+        "?speaker.relationships.?other.reputation!?r",
+        "gt ?r 10",
+        "not player.relationships.?other.tags.spouse",
+    ]
+)
+
+
+@pytest.fixture(params=["nodes", "array"])
+def db(request: pytest.FixtureRequest):
+    db = RePraxisDatabase(ArrayTrie().root if request.param == "array" else None)
+
+    for sentence in SENTENCES:
+        db.insert(sentence)
+
+    return db
+
+
+@pytest.fixture
+def publisher():
+    publisher = SnapshotPublisher()
+    yield publisher
+    publisher.close()
+
+
+def _query_worker(name: str, connection: Connection) -> None:
+    with SnapshotReader(name) as reader:
+        connection.send(QUERY.run(reader.database).bindings)
+
+        connection.recv()
+        reader.refresh()
+
+        connection.send(
+            (reader.generation, sorted(reader.database.iter_sentences("astrid")))
+        )
+
+
+def test_query_snapshot(db: RePraxisDatabase, publisher: SnapshotPublisher):
+    assert publisher.publish(db) == 1
+
+    with SnapshotReader(publisher.name) as reader:
+        snapshot_db = reader.database
+
+        assert QUERY.run(snapshot_db).bindings == QUERY.run(db).bindings
+        assert list(snapshot_db.iter_sentences()) == list(db.iter_sentences())
+        assert snapshot_db.get("astrid.stats.speed") == 1.5
+        assert snapshot_db.assert_statement("astrid.relationships.jordan.tags.rivalry")
+        assert not snapshot_db.assert_statement("astrid.relationships.jordan.tags.ally")
+        assert not snapshot_db.assert_statement("astrid.relationships.haley")
+
+        with pytest.raises(TypeError):
+            snapshot_db.insert("astrid.traits.kind")
+
+
+def test_swap_snapshots(db: RePraxisDatabase, publisher: SnapshotPublisher):
+    publisher.publish(db)
+    reader = SnapshotReader(publisher.name)
+    old_db = reader.database
+
+    assert not reader.refresh()
+
+    db.delete("astrid.relationships.lee")
+    publisher.publish(db)
+
+    # The old snapshot stays readable after the publisher unlinks it.
+    assert reader.refresh()
+    assert reader.generation == 2
+    assert len(QUERY.run(reader.database).bindings) == 1
+    assert len(QUERY.run(old_db).bindings) == 2
+
+    reader.close()
+
+
+def test_reader_before_publish(publisher: SnapshotPublisher):
+    reader = SnapshotReader(publisher.name)
+
+    assert reader.generation == 0
+
+    with pytest.raises(ValueError):
+        _ = reader.database
+
+    publisher.publish(RePraxisDatabase())
+
+    assert reader.refresh()
+    assert list(reader.database.iter_sentences()) == []
+
+    reader.close()
+
+
+def test_query_from_worker_process(db: RePraxisDatabase, publisher: SnapshotPublisher):
+    publisher.publish(db)
+    connection, worker_connection = multiprocessing.Pipe()
+    worker = multiprocessing.Process(
+        target=_query_worker, args=(publisher.name, worker_connection)
+    )
+    worker.start()
+
+    assert connection.recv() == QUERY.run(db).bindings
+
+    db.insert("astrid.traits.kind")
+    publisher.publish(db)
+    connection.send("refresh")
+
+    assert connection.recv() == (2, sorted(db.iter_sentences("astrid")))
+
+    worker.join()
+    assert worker.exitcode == 0
+
+    # Detaching the worker leaves the blocks to the publisher.
+    with SnapshotReader(publisher.name) as reader:
+        assert reader.generation == 2
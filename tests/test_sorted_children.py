@@ -0,0 +1,198 @@
+# pylint: disable=C0116,W0621
+
+"""Test ordered children and range scans.
+
+"""
+
+import math
+import random
+
+import pytest
+
+from repraxis import DBQuery, RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.nodes.base_types import NodeCardinality
+from repraxis.nodes.nodes import FloatNode, IntNode, SymbolNode
+from repraxis.nodes.sorted_children import KeyRange, SortedChildMap
+
+MANY = NodeCardinality.MANY
+
+
+def _children(*values: object) -> SortedChildMap:
+    children = SortedChildMap()
+
+    for value in values:
+        if isinstance(value, int):
+            node = IntNode(value, MANY)
+        elif isinstance(value, float):
+            node = FloatNode(value, MANY)
+        else:
+            node = SymbolNode(str(value), MANY)
+
+        children[node.symbol] = node
+
+    return children
+
+
+def _values(nodes) -> list[object]:
+    return [node.get_value() for node in nodes]
+
+
+def test_sorted_child_map():
+    children = _children("b", 3, math.nan, 1.5, "a", -2)
+
+    assert _values(children.values())[:3] == [-2, 1.5, 3]
+    assert math.isnan(_values(children.values())[3])
+    assert _values(children.values())[4:] == ["a", "b"]
+
+    del children["3"]
+    children["a"] = SymbolNode("c", MANY)
+
+    assert "3" not in children and len(children) == 5
+    assert _values(children.values())[-2:] == ["b", "c"]
+
+
+def test_in_range():
+    children = _children("b", 3, math.nan, 1.5, "a", -2, 7)
+
+    assert _values(children.in_range(KeyRange(1.5, 7, False, True))) == [
+        3,
+        7,
+        "a",
+        "b",
+    ]
+    assert _values(children.in_range(KeyRange(high=3))) == [-2, 1.5, 3, "a", "b"]
+    assert _values(children.in_range(KeyRange("b")))[:4] == [-2, 1.5, 3, 7]
+    assert _values(children.in_range(KeyRange("b")))[-1] == "b"
+
+    key_range = KeyRange(0).intersect(KeyRange(high=5, high_inclusive=False))
+
+    assert [key_range.contains(v) for v in (0, 4.9, 5, math.nan, "a")] == [
+        True,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+    with pytest.raises(ValueError):
+        KeyRange(1, "z")
+
+
+def test_deterministic_order():
+    sentences = [f"agent{i % 5}.items.{i * 7 % 11}" for i in range(20)]
+    shuffled = sentences.copy()
+    random.Random(5).shuffle(shuffled)
+
+    ordered = RePraxisDatabase(ordered_children=True)
+    reordered = RePraxisDatabase(ordered_children=True)
+
+    for sentence in sentences:
+        ordered.insert(sentence)
+
+    for sentence in shuffled:
+        reordered.insert(sentence)
+
+    query = DBQuery(["?agent.items.?i"])
+
+    assert list(ordered.iter_sentences()) == list(reordered.iter_sentences())
+    assert query.run(ordered).bindings == query.run(reordered).bindings
+    assert [(b["?agent"], b["?i"]) for b in query.run(ordered).bindings] == sorted(
+        (f"agent{i % 5}", i * 7 % 11) for i in range(20)
+    )
+
+
+def test_set_value_keeps_order():
+    db = RePraxisDatabase(ordered_children=True)
+    db.insert("astrid.gold!10")
+    db.insert("britt.gold!5")
+    db.insert("astrid.scores.3")
+    db.insert("astrid.scores.8")
+
+    db.set("astrid.gold", 1)
+    db.increment("britt.gold", -10)
+
+    assert DBQuery(["?a.gold!?g", "lt ?g 2"]).run(db).bindings == [
+        {"?a": "astrid", "?g": 1},
+        {"?a": "britt", "?g": -5},
+    ]
+
+    scores = db.root.get_child("astrid").get_child("scores")
+    scores.get_child("3").set_value(9)
+
+    assert _values(scores.children) == [8, 9]
+
+
+def test_range_queries_match_unordered():
+    rng = random.Random(7)
+    ordered = RePraxisDatabase(ordered_children=True)
+    unordered = RePraxisDatabase()
+
+    for i in range(200):
+        value = rng.choice([rng.randrange(-50, 50), round(rng.uniform(-50, 50), 2)])
+        sentence = f"agent{i % 40}.items.item{i}.value![{value}]"
+
+        ordered.insert(sentence)
+        unordered.insert(sentence)
+
+    queries = [
+        DBQuery(["?a.items.?i.value!?v", "gte ?v 10", "lt ?v [20.5]"]),
+        DBQuery(["?a.items.?i.value!?v", "gt 0 ?v", "neq ?v -3"]),
+        DBQuery(["?a.items.?i.value!?v", "eq ?v 7"]),
+        DBQuery(["agent3.items.?i.value!?v", "?a.items.?i", "lte ?v 0"]),
+    ]
+
+    def key(binding):
+        return sorted(binding.items())
+
+    for query in queries:
+        assert sorted(query.run(ordered).bindings, key=key) == sorted(
+            query.run(unordered).bindings, key=key
+        )
+
+    # Comparisons before an assert do not limit it.
+    assert not DBQuery(["gt ?v 0", "?a.items.?i.value!?v"]).run(ordered).success
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_range_queries_compare_float_symbols(ordered: bool):
+    db = RePraxisDatabase(ordered_children=ordered)
+    db.insert("a.score![123.4]")
+    db.insert("b.score![0.9996]")
+
+    # Floats are compared at the precision of their symbols, [123.0] and [1.0].
+    assert DBQuery(["?x.score!?r", "lte ?r 123"]).run(db).bindings == [
+        {"?x": "a", "?r": 123.4},
+        {"?x": "b", "?r": 0.9996},
+    ]
+    assert DBQuery(["?x.score!?r", "gte ?r 1", "lt ?r 2"]).run(db).bindings == [
+        {"?x": "b", "?r": 0.9996}
+    ]
+    assert DBQuery(["?x.score!?r", "eq ?r [123.0]"]).run(db).success
+    assert not DBQuery(["?x.score!?r", "gt ?r 123"]).run(db).success
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_range_queries_keep_errors(ordered: bool):
+    db = RePraxisDatabase(ordered_children=ordered)
+    db.insert("astrid.age!40")
+    db.insert("astrid.mood!happy")
+    db.insert("lee.age!10")
+    db.insert("lee.mood!5")
+
+    # Ranges are not pushed past comparisons that raise for the skipped bindings.
+    for expressions in [
+        ["?y.age!?h", "gte ?g 30", "lte ?h 5"],
+        ["?y.age!?h", "?y.mood!?m", "gt ?m 1", "lt ?h 20"],
+    ]:
+        with pytest.raises(TypeError):
+            DBQuery(expressions).run(db)
+
+    assert DBQuery(["?y.age!?h", "neq ?y lee", "gt ?h 20"]).run(db).bindings == [
+        {"?y": "astrid", "?h": 40}
+    ]
+
+
+def test_ordered_children_need_node_objects():
+    with pytest.raises(ValueError):
+        RePraxisDatabase(ArrayTrie().root, ordered_children=True)
@@ -0,0 +1,68 @@
+# pylint: disable=C0116,W0621
+
+"""Test database statistics.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.nodes.base_types import NodeCardinality, NodeType
+
+
+@pytest.fixture(params=["nodes", "array"])
+def db(request: pytest.FixtureRequest):
+    database = (
+        RePraxisDatabase(ArrayTrie().root)
+        if request.param == "array"
+        else RePraxisDatabase()
+    )
+
+    database.insert("astrid.relationships.jordan.reputation!30")
+    database.insert("astrid.relationships.britt.reputation!-10")
+    database.insert("astrid.mood![0.5]")
+    database.insert("player.traits.kind")
+
+    return database
+
+
+def test_node_counts(db: RePraxisDatabase):
+    stats = db.stats()
+
+    assert stats.node_count == 13
+    assert stats.leaf_count == 4
+    assert stats.nodes_by_type[NodeType.INT] == 2
+    assert stats.nodes_by_type[NodeType.FLOAT] == 1
+    assert stats.nodes_by_type[NodeType.SYMBOL] == 10
+    assert stats.nodes_by_cardinality[NodeCardinality.ONE] == 3
+    assert stats.nodes_by_cardinality[NodeCardinality.MANY] == 10
+
+
+def test_shape(db: RePraxisDatabase):
+    stats = db.stats()
+
+    assert stats.depth_histogram == [1, 2, 3, 4, 2, 2]
+    assert stats.max_depth == 5
+    assert stats.max_fanout == [2, 2, 2, 1, 1, 0]
+    assert stats.mean_fanout[0] == 2.0
+    assert stats.mean_fanout[1] == 1.5
+
+
+def test_bytes(db: RePraxisDatabase):
+    stats = db.stats()
+
+    assert set(stats.subtree_bytes) == {"astrid", "player"}
+    assert stats.subtree_bytes["astrid"] > stats.subtree_bytes["player"] > 0
+    assert stats.estimated_bytes > sum(stats.subtree_bytes.values())
+
+
+def test_stats_are_reused_until_a_write(db: RePraxisDatabase):
+    stats = db.stats()
+
+    assert db.stats() is stats
+
+    db.insert("player.traits.brave")
+
+    assert db.stats() is not stats
+    assert db.stats().leaf_count == 5
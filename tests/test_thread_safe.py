@@ -0,0 +1,154 @@
+# pylint: disable=C0116,W0621
+
+"""Test sharing a database across threads.
+
+"""
+
+import random
+import sys
+import threading
+
+import pytest
+
+from repraxis import DBQuery, RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.thread_safe import ThreadSafeDatabase
+
+AGENTS = [f"agent_{i}" for i in range(8)]
+
+
+@pytest.fixture
+def db():
+    db = ThreadSafeDatabase()
+
+    for agent in AGENTS:
+        db.insert(f"{agent}.state!0")
+
+    return db
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _run_threads(targets) -> list[BaseException]:
+    errors: list[BaseException] = []
+
+    def run(target):
+        try:
+            target()
+        except BaseException as ex:  # pylint: disable=broad-except
+            errors.append(ex)
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in targets]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return errors
+
+
+def test_matches_regular_database():
+    safe = ThreadSafeDatabase()
+    regular = RePraxisDatabase()
+
+    for target in (safe, regular):
+        target.insert("astrid.relationships.jordan.reputation!30")
+        target.insert("astrid.traits.kind")
+        target.set("jordan.gold", 5)
+        target.increment("jordan.gold", 2)
+        target.delete("astrid.traits")
+
+    query = DBQuery(["?a.relationships.?b.reputation!?r", "gt ?r 10"])
+
+    assert query.run(safe).bindings == query.run(regular).bindings
+    assert list(safe.iter_sentences()) == list(regular.iter_sentences())
+    assert safe.get("jordan.gold") == 7
+    assert safe.content_hash() == regular.content_hash()
+
+
+@pytest.mark.usefixtures("fast_switching")
+def test_concurrent_writes_and_queries(db: ThreadSafeDatabase):
+    db.enable_query_cache()
+    done = threading.Event()
+
+    def writer(agents: list[str]):
+        rng = random.Random(agents[0])
+
+        for n in range(1, 301):
+            agent = rng.choice(agents)
+            db.set(f"{agent}.state", n)
+            db.insert(f"{agent}.items.item_{n}")
+
+            if n % 3 == 0:
+                db.delete(f"{agent}.items")
+
+    def reader():
+        while not done.is_set():
+            states = DBQuery(["?a.state!?n"]).run(db).bindings
+            assert sorted(b["?a"] for b in states) == AGENTS
+
+            for agent in AGENTS[:2]:
+                assert len(DBQuery([f"{agent}.state!?n"]).run(db).bindings) == 1
+
+            DBQuery(["?a.items.?i", "not ?a.state!0"]).run(db)
+            assert sum(1 for _ in db.iter_sentences()) >= len(AGENTS)
+
+    writers = [
+        lambda agents=AGENTS[i::2]: writer(agents) for i in range(2)  # type: ignore
+    ]
+
+    def run_writers():
+        try:
+            assert not _run_threads(writers)
+        finally:
+            done.set()
+
+    errors = _run_threads([run_writers, reader, reader, reader])
+
+    assert not errors
+    assert len(db.root.get_child("agent_0").get_child("state").children) == 1
+
+
+def test_listeners_may_use_the_database(db: ThreadSafeDatabase):
+    db.subscribe("agent_0", lambda changes: db.insert(f"log.entries!{len(changes)}"))
+
+    db.insert("agent_0.traits.kind")
+
+    assert db.get("log.entries") == 1
+
+
+def test_stripes(db: ThreadSafeDatabase):
+    locks = db.locks
+    other = next(
+        a for a in AGENTS if locks.stripe_for(a) != locks.stripe_for("agent_0")
+    )
+
+    with db.reading(["agent_0"]):
+        # Writes to other stripes are not blocked by readers.
+        assert not _run_threads([lambda: db.insert(f"{other}.traits.kind")])
+
+        blocked = threading.Thread(target=db.insert, args=("agent_0.traits.shy",))
+        blocked.start()
+        blocked.join(0.2)
+
+        assert blocked.is_alive()
+
+        with pytest.raises(RuntimeError):
+            db.insert("agent_0.traits.brave")
+
+    blocked.join()
+
+    assert db.assert_statement("agent_0.traits.shy")
+
+
+def test_invalid_roots():
+    with pytest.raises(ValueError):
+        ThreadSafeDatabase(ArrayTrie().root)
@@ -0,0 +1,149 @@
+# pylint: disable=C0116,W0621
+
+"""Test expiring facts and the timer wheel that schedules them.
+
+"""
+
+import random
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.nodes.array_trie import ArrayTrie
+from repraxis.query import DBQuery
+from repraxis.timer_wheel import TimerWheel
+
+
+@pytest.fixture(params=["nodes", "array"])
+def db(request: pytest.FixtureRequest):
+    if request.param == "array":
+        return RePraxisDatabase(ArrayTrie().root)
+
+    return RePraxisDatabase()
+
+
+def test_wheel_matches_naive_schedule():
+    rng = random.Random(7)
+    wheel: TimerWheel[int] = TimerWheel(rng.randrange(1 << 20))
+    pending: dict[int, int] = {}
+    now = wheel.now
+
+    for step in range(400):
+        for i in range(rng.randrange(4)):
+            delay = rng.choice(
+                [1, 63, 64, 65, rng.randrange(1, 5000), rng.randrange(1, 1 << 25)]
+            )
+            pending[step * 4 + i] = now + delay
+            wheel.schedule(now + delay, step * 4 + i)
+
+        ticks = rng.choice([0, 1, 64, rng.randrange(1, 100_000)])
+        expired = wheel.advance(ticks)
+        now += ticks
+
+        expected = sorted(item for item, deadline in pending.items() if deadline <= now)
+        assert sorted(item for _, item in expired) == expected
+        assert all(pending.pop(item) == deadline for deadline, item in expired)
+        assert wheel.now == now
+        assert len(wheel) == len(pending)
+
+
+def test_wheel_rejects_past_deadlines():
+    wheel: TimerWheel[str] = TimerWheel(10)
+
+    with pytest.raises(ValueError):
+        wheel.schedule(10, "now")
+
+    with pytest.raises(ValueError):
+        wheel.advance(-1)
+
+
+def test_insert_with_ttl(db: RePraxisDatabase):
+    db.insert("astrid.status.poisoned", ttl=3)
+    db.insert("astrid.status.brave", ttl=5)
+    db.insert("astrid.traits.kind")
+
+    assert db.advance(2) == []
+    assert db.assert_statement("astrid.status.poisoned")
+
+    assert db.advance() == ["astrid.status.poisoned"]
+    assert not db.assert_statement("astrid.status.poisoned")
+    assert db.assert_statement("astrid.status.brave")
+
+    assert db.advance(10) == ["astrid.status.brave"]
+    assert db.assert_statement("astrid.traits.kind")
+    assert db.tick == 13
+
+    with pytest.raises(ValueError):
+        db.insert("astrid.status.stunned", ttl=0)
+
+
+def test_ttl_follows_overwrites(db: RePraxisDatabase):
+    db.insert("astrid.mood!angry", ttl=2)
+    db.insert("astrid.mood!calm")
+
+    # The overwritten value takes its expiry with it.
+    assert db.advance(5) == []
+    assert db.assert_statement("astrid.mood!calm")
+
+    db.insert("astrid.mood!happy", ttl=2)
+    db.insert("astrid.mood!happy", ttl=4)
+
+    assert db.advance(2) == []
+    assert db.advance(2) == ["astrid.mood!happy"]
+
+    db.insert("astrid.hp!10", ttl=2)
+    db.increment("astrid.hp", 5)
+    db.insert("astrid.stamina!10", ttl=2)
+    db.set("astrid.stamina", 3)
+
+    assert db.advance(2) == ["astrid.hp!15"]
+    assert db.get("astrid.stamina") == 3
+
+
+def test_ttl_after_delete(db: RePraxisDatabase):
+    db.insert("astrid.relationships.jordan.tags.rival", ttl=2)
+    db.delete("astrid.relationships.jordan")
+    db.insert("astrid.relationships.jordan.tags.rival")
+
+    assert db.advance(2) == []
+    assert db.assert_statement("astrid.relationships.jordan.tags.rival")
+
+    db.insert("astrid.relationships.britt.tags.friend")
+    db.insert("astrid.relationships.britt", ttl=1)
+
+    assert db.advance() == ["astrid.relationships.britt"]
+    assert not db.assert_statement("astrid.relationships.britt.tags.friend")
+
+
+def test_ttl_releases_removed_nodes(db: RePraxisDatabase):
+    # pylint: disable=protected-access
+    for i in range(500):
+        db.insert(f"astrid.mood!mood_{i}", ttl=1000)
+        db.insert(f"astrid.items.item_{i}.charges!3", ttl=1000)
+        db.insert(f"astrid.items.item_{i}.charges!3", ttl=2000)
+        db.delete(f"astrid.items.item_{i}")
+        db.insert(f"astrid.hp!{i}", ttl=1000)
+        db.increment("astrid.hp", 1)
+
+    # Only the current mood and hp are still scheduled.
+    assert len(db._expiry) == 2
+    assert len(db._timers) <= 2 * len(db._expiry) + 64
+
+    db.insert("astrid.relationships.britt.tags.friend", ttl=1)
+    db.delete("astrid.relationships")
+
+    assert len(db._expiry) == 2
+    assert sorted(db.advance(1000)) == ["astrid.hp!500", "astrid.mood!mood_499"]
+    assert not db._expiry
+
+
+def test_expiry_invalidates_query_cache(db: RePraxisDatabase):
+    db.enable_query_cache()
+    db.insert("astrid.status.poisoned", ttl=1)
+    query = DBQuery(["astrid.status.?status"])
+
+    assert len(query.run(db).bindings) == 1
+
+    db.advance()
+
+    assert not query.run(db).success
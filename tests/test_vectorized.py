@@ -0,0 +1,64 @@
+# pylint: disable=C0116,W0621
+
+"""Test vectorized comparison expressions.
+
+"""
+
+import pytest
+
+from repraxis import RePraxisDatabase
+from repraxis.query import DBQuery
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def db():
+    database = RePraxisDatabase()
+
+    for i in range(50):
+        database.insert(f"agent_{i}.stats.health!{i * 3 - 40}")
+        database.insert(f"agent_{i}.stats.speed![{i / 7}]")
+
+    database.insert("agent_50.stats.health![1.0]")
+    database.insert("agent_51.stats.health!1")
+
+    return database
+
+
+@pytest.mark.parametrize("operator", ["eq", "neq", "lt", "gt", "lte", "gte"])
+@pytest.mark.parametrize("constant", ["1", "[1.0]", "35", "[2.5]"])
+def test_matches_scalar_evaluation(db: RePraxisDatabase, operator: str, constant: str):
+    query = DBQuery().where("?a.stats.?stat!?v").where(f"{operator} ?v {constant}")
+
+    expected = query.run(db)
+    result = query.run(db, vectorize=True)
+
+    assert result.success == expected.success
+    assert result.bindings == expected.bindings
+
+
+def test_variable_operands(db: RePraxisDatabase):
+    query = (
+        DBQuery()
+        .where("?a.stats.health!?h")
+        .where("?a.stats.speed!?s")
+        .where("gt ?s ?h")
+    )
+
+    assert query.run(db, vectorize=True).bindings == query.run(db).bindings
+
+
+def test_ints_and_floats_are_not_equal(db: RePraxisDatabase):
+    query = DBQuery().where("?a.stats.health!?h").where("eq ?h 1")
+    result = query.run(db, vectorize=True)
+
+    assert [b["?a"] for b in result.bindings] == ["agent_51"]
+
+
+def test_symbol_comparison_raises(db: RePraxisDatabase):
+    db.insert("agent_0.stats.mood!angry")
+    query = DBQuery().where("?a.stats.?stat!?v").where("gt ?v 10")
+
+    with pytest.raises(TypeError):
+        query.run(db, vectorize=True)